@@ -1549,6 +1549,57 @@ class MainTests(TestCase):
         self.assertTrue(body is not None)
         self.assertEqual(response.status_code, 200)
 
+    @patch('cassy.set_vineyard_retention')
+    def test_edit_vineyard_retention(self, cassy_mock):
+        """
+        Tests a valid request to change a vineyard's raw data retention.
+        """
+        setup_test_environment()
+        client = Client()
+        payload = {
+            'auth_token': os.environ.get('ADMIN_TOKEN'),
+            'edit_vineyard_info': {
+                'vineyard_id': os.environ.get('VINE_ID'),
+                'retention_days': 30,
+            },
+        }
+        response = client.post(
+            '/admin/vineyard/edit',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        cassy_mock.assert_called_once_with(os.environ.get('VINE_ID'), 30)
+
+    @patch('cassy.set_vineyard_blocks')
+    def test_edit_vineyard_blocks(self, cassy_mock):
+        """
+        Tests a valid request to set a vineyard's blocks.
+        """
+        setup_test_environment()
+        client = Client()
+        blocks = {
+            'north': [
+                {'lat': 45.001, 'lon': -123.0},
+                {'lat': 45.001, 'lon': -122.99},
+                {'lat': 45.002, 'lon': -122.99},
+            ],
+        }
+        payload = {
+            'auth_token': os.environ.get('ADMIN_TOKEN'),
+            'edit_vineyard_info': {
+                'vineyard_id': os.environ.get('VINE_ID'),
+                'blocks': blocks,
+            },
+        }
+        response = client.post(
+            '/admin/vineyard/edit',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        cassy_mock.assert_called_once_with(os.environ.get('VINE_ID'), blocks)
+
 # /admin/vineyard/edit - invalid request tests
 
     def test_edit_vineyard_invalid_admin(self):
@@ -1648,6 +1699,52 @@ class MainTests(TestCase):
         self.assertTrue('data_invalid' in error)
         self.assertEqual(response.status_code, 403)
 
+    def test_edit_vineyard_invalid_retention(self):
+        """
+        Tests a request to edit a vineyard with a retention too short
+        for its readings to be summarised.
+        """
+        setup_test_environment()
+        client = Client()
+        payload = {
+            'auth_token': os.environ.get('ADMIN_TOKEN'),
+            'edit_vineyard_info': {
+                'vineyard_id': os.environ.get('VINE_ID'),
+                'retention_days': 1,
+            },
+        }
+        response = client.post(
+            '/admin/vineyard/edit',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_edit_vineyard_invalid_blocks(self):
+        """
+        Tests a request to edit a vineyard with a block of two points.
+        """
+        setup_test_environment()
+        client = Client()
+        payload = {
+            'auth_token': os.environ.get('ADMIN_TOKEN'),
+            'edit_vineyard_info': {
+                'vineyard_id': os.environ.get('VINE_ID'),
+                'blocks': {
+                    'north': [
+                        {'lat': 45.001, 'lon': -123.0},
+                        {'lat': 45.001, 'lon': -122.99},
+                    ],
+                },
+            },
+        }
+        response = client.post(
+            '/admin/vineyard/edit',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 403)
+
 # /admin/vineyard/edit exception tests
 
     @patch('cassy.edit_vineyard')
@@ -15,6 +15,7 @@ import time
 
 from common.exceptions import *
 from common.errors import *
+from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.http import (
     HttpResponse,
@@ -24,6 +25,7 @@ from django.http import (
 )
 
 import cassy
+from vineyard import spatial
 
 logger = logging.getLogger('plantalytics_backend.admin')
 
@@ -504,6 +506,10 @@ def vineyard_info(request):
         ).format(vineyard_id)
         logger.info(message)
         response = cassy.get_vineyard_info(vineyard_id)
+        response['retention_days'] = cassy.get_vineyard_retention(
+            vineyard_id
+        )
+        response['blocks'] = cassy.get_vineyard_blocks(vineyard_id)
         message = (
             'Successfully retrieved vineyard info for vineyard id: {}.'
         ).format(vineyard_id)
@@ -544,6 +550,8 @@ def vineyard_edit(request):
     edit_vineyard_info = data.get('edit_vineyard_info', '')
     vineyard_id = str(edit_vineyard_info.get('vineyard_id', ''))
     is_enable = edit_vineyard_info.get('enable', '')
+    retention_days = edit_vineyard_info.get('retention_days', '')
+    blocks = edit_vineyard_info.get('blocks', '')
 
     try:
         if not verify_admin(auth_token):
@@ -562,7 +570,16 @@ def vineyard_edit(request):
         if is_enable != '':
             if not isinstance(is_enable, bool):
                 raise PlantalyticsDataException(DATA_INVALID)
+        if retention_days != '':
+            check_retention_days(retention_days)
+        if blocks != '':
+            check_blocks(blocks)
         cassy.edit_vineyard(edit_vineyard_info)
+        if retention_days != '':
+            cassy.set_vineyard_retention(vineyard_id, retention_days)
+        if blocks != '':
+            cassy.set_vineyard_blocks(vineyard_id, blocks)
+        spatial.invalidate(vineyard_id)
         message = (
             'Successfully edited info for vineyard id: {}.'
         ).format(vineyard_id)
@@ -591,6 +608,54 @@ def vineyard_edit(request):
         return HttpResponseServerError(error, content_type='application/json')
 
 
+def check_retention_days(retention_days):
+    """
+    Validates a vineyard's raw data retention: 0 to keep readings forever,
+    or enough days for the daily summaries to be written first.
+    """
+
+    invalid = (
+        isinstance(retention_days, bool) or
+        not isinstance(retention_days, int) or
+        retention_days < 0 or
+        0 < retention_days < settings.ENV_DATA_RETENTION_MIN_DAYS
+    )
+    if invalid:
+        message = (
+            'Retention must be 0 or at least {} days.'
+        ).format(settings.ENV_DATA_RETENTION_MIN_DAYS)
+        logger.warn(message)
+        raise PlantalyticsDataException(DATA_INVALID)
+
+
+def check_blocks(blocks):
+    """
+    Validates a vineyard's blocks: names mapped to boundaries of at least
+    three points, each with a numeric lat and lon.
+    """
+
+    def is_point(point):
+        return isinstance(point, dict) and all(
+            isinstance(point.get(field), (int, float)) and
+            not isinstance(point.get(field), bool)
+            for field in ('lat', 'lon')
+        )
+
+    invalid = (
+        not isinstance(blocks, dict) or
+        any(
+            not name or
+            not isinstance(points, list) or
+            len(points) < 3 or
+            not all(is_point(point) for point in points)
+            for name, points in blocks.items()
+        )
+    )
+    if invalid:
+        logger.warn('Blocks must each have at least three points.')
+        raise PlantalyticsDataException(DATA_INVALID)
+
+
 def check_vineyard_id(vineyard_id):
     """
     Validates submitted vineyard id by checking if it already exists.
@@ -0,0 +1,16 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+from __future__ import unicode_literals
+
+from django.apps import AppConfig
+
+
+class AlertsConfig(AppConfig):
+    name = 'alerts'
@@ -0,0 +1,165 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import os
+import json
+from unittest.mock import patch
+
+from common import alerts
+from common.exceptions import PlantalyticsDataException
+from django.test import TestCase, Client, override_settings
+from django.test.utils import setup_test_environment
+
+import cassy
+
+MINUTE = 60000
+# Midnight UTC on 19 October 2016, in milliseconds.
+START = 1476835200000
+
+WET_RULE = {
+    'rule_id': 'wet',
+    'variable': 'leafwetness',
+    'operator': '>',
+    'threshold': 80,
+    'duration_minutes': 60,
+    'emails': ['grower@example.com'],
+}
+
+
+class MainTests(TestCase):
+    """
+    Executes all of the unit tests for the alerts endpoint.
+    """
+
+    def test_check_rules_invalid(self):
+        """
+        Tests rules with a repeated id or an unknown variable are
+        rejected.
+        """
+        with self.assertRaises(PlantalyticsDataException):
+            alerts.check_rules([WET_RULE, WET_RULE])
+        with self.assertRaises(PlantalyticsDataException):
+            alerts.check_rules([dict(WET_RULE, variable='rainfall')])
+
+    def test_evaluate_episode(self):
+        """
+        Tests a rule fires once the threshold has been passed for its
+        duration, only once per episode, and again after clearing.
+        """
+        compiled = alerts.compile_rules(alerts.check_rules([WET_RULE]))
+        states = {}
+
+        def readings(minutes, leafwetness):
+            return [
+                (1, START + minute * MINUTE, 20.0, 50.0, leafwetness)
+                for minute in minutes
+            ]
+
+        _, fired = alerts.evaluate(compiled, states, readings([0, 30], 90.0))
+        self.assertEqual(fired, [])
+        _, fired = alerts.evaluate(compiled, states, readings([60], 90.0))
+        self.assertEqual(len(fired), 1)
+        self.assertEqual(fired[0][2]['since'], START)
+        _, fired = alerts.evaluate(compiled, states, readings([90], 95.0))
+        self.assertEqual(fired, [])
+        alerts.evaluate(compiled, states, readings([120], 10.0))
+        self.assertEqual(states[('wet', 1)]['since'], None)
+        _, fired = alerts.evaluate(
+            compiled,
+            states,
+            readings([150, 210], 90.0)
+        )
+        self.assertEqual(len(fired), 1)
+
+    def test_evaluate_replayed_batch(self):
+        """
+        Tests readings older than the newest one checked, such as a
+        replayed backlog, neither open nor fire an episode.
+        """
+        compiled = alerts.compile_rules(alerts.check_rules([
+            dict(WET_RULE, duration_minutes=0)
+        ]))
+        states = {}
+        live = [(1, START + 60 * MINUTE, 20.0, 50.0, 10.0)]
+        older = [
+            (1, START + minute * MINUTE, 20.0, 50.0, 90.0)
+            for minute in (0, 30)
+        ]
+        changed, fired = alerts.evaluate(compiled, states, live)
+        self.assertEqual(fired, [])
+        self.assertEqual(changed[('wet', 1)]['last_sent'], START + 60 * MINUTE)
+        changed, fired = alerts.evaluate(compiled, states, older)
+        self.assertEqual((changed, fired), ({}, []))
+        self.assertEqual(states[('wet', 1)]['since'], None)
+
+    @override_settings(DB_BACKEND='memory')
+    @patch('common.alerts.send_mail_async')
+    def test_response_alerts(self, send_mail):
+        """
+        Tests saved rules are checked against a stored hub batch and the
+        alert is served as active and mailed once.
+        """
+        setup_test_environment()
+        cassy.connection.reset()
+        cassy.hub_batch_cache.invalidate()
+        cassy.alert_rules_cache.invalidate()
+        client = Client()
+        body = {
+            'vineyard_id': '0',
+            'auth_token': os.environ.get('ADMIN_TOKEN'),
+            'rules': [WET_RULE],
+        }
+        response = client.post(
+            '/alerts/rules',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        for batch in range(2):
+            cassy.store_env_data({
+                'vine_id': 0,
+                'hub_id': 0,
+                'batch_sent': START + (batch + 1) * 60 * MINUTE,
+                'hub_data': [
+                    {
+                        'node_id': 1,
+                        'temperature': 20.0,
+                        'humidity': 90.0,
+                        'leafwetness': 90.0,
+                        'data_sent': START + minute * MINUTE,
+                    }
+                    for minute in (batch * 60, batch * 60 + 30)
+                ],
+            })
+        del body['rules']
+        response = client.post(
+            '/alerts',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        cassy.connection.reset()
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content['rules'][0]['rule_id'], 'wet')
+        self.assertEqual(content['active'], [{
+            'rule_id': 'wet',
+            'node_id': 1,
+            'since': START,
+            'value': 90.0,
+        }])
+        self.assertEqual(send_mail.call_count, 1)
+
+    def test_alerts_invalid_method(self):
+        """
+        Tests the alerts endpoint with unsupported HTTP method.
+        """
+        setup_test_environment()
+        client = Client()
+        response = client.get('/alerts')
+        self.assertEqual(response.status_code, 405)
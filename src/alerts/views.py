@@ -0,0 +1,179 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import json
+import logging
+
+from common import alerts
+from common.exceptions import PlantalyticsException
+from common.errors import *
+from django.views.decorators.csrf import csrf_exempt
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed
+)
+
+import cassy
+
+logger = logging.getLogger('plantalytics_backend.alerts')
+
+
+def authorize(auth_token, vineyard_id):
+    """
+    Returns the username for auth_token, or an error response if the
+    token is invalid or its user may not see the vineyard.
+    """
+
+    try:
+        message = (
+            'Validating auth token for alerts of vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+
+        username = cassy.verify_auth_token(auth_token)
+        authorized = set(
+            str(vineyard['vineyard_id'])
+            for vineyard in cassy.get_authorized_vineyards(username)
+        )
+    except PlantalyticsException as e:
+        message = (
+            'Invalid auth token for alerts of vineyard id {}'
+        ).format(vineyard_id)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while auth token for alerts of vineyard id '
+            '{}\n{}.'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        error = custom_error(AUTH_UNKNOWN, str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+
+    if vineyard_id not in authorized:
+        message = (
+            'User \'{}\' is not authorized for vineyard id {}.'
+        ).format(username, vineyard_id)
+        logger.warn(message)
+        error = custom_error(AUTH_VINEYARD)
+        return HttpResponseForbidden(error, content_type='application/json')
+    return username
+
+
+@csrf_exempt
+def index(request):
+    """
+    Responds with a vineyard's alert rules and the alerts that have
+    fired and not yet cleared.
+    """
+
+    if request.method != "POST":
+        return HttpResponseNotAllowed(['POST'])
+
+    data = json.loads(request.body.decode('utf-8'))
+    vineyard_id = str(data.get('vineyard_id', ''))
+    auth_token = str(data.get('auth_token', ''))
+
+    username = authorize(auth_token, vineyard_id)
+    if isinstance(username, HttpResponse):
+        return username
+
+    try:
+        message = (
+            'Fetching alerts for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+
+        states = cassy.get_alert_states(vineyard_id)
+        active = [
+            {
+                'rule_id': rule_id,
+                'node_id': node_id,
+                'since': state['since'],
+                'value': state['value'],
+            }
+            for (rule_id, node_id), state in sorted(states.items())
+            if state['fired']
+        ]
+        response = {
+            'rules': cassy.get_alert_rules(vineyard_id),
+            'active': active,
+        }
+        return HttpResponse(
+            json.dumps(response),
+            content_type='application/json'
+        )
+    except PlantalyticsException as e:
+        message = (
+            'Invalid vineyard ID while fetching alerts: {}'
+        ).format(vineyard_id)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while fetching alerts for vineyard id {}. {}'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        error = custom_error(VINEYARD_UNKNOWN, str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
+
+
+@csrf_exempt
+def rules(request):
+    """
+    Replaces a vineyard's alert rules. Rules without emails notify the
+    user who saved them.
+    """
+
+    if request.method != "POST":
+        return HttpResponseNotAllowed(['POST'])
+
+    data = json.loads(request.body.decode('utf-8'))
+    vineyard_id = str(data.get('vineyard_id', ''))
+    auth_token = str(data.get('auth_token', ''))
+
+    username = authorize(auth_token, vineyard_id)
+    if isinstance(username, HttpResponse):
+        return username
+
+    try:
+        message = (
+            'Saving alert rules for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+
+        checked = alerts.check_rules(data.get('rules'))
+        if any(not rule['emails'] for rule in checked):
+            email = cassy.get_user_email(username)
+            for rule in checked:
+                if not rule['emails']:
+                    rule['emails'] = [email]
+        cassy.set_alert_rules(vineyard_id, checked)
+        return HttpResponse(
+            json.dumps({'rules': checked}),
+            content_type='application/json'
+        )
+    except PlantalyticsException as e:
+        message = (
+            'Invalid alert rules for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while saving alert rules for vineyard id {}. {}'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        error = custom_error(VINEYARD_UNKNOWN, str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
@@ -0,0 +1,82 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Measures password verifications (logins) per second per core for each
+work factor, to help choose PASSWORD_HASH_ITERATIONS or the scrypt
+settings. Run from src/:
+
+    python -m benchmarks.password_hashing
+    python -m benchmarks.password_hashing --seconds 5 --threads 4
+
+With --threads > 1 the verifications run concurrently, which shows how
+well hashing scales across cores when the GIL is released.
+"""
+
+import argparse
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import passwords
+
+PBKDF2_ITERATIONS = [50000, 100000, 150000, 260000, 390000]
+SCRYPT_N = [8192, 16384, 32768]
+
+
+def cost_settings():
+    for iterations in PBKDF2_ITERATIONS:
+        yield passwords.PBKDF2, (iterations,)
+    if hasattr(hashlib, 'scrypt'):
+        for n in SCRYPT_N:
+            yield passwords.SCRYPT, (n, 8, 1)
+
+
+def measure(algorithm, cost, seconds, threads):
+    """
+    Returns verifications per second per thread for one cost setting.
+    """
+
+    encoded = passwords.encode('correct horse', algorithm, cost)
+
+    def verify_until(deadline):
+        count = 0
+        while time.perf_counter() < deadline:
+            passwords.verify('correct horse', encoded)
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    deadline = start + seconds
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        counts = list(executor.map(verify_until, [deadline] * threads))
+    elapsed = time.perf_counter() - start
+    return sum(counts) / elapsed / threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    print('{:<15} {:>20} {:>22}'.format(
+        'algorithm', 'cost', 'logins/sec per core'
+    ))
+    for algorithm, cost in cost_settings():
+        rate = measure(algorithm, cost, args.seconds, args.threads)
+        print('{:<15} {:>20} {:>22.1f}'.format(
+            algorithm,
+            '/'.join(str(value) for value in cost),
+            rate
+        ))
+
+
+if __name__ == '__main__':
+    main()
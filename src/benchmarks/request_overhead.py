@@ -0,0 +1,102 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Compares per-request framework overhead of the full settings against the
+API mode profile. Each profile runs in its own process and sends requests
+to /health_check, which touches no dependencies, so the timing is Django's
+handler, middleware and URL resolution. Run from src/:
+
+    python -m benchmarks.request_overhead
+    python -m benchmarks.request_overhead --requests 20000
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+import subprocess
+import time
+
+PROFILES = [
+    'plantalytics_backend.settings',
+    'plantalytics_backend.settings_api',
+]
+
+
+def run_profile(requests, path):
+    """
+    Times requests against the current settings module. Runs in a child
+    process so each profile gets a fresh Django.
+    """
+
+    import django
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+    logging.disable(logging.CRITICAL)
+    client = Client()
+    for _ in range(min(requests, 500)):
+        client.get(path)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path)
+    elapsed = time.perf_counter() - start
+    return {
+        'requests_per_sec': requests / elapsed,
+        'usec_per_request': elapsed / requests * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--path', default='/health_check')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_profile(args.requests, args.path)))
+        return
+
+    results = {}
+    for profile in PROFILES:
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=profile)
+        output = subprocess.check_output(
+            [
+                sys.executable, '-m', 'benchmarks.request_overhead',
+                '--child',
+                '--requests', str(args.requests),
+                '--path', args.path,
+            ],
+            env=env
+        )
+        results[profile] = json.loads(output.decode('utf-8').splitlines()[-1])
+
+    print('{:<36} {:>14} {:>14}'.format('settings', 'req/sec', 'usec/req'))
+    for profile in PROFILES:
+        print('{:<36} {:>14.0f} {:>14.1f}'.format(
+            profile,
+            results[profile]['requests_per_sec'],
+            results[profile]['usec_per_request']
+        ))
+    baseline = results[PROFILES[0]]['usec_per_request']
+    lean = results[PROFILES[-1]]['usec_per_request']
+    print('API mode saves {:.1f} usec per request ({:.0%}).'.format(
+        baseline - lean,
+        (baseline - lean) / baseline
+    ))
+
+
+if __name__ == '__main__':
+    main()
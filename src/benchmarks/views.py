@@ -0,0 +1,270 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Load-tests the real views against the in-process Cassandra stand-in in
+common.memory_session, reporting throughput, latency percentiles and
+statements per request for each endpoint. Injected latency is slept
+before every prepare and execute, so changes in query count show up as
+latency the way they would against a real cluster. Run from src/:
+
+    python -m benchmarks.views
+    python -m benchmarks.views --vineyards 50 --nodes 40 --latency 0.002
+    python -m benchmarks.views --endpoints env_data hub_data --threads 8
+
+Login verifies a real password hash, so its numbers include the cost
+set by PASSWORD_HASH_ITERATIONS.
+"""
+
+import os
+import json
+import argparse
+import logging
+import threading
+import time
+
+os.environ.setdefault(
+    'DJANGO_SETTINGS_MODULE',
+    'plantalytics_backend.settings_api'
+)
+os.environ.setdefault('HUB_KEY', 'benchmark')
+os.environ['DB_BACKEND'] = 'memory'
+
+TOKEN = 'benchmark-token'
+# Each hub_data request gets its own batch_sent so none are deduplicated.
+START_MS = int(time.time() * 1000)
+
+
+def env_data_payload(index, args):
+    return {
+        'auth_token': TOKEN,
+        'vineyard_id': index % args.vineyards,
+        'env_variable': 'temperature',
+    }
+
+
+def env_data_all_payload(index, args):
+    payload = env_data_payload(index, args)
+    payload['env_variable'] = 'all'
+    return payload
+
+
+def hub_data_payload(index, args):
+    vineyard_id = index % args.vineyards
+    now = START_MS + index
+    return {
+        'key': os.environ.get('HUB_KEY'),
+        'vine_id': vineyard_id,
+        'hub_id': 0,
+        'batch_sent': now,
+        'hub_data': [
+            {
+                'node_id': vineyard_id * args.nodes + node,
+                'temperature': 20.0,
+                'humidity': 50.0,
+                'leafwetness': 10.0,
+                'data_sent': now,
+            }
+            for node in range(args.nodes)
+        ],
+    }
+
+
+def login_payload(index, args):
+    return {
+        'username': 'login',
+        'password': 'benchmark',
+    }
+
+
+def vineyard_payload(index, args):
+    return {
+        'auth_token': TOKEN,
+        'vineyard_id': index % args.vineyards,
+    }
+
+
+def admin_user_payload(index, args):
+    return {
+        'auth_token': TOKEN,
+        'request_username': 'benchmark',
+    }
+
+
+def admin_subscription_payload(index, args):
+    return {
+        'auth_token': TOKEN,
+        'request_username': 'login',
+        'sub_end_date': '2999-12-31',
+    }
+
+
+# Name: (path, payload builder)
+ENDPOINTS = {
+    'env_data': ('/env_data', env_data_payload),
+    'env_data_all': ('/env_data', env_data_all_payload),
+    'hub_data': ('/hub_data', hub_data_payload),
+    'login': ('/login', login_payload),
+    'vineyard': ('/vineyard', vineyard_payload),
+    'admin_user': ('/admin/user', admin_user_payload),
+    'admin_vineyard': ('/admin/vineyard', vineyard_payload),
+    'admin_subscription': (
+        '/admin/user/subscription',
+        admin_subscription_payload
+    ),
+}
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_endpoint(session, name, args):
+    """
+    Sends args.requests requests to one endpoint from args.threads
+    threads and summarises the latencies.
+    """
+
+    from django.test import Client
+
+    path, build_payload = ENDPOINTS[name]
+    counter = iter(range(args.requests))
+    counter_lock = threading.Lock()
+    latencies = []
+    errors = []
+
+    def worker():
+        client = Client()
+        while True:
+            with counter_lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            body = json.dumps(build_payload(index, args))
+            start = time.perf_counter()
+            response = client.post(
+                path,
+                data=body,
+                content_type='application/json'
+            )
+            elapsed = time.perf_counter() - start
+            with counter_lock:
+                latencies.append(elapsed)
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+
+    prepares, executes = session.prepares, session.executes
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=worker) for _ in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_sec': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'prepares_per_request': (
+            (session.prepares - prepares) / max(len(latencies), 1)
+        ),
+        'executes_per_request': (
+            (session.executes - executes) / max(len(latencies), 1)
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--vineyards', type=int, default=10)
+    parser.add_argument('--nodes', type=int, default=20,
+                        help='nodes per vineyard')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='requests per endpoint')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds slept per prepare and execute')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='up to this many more seconds, at random')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS),
+                        default=sorted(ENDPOINTS))
+    parser.add_argument('--json', action='store_true',
+                        help='print results as JSON')
+    args = parser.parse_args()
+
+    # Read by the settings module, so set before Django loads it.
+    os.environ['DB_MEMORY_LATENCY'] = str(args.latency)
+
+    import django
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+    logging.disable(logging.CRITICAL)
+
+    import cassy
+    from common import memory_session, passwords
+    from django.conf import settings
+
+    session = cassy.get_session()
+    session.jitter = args.jitter
+    memory_session.seed(
+        session,
+        args.vineyards,
+        args.nodes,
+        stored_password=passwords.make_password('benchmark'),
+        bucket_size=settings.ENV_DATA_BUCKET
+    )
+    results = {}
+    for name in args.endpoints:
+        results[name] = run_endpoint(session, name, args)
+
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+        return
+
+    print('{} vineyards x {} nodes, {} threads, {:.1f} ms latency'.format(
+        args.vineyards,
+        args.nodes,
+        args.threads,
+        args.latency * 1000
+    ))
+    print('{:<20} {:>9} {:>9} {:>9} {:>9} {:>7} {:>7} {:>6}'.format(
+        'endpoint', 'req/sec', 'p50 ms', 'p95 ms', 'p99 ms',
+        'prep/r', 'exec/r', 'errors'
+    ))
+    for name in args.endpoints:
+        result = results[name]
+        print(
+            '{:<20} {:>9.1f} {:>9.2f} {:>9.2f} {:>9.2f} {:>7.1f} {:>7.1f} '
+            '{:>6}'.format(
+                name,
+                result['requests_per_sec'],
+                result['p50_ms'],
+                result['p95_ms'],
+                result['p99_ms'],
+                result['prepares_per_request'],
+                result['executes_per_request'],
+                result['errors']
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
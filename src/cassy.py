@@ -8,49 +8,1530 @@
 #
 
 import os
+import atexit
+import json
+import logging
+import datetime
+import threading
+import time
+
+from common import instrumentation, memory_session, metrics, passwords
+from common import alerts, gdd, risk, sensors, timebuckets
+from common.cache import TTLCache
+from common.exceptions import *
+from common.errors import *
+from cassandra.auth import PlainTextAuthProvider
+from cassandra.cluster import Cluster
+from cassandra.query import named_tuple_factory, BatchStatement
+from django.conf import settings
+
+
+class ConnectionManager(object):
+    """
+    Owns the Cassandra cluster and session for the current process.
+
+    Connecting is deferred until the first query, so importing this module
+    is cheap and a uWSGI master that forks workers after loading the app
+    never shares driver sockets or event loop threads with them. Each
+    process connects on its own first use; a session inherited across a
+    fork is detected by PID and replaced.
+
+    With settings.DB_BACKEND set to 'memory' the session is an in-process
+    common.memory_session.MemorySession instead, and reset() discards its
+    data.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._cluster = None
+        self._session = None
+
+    def get_session(self):
+        """
+        Returns this process's session, connecting if needed.
+        """
+
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.reset()
+                if self._session is None:
+                    self._connect()
+        return self._session
+
+    def _connect(self):
+        if settings.DB_BACKEND == 'memory':
+            self._session = memory_session.MemorySession(
+                latency=settings.DB_MEMORY_LATENCY
+            )
+            memory_session.seed_from_environment(
+                self._session,
+                passwords.make_password,
+                settings.ENV_DATA_BUCKET
+            )
+            self._pid = os.getpid()
+            return
+        auth = PlainTextAuthProvider(
+                    username=os.environ.get('DB_USERNAME'),
+                    password=os.environ.get('DB_PASSWORD')
+        )
+        cluster = Cluster(
+                    [os.environ.get('DB_HOST')],
+                    auth_provider=auth
+        )
+        self._session = cluster.connect(os.environ.get('DB_KEYSPACE'))
+        self._cluster = cluster
+        self._pid = os.getpid()
+
+    def new_batch(self):
+        """
+        Returns an empty batch statement for the configured backend.
+        """
+
+        if settings.DB_BACKEND == 'memory':
+            return memory_session.MemoryBatchStatement()
+        return BatchStatement()
+
+    def reset(self):
+        """
+        Forgets a connection inherited from a parent process. The parent
+        still owns its sockets and threads, so nothing is shut down here.
+        """
+
+        self._lock = threading.Lock()
+        self._cluster = None
+        self._session = None
+        self._pid = os.getpid()
+
+    def shutdown(self):
+        """
+        Closes this process's connection, if it opened one.
+        """
+
+        if self._cluster is not None and self._pid == os.getpid():
+            self._cluster.shutdown()
+        self._cluster = None
+        self._session = None
+
+
+class LazySession(object):
+    """
+    Stands in for the driver session, connecting on first use, so the
+    functions below can keep using the module level `session`. Prepares
+    and executes, including asynchronous ones, are timed and counted for
+    the current request. Queries run on pool threads, such as overview
+    summaries and stream windows, are not attributed to the request.
+    """
+
+    def prepare(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return connection.get_session().prepare(*args, **kwargs)
+        finally:
+            instrumentation.record_prepare(time.perf_counter() - start)
+
+    def execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = 0
+        try:
+            result = connection.get_session().execute(*args, **kwargs)
+            rows = len(getattr(result, 'current_rows', None) or [])
+            return result
+        finally:
+            instrumentation.record_execute(
+                time.perf_counter() - start,
+                rows
+            )
+
+    def execute_async(self, *args, **kwargs):
+        start = time.perf_counter()
+        stats = instrumentation.current()
+        future = connection.get_session().execute_async(*args, **kwargs)
+
+        def resolved(rows):
+            instrumentation.record_execute(
+                time.perf_counter() - start,
+                len(rows or []),
+                stats
+            )
+
+        def failed(error):
+            instrumentation.record_execute(
+                time.perf_counter() - start,
+                0,
+                stats
+            )
+
+        future.add_callbacks(resolved, failed)
+        return future
+
+    def __getattr__(self, name):
+        return getattr(connection.get_session(), name)
+
+    def __setattr__(self, name, value):
+        setattr(connection.get_session(), name, value)
+
+
+logger = logging.getLogger('plantalytics_backend.cassy')
+
+connection = ConnectionManager()
+session = LazySession()
+atexit.register(connection.shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=connection.reset)
+
+
+node_coordinates_cache = TTLCache('node_coordinates')
+vineyard_retention_cache = TTLCache('vineyard_retention')
+# Each vineyard's alert rules and their compiled checks.
+alert_rules_cache = TTLCache('alert_rules')
+# Hub batches this process has stored, checked before the marker table.
+hub_batch_cache = TTLCache(
+    'hub_batches',
+    max_entries=settings.HUB_BATCH_DEDUP_ENTRIES
+)
+
+
+def get_session():
+    """
+    Returns the connected driver session for this process, for callers
+    that need the session object itself rather than the lazy stand-in.
+    """
+
+    return connection.get_session()
+
+
+def check_database(timeout):
+    """
+    Reads the connected node's release version, failing if the cluster
+    cannot be reached or does not answer within timeout seconds.
+    """
+
+    session.row_factory = named_tuple_factory
+    query = (
+        'SELECT release_version FROM system.local;'
+    )
+
+    try:
+        rows = session.execute(query, timeout=timeout)
+        return rows[0].release_version
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+def env_data_bucketed():
+    """
+    Returns whether environmental data is kept in the bucketed table,
+    partitioned by node and time bucket, rather than by node alone.
+    """
+
+    return settings.ENV_DATA_PARTITIONING == 'bucketed'
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_env_data(node_id, env_variable):
+    """
+    Obtains temperature, humidity, or leaf wetness dataset for a
+    supplied node id and environmental variable. Given a list of
+    variables instead, reads them all from the same row and returns
+    them as a dict. With bucketed environmental data, the current bucket
+    is read first and earlier ones only while nothing is found, up to
+    ENV_DATA_LATEST_BUCKETS.
+    """
+
+    supported_env_variables = [
+        'leafwetness',
+        'humidity',
+        'temperature',
+    ]
+    if isinstance(env_variable, str):
+        env_variables = [env_variable]
+    else:
+        env_variables = list(env_variable)
+    if not env_variables:
+        raise PlantalyticsDataException(ENV_DATA_INVALID)
+    for variable in env_variables:
+        if variable not in supported_env_variables:
+            raise PlantalyticsDataException(ENV_DATA_INVALID)
+
+    session.row_factory = named_tuple_factory
+    parameters = {
+        'nodeid': int(node_id),
+    }
+    if env_data_bucketed():
+        table = os.environ.get('DB_ENV_BUCKET_TABLE', 'env_data_by_bucket')
+        query = (
+            'SELECT {} FROM {} WHERE nodeid=? AND bucket=? LIMIT 1;'
+        )
+        buckets = timebuckets.latest_buckets(
+            datetime.datetime.utcnow(),
+            settings.ENV_DATA_BUCKET,
+            settings.ENV_DATA_LATEST_BUCKETS
+        )
+    else:
+        table = str(os.environ.get('DB_ENV_TABLE'))
+        query = (
+            'SELECT {} FROM {} WHERE nodeid=? LIMIT 1;'
+        )
+        buckets = [None]
+    prepared_statement = session.prepare(
+        query.format(', '.join(env_variables), str(table))
+    )
+
+    try:
+        for bucket in buckets:
+            if bucket is not None:
+                parameters['bucket'] = bucket
+            rows = session.execute(
+                prepared_statement,
+                parameters
+            )
+            if rows:
+                break
+        if not rows:
+            raise PlantalyticsDataException(ENV_DATA_NOT_FOUND)
+        elif not isinstance(env_variable, str):
+            return {
+                variable: getattr(rows[0], variable)
+                for variable in env_variables
+            }
+        else:
+            # Extract requested environmental variable.
+            if env_variable == 'temperature':
+                return rows[0].temperature
+            elif env_variable == 'humidity':
+                return rows[0].humidity
+            elif env_variable == 'leafwetness':
+                return rows[0].leafwetness
+            else:
+                # Shouldn't reach this point, but here for completeness
+                raise PlantalyticsDataException(ENV_DATA_UNKNOWN)
+    except PlantalyticsDataException as e:
+        raise e
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: '.format(str(e)))
+
+
+def _env_data_range_statements(node_id, env_variable, start, end):
+    """
+    Returns the prepared statement and the parameters of each query that
+    reads a node's readings between start and end: one per bucket with
+    bucketed environmental data, newest first, and one otherwise.
+    """
+
+    supported_env_variables = [
+        'leafwetness',
+        'humidity',
+        'temperature',
+    ]
+    if isinstance(env_variable, str):
+        env_variables = [env_variable]
+    else:
+        env_variables = list(env_variable)
+    for variable in env_variables:
+        if variable not in supported_env_variables:
+            raise PlantalyticsDataException(ENV_DATA_INVALID)
+
+    node_id = int(node_id)
+    if env_data_bucketed():
+        table = os.environ.get('DB_ENV_BUCKET_TABLE', 'env_data_by_bucket')
+        query = (
+            'SELECT batchsent, datasent, {} FROM {} '
+            'WHERE nodeid=? AND bucket=? AND batchsent>=? AND batchsent<=?;'
+        )
+        parameters = [
+            (node_id, bucket, start, end)
+            for bucket in timebuckets.buckets_between(
+                start,
+                end,
+                settings.ENV_DATA_BUCKET
+            )
+        ]
+    else:
+        table = os.environ.get('DB_ENV_TABLE')
+        query = (
+            'SELECT batchsent, datasent, {} FROM {} '
+            'WHERE nodeid=? AND batchsent>=? AND batchsent<=?;'
+        )
+        parameters = [(node_id, start, end)]
+    prepared_statement = session.prepare(
+        query.format(', '.join(env_variables), table)
+    )
+    return prepared_statement, parameters
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_env_data_range(node_id, env_variable, start, end):
+    """
+    Obtains a node's readings of an environmental variable, or of a list
+    of them, from batches sent between start and end, inclusive, as
+    (batchsent, datasent, value, ...) rows, newest first. start and end
+    are datetimes or milliseconds since the epoch. With bucketed
+    environmental data each bucket in the range is a separate partition;
+    they are queried ENV_DATA_RANGE_CONCURRENCY at a time.
+    """
+
+    session.row_factory = named_tuple_factory
+    prepared_statement, parameters = _env_data_range_statements(
+        node_id,
+        env_variable,
+        start,
+        end
+    )
+
+    try:
+        rows = []
+        step = settings.ENV_DATA_RANGE_CONCURRENCY
+        for index in range(0, len(parameters), step):
+            futures = [
+                session.execute_async(prepared_statement, bucket_parameters)
+                for bucket_parameters in parameters[index:index + step]
+            ]
+            for future in futures:
+                rows.extend(tuple(row) for row in future.result())
+        return rows
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+def iter_env_data_range(node_id, env_variable, start, end):
+    """
+    Yields the rows get_env_data_range returns, newest first, without
+    holding them all: the driver fetches them a page at a time and one
+    bucket is read at a time. For passes over a whole season.
+    """
+
+    session.row_factory = named_tuple_factory
+    prepared_statement, parameters = _env_data_range_statements(
+        node_id,
+        env_variable,
+        start,
+        end
+    )
+
+    try:
+        for bucket_parameters in parameters:
+            for row in session.execute(prepared_statement, bucket_parameters):
+                yield tuple(row)
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+def iter_vineyard_env_data(vineyard_id, node_ids, start, end):
+    """
+    Yields (vineyard_id, node_id, batchsent, datasent, temperature,
+    humidity, leafwetness) rows of a vineyard's nodes from batches sent
+    between start and end, inclusive, a node at a time and each newest
+    first. Rows are fetched a page at a time as they are consumed.
+    """
+
+    prefix = (int(vineyard_id),)
+    for node_id in sorted(set(int(node_id) for node_id in node_ids)):
+        for row in iter_env_data_range(
+            node_id,
+            ['temperature', 'humidity', 'leafwetness'],
+            start,
+            end
+        ):
+            yield prefix + (node_id,) + row
+
+
+def token_ranges(splits):
+    """
+    Splits the Murmur3 token ring into splits contiguous (first, last]
+    ranges that together cover every partition.
+    """
+
+    low, high = -2 ** 63, 2 ** 63 - 1
+    bounds = [
+        low + (high - low) * index // splits
+        for index in range(splits)
+    ] + [high]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+@metrics.timed('cassandra_query_seconds')
+def scan_token_range(table, columns, partition_key, first, last,
+                     conditions='', parameters=(), paging_state=None,
+                     page_size=None):
+    """
+    Reads one page of the rows of table whose partition token is in
+    (first, last], as tuples of columns. partition_key names the table's
+    partition key columns. conditions, such as 'batchsent >= ?', are
+    added with AND and filtered by Cassandra, their values given in
+    parameters. Returns (rows, paging state), where the paging state
+    reads the next page and is None after the last one. See
+    maintenance.scan for whole table scans.
+    """
+
+    session.row_factory = named_tuple_factory
+    query = (
+        'SELECT {0} FROM {1} WHERE token({2}) > ? AND token({2}) <= ?'
+    ).format(', '.join(columns), table, ', '.join(partition_key))
+    if conditions:
+        query += ' AND {} ALLOW FILTERING'.format(conditions)
+    prepared_statement = session.prepare(query + ';')
+    if page_size is not None:
+        prepared_statement.fetch_size = page_size
+
+    try:
+        result = session.execute(
+            prepared_statement,
+            (first, last) + tuple(parameters),
+            paging_state=paging_state
+        )
+        rows = [tuple(row) for row in result.current_rows]
+        return rows, result.paging_state
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+def iter_env_data_token_range(first, last, start, end):
+    """
+    Yields (vineid, nodeid, batchsent, datasent, temperature, humidity,
+    leafwetness) rows of every environmental data partition whose token
+    is in (first, last], from batches sent between start and end,
+    inclusive. Rows are fetched EXPORT_PAGE_SIZE at a time as they are
+    consumed. For scans over the whole fleet, a token range each.
+    """
+
+    if env_data_bucketed():
+        table = os.environ.get('DB_ENV_BUCKET_TABLE', 'env_data_by_bucket')
+        partition_key = ('nodeid', 'bucket')
+    else:
+        table = os.environ.get('DB_ENV_TABLE')
+        partition_key = ('nodeid',)
+    paging_state = None
+    while True:
+        rows, paging_state = scan_token_range(
+            table,
+            (
+                'vineid',
+                'nodeid',
+                'batchsent',
+                'datasent',
+                'temperature',
+                'humidity',
+                'leafwetness',
+            ),
+            partition_key,
+            first,
+            last,
+            conditions='batchsent >= ? AND batchsent <= ?',
+            parameters=(start, end),
+            paging_state=paging_state,
+            page_size=settings.EXPORT_PAGE_SIZE
+        )
+        for row in rows:
+            yield row
+        if paging_state is None:
+            return
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_latest_env_data(node_ids, env_variables):
+    """
+    Obtains the latest reading of each environmental variable for many
+    nodes at once, as {node_id: {variable: value}}. The node partitions
+    are read concurrently, ENV_DATA_RANGE_CONCURRENCY at a time; with
+    bucketed environmental data, nodes with nothing in the current
+    bucket are read again from earlier ones. Nodes without readings are
+    left out.
+    """
+
+    supported_env_variables = [
+        'leafwetness',
+        'humidity',
+        'temperature',
+    ]
+    env_variables = list(env_variables)
+    if not env_variables:
+        raise PlantalyticsDataException(ENV_DATA_INVALID)
+    for variable in env_variables:
+        if variable not in supported_env_variables:
+            raise PlantalyticsDataException(ENV_DATA_INVALID)
+
+    session.row_factory = named_tuple_factory
+    if env_data_bucketed():
+        table = os.environ.get('DB_ENV_BUCKET_TABLE', 'env_data_by_bucket')
+        query = (
+            'SELECT {} FROM {} WHERE nodeid=? AND bucket=? LIMIT 1;'
+        )
+        buckets = timebuckets.latest_buckets(
+            datetime.datetime.utcnow(),
+            settings.ENV_DATA_BUCKET,
+            settings.ENV_DATA_LATEST_BUCKETS
+        )
+    else:
+        table = str(os.environ.get('DB_ENV_TABLE'))
+        query = (
+            'SELECT {} FROM {} WHERE nodeid=? LIMIT 1;'
+        )
+        buckets = [None]
+    prepared_statement = session.prepare(
+        query.format(', '.join(env_variables), table)
+    )
+
+    try:
+        latest = {}
+        remaining = [int(node_id) for node_id in node_ids]
+        step = settings.ENV_DATA_RANGE_CONCURRENCY
+        for bucket in buckets:
+            missing = []
+            for index in range(0, len(remaining), step):
+                futures = []
+                for node_id in remaining[index:index + step]:
+                    if bucket is None:
+                        parameters = (node_id,)
+                    else:
+                        parameters = (node_id, bucket)
+                    futures.append((
+                        node_id,
+                        session.execute_async(prepared_statement, parameters)
+                    ))
+                for node_id, future in futures:
+                    rows = future.result().current_rows
+                    if rows:
+                        latest[node_id] = {
+                            variable: getattr(rows[0], variable)
+                            for variable in env_variables
+                        }
+                    else:
+                        missing.append(node_id)
+            remaining = missing
+            if not remaining:
+                break
+        return latest
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_hub_report_times(vineyard_id):
+    """
+    Returns the time each hub of a vineyard last sent a batch, as
+    {hub_id: datetime}.
+    """
+
+    session.row_factory = named_tuple_factory
+    table = os.environ.get('DB_HW_TABLE')
+    parameters = {
+        'vineid': int(vineyard_id),
+    }
+    query = (
+        'SELECT hubid, lasthubbatchsent FROM {} WHERE vineid=?;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+
+    try:
+        rows = session.execute(
+            prepared_statement,
+            parameters
+        )
+        report_times = {}
+        for row in rows:
+            latest = report_times.get(row.hubid)
+            if row.lasthubbatchsent is not None and (
+                latest is None or row.lasthubbatchsent > latest
+            ):
+                report_times[row.hubid] = row.lasthubbatchsent
+            else:
+                report_times.setdefault(row.hubid, latest)
+        return report_times
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def check_latest_batch_time(vineyard_id):
+    """
+    Checks hub timestamps for submitted vineyard id.
+    """
+
+    table = os.environ.get('DB_HW_TABLE')
+    parameters = {
+        'vineid': int(vineyard_id),
+    }
+    query = (
+        'SELECT lasthubbatchsent FROM {} WHERE vineid=?;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+
+    try:
+        rows = session.execute(
+            prepared_statement,
+            parameters
+        )
+        if not rows:
+            raise PlantalyticsDataException(VINEYARD_ID_NOT_FOUND)
+        return rows
+    except PlantalyticsDataException as e:
+        raise e
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: '.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def set_latest_batch_time(vineyard_id, hub_id, batch_sent, node_ids):
+    """
+    Inserts timestamp for latest data, received from a hub, into the database.
+    """
+
+    table = os.environ.get('DB_HW_TABLE')
+    parameters = {
+        'vineid': vineyard_id,
+        'hubid': hub_id,
+        'lasthubbatchsent': batch_sent,
+    }
+    query = (
+        'UPDATE {} SET lasthubbatchsent=? '
+        'WHERE vineid=? AND hubid=? AND nodeid=?;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+    batch_statement = connection.new_batch()
+
+    try:
+        for node_id in node_ids:
+            parameters['nodeid'] = int(node_id)
+            batch_statement.add(
+                prepared_statement,
+                parameters
+            )
+        session.execute(batch_statement)
+        return True
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: '.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def hub_batch_stored(hub_id, batch_sent):
+    """
+    Returns True if a hub batch was already stored, as remembered by this
+    process or recorded in the marker table by any other.
+    """
+
+    key = (int(hub_id), int(batch_sent))
+    if hub_batch_cache.get(key) is not None:
+        return True
+
+    session.row_factory = named_tuple_factory
+    table = os.environ.get('DB_HUB_BATCH_TABLE', 'hub_batches')
+    parameters = {
+        'hubid': key[0],
+        'batchsent': key[1],
+    }
+    query = (
+        'SELECT received FROM {} WHERE hubid=? AND batchsent=?;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+
+    try:
+        rows = session.execute(
+            prepared_statement,
+            parameters
+        )
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+    if not rows.current_rows:
+        return False
+    hub_batch_cache.set(key, True, settings.HUB_BATCH_DEDUP_SECONDS)
+    return True
+
+
+@metrics.timed('cassandra_query_seconds')
+def mark_hub_batch(hub_id, batch_sent):
+    """
+    Records that a hub batch's readings are stored. Returns False if
+    another request recorded it first, which a lightweight transaction on
+    the marker table decides, so only one of two copies of a batch
+    stored at once is counted.
+    """
+
+    key = (int(hub_id), int(batch_sent))
+    table = os.environ.get('DB_HUB_BATCH_TABLE', 'hub_batches')
+    parameters = {
+        'hubid': key[0],
+        'batchsent': key[1],
+        'received': int(time.time() * 1000),
+    }
+    query = (
+        'INSERT INTO {} (hubid, batchsent, received) '
+        'VALUES (?, ?, ?) IF NOT EXISTS;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+
+    try:
+        rows = session.execute(
+            prepared_statement,
+            parameters
+        )
+        hub_batch_cache.set(key, True, settings.HUB_BATCH_DEDUP_SECONDS)
+        return rows.was_applied
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_hub_upload_offset(hub_id, upload_id):
+    """
+    Returns the stream offset up to which a streamed hub upload is
+    stored, or 0 for an upload not seen before.
+    """
+
+    session.row_factory = named_tuple_factory
+    table = os.environ.get('DB_HUB_UPLOAD_TABLE', 'hub_uploads')
+    parameters = {
+        'hubid': int(hub_id),
+        'uploadid': str(upload_id),
+    }
+    query = (
+        'SELECT committed FROM {} WHERE hubid=? AND uploadid=?;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+
+    try:
+        rows = session.execute(
+            prepared_statement,
+            parameters
+        )
+        if not rows:
+            return 0
+        return rows[0].committed
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def set_hub_upload_offset(hub_id, upload_id, committed, batches):
+    """
+    Records how far a streamed hub upload is stored, and how many
+    batches that took, so the hub can resume from there.
+    """
+
+    table = os.environ.get('DB_HUB_UPLOAD_TABLE', 'hub_uploads')
+    parameters = {
+        'hubid': int(hub_id),
+        'uploadid': str(upload_id),
+        'committed': int(committed),
+        'batches': int(batches),
+    }
+    query = (
+        'INSERT INTO {} (hubid, uploadid, committed, batches) '
+        'VALUES (?, ?, ?, ?);'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+
+    try:
+        session.execute(
+            prepared_statement,
+            parameters
+        )
+        return True
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_vineyard_retention(vineyard_id):
+    """
+    Returns the days raw readings from a vineyard are kept, its own
+    setting or ENV_DATA_RETENTION_DAYS. 0 keeps them forever.
+    """
+
+    vineyard_id = int(vineyard_id)
+    retention = vineyard_retention_cache.get(vineyard_id)
+    if retention is not None:
+        return retention
+
+    session.row_factory = named_tuple_factory
+    table = os.environ.get('DB_VINE_RETENTION_TABLE', 'vineyard_retention')
+    parameters = {
+        'vineid': vineyard_id,
+    }
+    query = (
+        'SELECT rawdays FROM {} WHERE vineid=?;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+
+    try:
+        rows = session.execute(
+            prepared_statement,
+            parameters
+        )
+        if rows and rows[0].rawdays is not None:
+            retention = rows[0].rawdays
+        else:
+            retention = settings.ENV_DATA_RETENTION_DAYS
+        vineyard_retention_cache.set(
+            vineyard_id,
+            retention,
+            settings.ENV_DATA_RETENTION_CACHE_SECONDS
+        )
+        return retention
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def set_vineyard_retention(vineyard_id, days):
+    """
+    Sets the days raw readings from a vineyard are kept. Applies to
+    readings stored from then on; other processes pick it up within
+    ENV_DATA_RETENTION_CACHE_SECONDS.
+    """
+
+    table = os.environ.get('DB_VINE_RETENTION_TABLE', 'vineyard_retention')
+    parameters = {
+        'vineid': int(vineyard_id),
+        'rawdays': int(days),
+    }
+    query = (
+        'INSERT INTO {} (vineid, rawdays) VALUES (?, ?);'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+
+    try:
+        session.execute(
+            prepared_statement,
+            parameters
+        )
+        vineyard_retention_cache.invalidate(parameters['vineid'])
+        return True
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_vineyard_blocks(vineyard_id):
+    """
+    Returns the named blocks of a vineyard, such as rows or variety
+    blocks, as {name: [{'lat', 'lon'}]} boundary points.
+    """
+
+    session.row_factory = named_tuple_factory
+    table = os.environ.get('DB_VINE_BLOCK_TABLE', 'vineyard_blocks')
+    parameters = {
+        'vineid': int(vineyard_id),
+    }
+    query = (
+        'SELECT blocks FROM {} WHERE vineid=?;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+
+    try:
+        rows = session.execute(
+            prepared_statement,
+            parameters
+        )
+        if not rows or not rows[0].blocks:
+            return {}
+        return {
+            name: [{'lat': point[0], 'lon': point[1]} for point in points]
+            for name, points in rows[0].blocks.items()
+        }
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def set_vineyard_blocks(vineyard_id, blocks):
+    """
+    Replaces the blocks of a vineyard with blocks, {name: [{'lat',
+    'lon'}]}.
+    """
+
+    table = os.environ.get('DB_VINE_BLOCK_TABLE', 'vineyard_blocks')
+    parameters = {
+        'vineid': int(vineyard_id),
+        'blocks': {
+            str(name): [
+                (float(point['lat']), float(point['lon']))
+                for point in points
+            ]
+            for name, points in blocks.items()
+        },
+    }
+    query = (
+        'INSERT INTO {} (vineid, blocks) VALUES (?, ?);'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+
+    try:
+        session.execute(
+            prepared_statement,
+            parameters
+        )
+        return True
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_vineyard_ids():
+    """
+    Returns the id of every vineyard.
+    """
+
+    session.row_factory = named_tuple_factory
+    table = os.environ.get('DB_VINE_TABLE')
+    query = (
+        'SELECT vineid FROM {};'
+    )
+
+    try:
+        rows = session.execute(query.format(table))
+        return [row.vineid for row in rows]
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def store_env_summary(vineyard_id, node_id, day, summary):
+    """
+    Stores a node's daily summary: the number of readings and the
+    minimum, maximum and mean of each environmental variable, as made
+    by maintenance compact_env_data. day is an int like 20161019.
+    """
+
+    table = os.environ.get('DB_ENV_SUMMARY_TABLE', 'env_data_daily')
+    parameters = {
+        'nodeid': int(node_id),
+        'day': int(day),
+        'vineid': int(vineyard_id),
+        'readings': summary['readings'],
+    }
+    for variable in ('temperature', 'humidity', 'leafwetness'):
+        for statistic in ('min', 'max', 'mean'):
+            parameters[variable + statistic] = summary[variable][statistic]
+    query = (
+        'INSERT INTO {} ({}) VALUES ({});'
+    )
+    prepared_statement = session.prepare(
+        query.format(
+            table,
+            ', '.join(parameters),
+            ', '.join('?' for _ in parameters)
+        )
+    )
+
+    try:
+        session.execute(
+            prepared_statement,
+            parameters
+        )
+        return True
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+def store_env_data(env_data):
+    """
+    Inserts environmental data, received from a hub, into the database.
+    Returns False without writing if the batch was already stored, as
+    when a hub retries after a timeout.
+    """
+
+    rows = [
+        (
+            data_point['node_id'],
+            data_point['data_sent'],
+            data_point['temperature'],
+            data_point['humidity'],
+            data_point['leafwetness'],
+        )
+        for data_point in env_data['hub_data']
+    ]
+    return store_env_rows(
+        env_data['vine_id'],
+        env_data['hub_id'],
+        env_data['batch_sent'],
+        rows
+    )
+
+
+def store_env_rows(vine_id, hub_id, batch_sent, rows):
+    """
+    Inserts a hub batch given as (node_id, data_sent, temperature,
+    humidity, leafwetness) rows, the layout of binary hub uploads, so
+    they reach the insert without being turned into dicts, and moves
+    its nodes' state forward over them. Returns False if the batch was
+    already stored.
+    """
+
+    if not insert_env_rows(vine_id, hub_id, batch_sent, rows):
+        return False
+    update_node_states(vine_id, hub_id, rows)
+    return True
+
+
+@metrics.timed('cassandra_query_seconds')
+def insert_env_rows(vine_id, hub_id, batch_sent, rows):
+    """
+    Inserts a hub batch, given as for store_env_rows, without touching
+    its nodes' state. Returns False if the batch was already stored,
+    without writing it unless another copy was being stored at the same
+    time. With bucketed environmental data the rows go in batch_sent's
+    bucket. Rows expire after the vineyard's retention period.
+    """
+
+    if env_data_bucketed():
+        table = os.environ.get('DB_ENV_BUCKET_TABLE', 'env_data_by_bucket')
+        query = (
+            'INSERT INTO {} (nodeid, bucket, batchsent, datasent, hubid, '
+            'humidity, leafwetness, temperature, vineid) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) USING TTL ?'
+        )
+        key = (timebuckets.bucket_for(batch_sent, settings.ENV_DATA_BUCKET),)
+    else:
+        table = os.environ.get('DB_ENV_TABLE')
+        query = (
+            'INSERT INTO {} (nodeid, batchsent, datasent, hubid, '
+            'humidity, leafwetness, temperature, vineid) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) USING TTL ?'
+        )
+        key = ()
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+    batch_statement = connection.new_batch()
+
+    if hub_batch_stored(hub_id, batch_sent):
+        metrics.increment('ingest_duplicate_batches_total')
+        return False
+
+    try:
+        ttl = get_vineyard_retention(vine_id) * 24 * 60 * 60
+        for node_id, data_sent, temperature, humidity, leafwetness in rows:
+            batch_statement.add(
+                prepared_statement,
+                (node_id,) + key + (
+                    batch_sent,
+                    data_sent,
+                    hub_id,
+                    humidity,
+                    leafwetness,
+                    temperature,
+                    vine_id,
+                    ttl
+                )
+            )
+        session.execute(batch_statement)
+        # Only once the readings are written, since caches keyed on the
+        # hub's latest batch time and the health check read it as the
+        # time of the newest stored batch.
+        set_latest_batch_time(
+            int(vine_id),
+            int(hub_id),
+            batch_sent,
+            [row[0] for row in rows]
+        )
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: '.format(str(e)))
+
+    # The marker is written only once the readings are, so a batch whose
+    # write failed or never finished is accepted when the hub retries. A
+    # retry stored alongside the first copy writes the same rows, and the
+    # marker lets only one of them count the batch.
+    if not mark_hub_batch(hub_id, batch_sent):
+        metrics.increment('ingest_duplicate_batches_total')
+        return False
+    metrics.increment('ingest_batches_total')
+    metrics.increment('ingest_rows_total', amount=len(rows))
+    return True
+
+
+def update_node_states(vine_id, hub_id, rows):
+    """
+    Moves the risk, growing degree-day, alert and sensor state of the
+    nodes in a stored hub batch, given as for store_env_rows, forward
+    over its readings. Each state is read, moved on and written back
+    without a lock, so batches of the same nodes must be passed one at a
+    time, oldest first.
+    """
+
+    # The readings are stored by now, so a failure here is logged rather
+    # than failing the batch; the state catches up on the next one.
+    for name, update in (
+        ('risk', update_risk_states),
+        ('gdd', update_gdd_states),
+        ('alerts', update_alert_states),
+        ('sensors', update_sensor_states),
+    ):
+        try:
+            update(vine_id, rows)
+        except Exception:
+            metrics.increment('ingest_state_errors_total', name)
+            logger.exception(
+                'Error updating {} state for hub {}.'.format(name, hub_id)
+            )
+
+
+RISK_COLUMNS = (
+    ('last_sent', 'lastsent'),
+    ('wet_hours', 'wethours'),
+    ('wet_degree_hours', 'wetdegreehours'),
+    ('last_infection', 'lastinfection'),
+    ('powdery_index', 'powderyindex'),
+    ('powdery_day', 'powderyday'),
+    ('powdery_run', 'powderyrun'),
+    ('powdery_best', 'powderybest'),
+)
+
+
+def _get_node_states(table, columns, node_ids):
+    """
+    Reads the one-row-per-node state table for nodes concurrently and
+    returns {node_id: {key: value}} for the (key, column) pairs in
+    columns. Nodes without a row are left out.
+    """
+
+    session.row_factory = named_tuple_factory
+    query = (
+        'SELECT {} FROM {} WHERE nodeid=?;'
+    )
+    prepared_statement = session.prepare(query.format(
+        ', '.join(column for _, column in columns),
+        table
+    ))
+
+    try:
+        futures = [
+            (
+                int(node_id),
+                session.execute_async(prepared_statement, (int(node_id),))
+            )
+            for node_id in set(node_ids)
+        ]
+        states = {}
+        for node_id, future in futures:
+            rows = future.result().current_rows
+            if rows:
+                states[node_id] = {
+                    key: getattr(rows[0], column)
+                    for key, column in columns
+                }
+        return states
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_risk_states(node_ids):
+    """
+    Returns the disease risk state of nodes, as {node_id: state} in the
+    form used by common.risk. Nodes without a state are left out. The
+    node partitions are read concurrently.
+    """
+
+    return _get_node_states(
+        os.environ.get('DB_RISK_TABLE', 'node_risk'),
+        RISK_COLUMNS,
+        node_ids
+    )
+
+
+@metrics.timed('cassandra_query_seconds')
+def update_risk_states(vine_id, rows):
+    """
+    Moves the risk state of each node in a hub batch, given as for
+    store_env_rows, forward over its readings.
+    """
+
+    readings = {}
+    for node_id, data_sent, temperature, humidity, leafwetness in rows:
+        readings.setdefault(int(node_id), []).append(
+            (data_sent, temperature, leafwetness)
+        )
+    if not readings:
+        return
+    states = get_risk_states(readings)
+
+    table = os.environ.get('DB_RISK_TABLE', 'node_risk')
+    query = (
+        'INSERT INTO {} (nodeid, vineid, {}) VALUES (?, ?, {});'
+    )
+    prepared_statement = session.prepare(query.format(
+        table,
+        ', '.join(column for _, column in RISK_COLUMNS),
+        ', '.join('?' for _ in RISK_COLUMNS)
+    ))
+    batch_statement = connection.new_batch()
+    for node_id, node_readings in readings.items():
+        state = risk.apply(
+            states.get(node_id) or risk.new_state(),
+            node_readings
+        )
+        batch_statement.add(
+            prepared_statement,
+            (node_id, int(vine_id)) + tuple(
+                state[key] for key, _ in RISK_COLUMNS
+            )
+        )
+
+    try:
+        session.execute(batch_statement)
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_sensor_states(node_ids):
+    """
+    Returns the sensor health of nodes, as {node_id: state} in the form
+    used by common.sensors. Nodes without a state are left out. The node
+    partitions are read concurrently.
+    """
+
+    rows = _get_node_states(
+        os.environ.get('DB_SENSOR_TABLE', 'node_sensors'),
+        (('health', 'health'),),
+        node_ids
+    )
+    return {
+        node_id: sensors.decode(row['health'])
+        for node_id, row in rows.items()
+        if row['health']
+    }
+
+
+@metrics.timed('cassandra_query_seconds')
+def update_sensor_states(vine_id, rows):
+    """
+    Moves the sensor health of each node in a hub batch, given as for
+    store_env_rows, forward over its readings.
+    """
+
+    readings = {}
+    for node_id, data_sent, temperature, humidity, leafwetness in rows:
+        readings.setdefault(int(node_id), []).append(
+            (data_sent, temperature, humidity, leafwetness)
+        )
+    if not readings:
+        return
+    states = get_sensor_states(readings)
+
+    table = os.environ.get('DB_SENSOR_TABLE', 'node_sensors')
+    query = (
+        'INSERT INTO {} (nodeid, vineid, health) VALUES (?, ?, ?);'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+    batch_statement = connection.new_batch()
+    for node_id, node_readings in readings.items():
+        state = states.get(node_id) or sensors.new_state()
+        spiked = sensors.apply(state, node_readings)
+        for variable, spikes in spiked.items():
+            metrics.increment('sensor_spikes_total', variable, spikes)
+        batch_statement.add(
+            prepared_statement,
+            (node_id, int(vine_id), state.encode())
+        )
+
+    try:
+        session.execute(batch_statement)
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+GDD_COLUMNS = (
+    ('last_sent', 'lastsent'),
+    ('season', 'season'),
+    ('total', 'total'),
+    ('day', 'day'),
+    ('day_min', 'daymin'),
+    ('day_max', 'daymax'),
+)
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_gdd_states(node_ids):
+    """
+    Returns the growing degree-day accumulator of nodes, as {node_id:
+    state} in the form used by common.gdd. Nodes without one are left
+    out. The node partitions are read concurrently.
+    """
+
+    return _get_node_states(
+        os.environ.get('DB_GDD_TABLE', 'node_gdd'),
+        GDD_COLUMNS,
+        node_ids
+    )
+
+
+@metrics.timed('cassandra_query_seconds')
+def set_gdd_states(vine_id, states, finished):
+    """
+    Writes growing degree-day accumulators, {node_id: state}, and the
+    days they finished, {node_id: [(day, lowest, highest, degree-days)]},
+    in one batch.
+    """
+
+    state_statement = session.prepare((
+        'INSERT INTO {} (nodeid, vineid, {}) VALUES (?, ?, {});'
+    ).format(
+        os.environ.get('DB_GDD_TABLE', 'node_gdd'),
+        ', '.join(column for _, column in GDD_COLUMNS),
+        ', '.join('?' for _ in GDD_COLUMNS)
+    ))
+    day_statement = session.prepare((
+        'INSERT INTO {} (nodeid, season, day, vineid, tmin, tmax, gdd) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?);'
+    ).format(
+        os.environ.get('DB_GDD_DAILY_TABLE', 'node_gdd_daily')
+    ))
+    batch_statement = connection.new_batch()
+    for node_id, state in states.items():
+        batch_statement.add(
+            state_statement,
+            (int(node_id), int(vine_id)) + tuple(
+                state[key] for key, _ in GDD_COLUMNS
+            )
+        )
+    for node_id, days in finished.items():
+        for day, lowest, highest, degree_days in days:
+            batch_statement.add(
+                day_statement,
+                (
+                    int(node_id),
+                    gdd.season_of(day),
+                    day,
+                    int(vine_id),
+                    lowest,
+                    highest,
+                    degree_days,
+                )
+            )
 
-from common.exceptions import *
-from common.errors import *
-from cassandra.auth import PlainTextAuthProvider
-from cassandra.cluster import Cluster
-from cassandra.query import named_tuple_factory, BatchStatement
+    try:
+        session.execute(batch_statement)
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
 
 
-auth = PlainTextAuthProvider(
-            username=os.environ.get('DB_USERNAME'),
-            password=os.environ.get('DB_PASSWORD')
-)
-cluster = Cluster(
-            [os.environ.get('DB_HOST')],
-            auth_provider=auth
-)
-session = cluster.connect(os.environ.get('DB_KEYSPACE'))
+@metrics.timed('cassandra_query_seconds')
+def update_gdd_states(vine_id, rows):
+    """
+    Moves the growing degree-day accumulator of each node in a hub
+    batch, given as for store_env_rows, forward over its readings.
+    """
+
+    readings = {}
+    for node_id, data_sent, temperature, humidity, leafwetness in rows:
+        readings.setdefault(int(node_id), []).append(
+            (data_sent, temperature)
+        )
+    if not readings:
+        return
+    states = get_gdd_states(readings)
+    finished = {}
+    for node_id, node_readings in readings.items():
+        state = states.setdefault(node_id, gdd.new_state())
+        finished[node_id] = gdd.apply(state, node_readings)
+    set_gdd_states(vine_id, states, finished)
+
+
+@metrics.timed('cassandra_query_seconds')
+def get_gdd_daily(node_ids, season):
+    """
+    Returns the finished days of a season for nodes, as {node_id: [(day,
+    degree-days)]} oldest first. The node partitions are read
+    concurrently.
+    """
 
+    session.row_factory = named_tuple_factory
+    table = os.environ.get('DB_GDD_DAILY_TABLE', 'node_gdd_daily')
+    query = (
+        'SELECT day, gdd FROM {} WHERE nodeid=? AND season=?;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
 
-def get_env_data(node_id, env_variable):
+    try:
+        futures = [
+            (
+                int(node_id),
+                session.execute_async(
+                    prepared_statement,
+                    (int(node_id), int(season))
+                )
+            )
+            for node_id in set(node_ids)
+        ]
+        return {
+            node_id: [(row.day, row.gdd) for row in future.result()]
+            for node_id, future in futures
+        }
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+def _alert_rules(vineyard_id):
     """
-    Obtains temperature, humidity, or leaf wetness dataset for a
-    supplied node id and environmental variable.
+    Returns {'rules', 'compiled'} for a vineyard, from the cache when it
+    is fresh.
     """
 
-    supported_env_variables = [
-        'leafwetness',
-        'humidity',
-        'temperature',
-    ]
-    if env_variable not in supported_env_variables:
-        raise PlantalyticsDataException(ENV_DATA_INVALID)
+    vineyard_id = int(vineyard_id)
+    entry = alert_rules_cache.get(vineyard_id)
+    if entry is not None:
+        return entry
 
     session.row_factory = named_tuple_factory
-    table = str(os.environ.get('DB_ENV_TABLE'))
+    table = os.environ.get('DB_ALERT_RULE_TABLE', 'alert_rules')
     parameters = {
-        'nodeid': int(node_id),
+        'vineid': vineyard_id,
     }
     query = (
-        'SELECT {} FROM {} WHERE nodeid=? LIMIT 1;'
+        'SELECT rules FROM {} WHERE vineid=?;'
     )
     prepared_statement = session.prepare(
-        query.format(str(env_variable), str(table))
+        query.format(table)
     )
 
     try:
@@ -58,132 +1539,197 @@ def get_env_data(node_id, env_variable):
             prepared_statement,
             parameters
         )
-        if not rows:
-            raise PlantalyticsDataException(ENV_DATA_NOT_FOUND)
-        else:
-            # Extract requested environmental variable.
-            if env_variable == 'temperature':
-                return rows[0].temperature
-            elif env_variable == 'humidity':
-                return rows[0].humidity
-            elif env_variable == 'leafwetness':
-                return rows[0].leafwetness
-            else:
-                # Shouldn't reach this point, but here for completeness
-                raise PlantalyticsDataException(ENV_DATA_UNKNOWN)
-    except PlantalyticsDataException as e:
-        raise e
+        rules = json.loads(rows[0].rules) if rows and rows[0].rules else []
+        entry = {
+            'rules': rules,
+            'compiled': alerts.compile_rules(rules),
+        }
+        alert_rules_cache.set(
+            vineyard_id,
+            entry,
+            settings.ALERT_RULES_CACHE_SECONDS
+        )
+        return entry
+    # Unknown exception
     except Exception as e:
-        raise Exception('Transaction Error Occurred: '.format(str(e)))
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
 
 
-def check_latest_batch_time(vineyard_id):
+@metrics.timed('cassandra_query_seconds')
+def get_alert_rules(vineyard_id):
     """
-    Checks hub timestamps for submitted vineyard id.
+    Returns a vineyard's alert rules, as checked by
+    common.alerts.check_rules.
     """
 
-    table = os.environ.get('DB_HW_TABLE')
+    return _alert_rules(vineyard_id)['rules']
+
+
+@metrics.timed('cassandra_query_seconds')
+def set_alert_rules(vineyard_id, rules):
+    """
+    Replaces a vineyard's alert rules with rules checked by
+    common.alerts.check_rules. Other processes pick them up within
+    ALERT_RULES_CACHE_SECONDS.
+    """
+
+    table = os.environ.get('DB_ALERT_RULE_TABLE', 'alert_rules')
     parameters = {
         'vineid': int(vineyard_id),
+        'rules': json.dumps(rules),
     }
     query = (
-        'SELECT lasthubbatchsent FROM {} WHERE vineid=?;'
+        'INSERT INTO {} (vineid, rules) VALUES (?, ?);'
     )
     prepared_statement = session.prepare(
         query.format(table)
     )
 
     try:
-        rows = session.execute(
+        session.execute(
             prepared_statement,
             parameters
         )
-        if not rows:
-            raise PlantalyticsDataException(VINEYARD_ID_NOT_FOUND)
-        return rows
-    except PlantalyticsDataException as e:
-        raise e
+        alert_rules_cache.invalidate(parameters['vineid'])
+        return True
+    # Unknown exception
     except Exception as e:
-        raise Exception('Transaction Error Occurred: '.format(str(e)))
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
 
 
-def set_latest_batch_time(vineyard_id, hub_id, batch_sent, hub_data):
+@metrics.timed('cassandra_query_seconds')
+def get_alert_states(vineyard_id):
     """
-    Inserts timestamp for latest data, received from a hub, into the database.
+    Returns the alert state of a vineyard's nodes, as {(rule_id,
+    node_id): {'since', 'fired', 'value', 'last_sent'}}.
     """
 
-    table = os.environ.get('DB_HW_TABLE')
+    session.row_factory = named_tuple_factory
+    table = os.environ.get('DB_ALERT_STATE_TABLE', 'alert_state')
     parameters = {
-        'vineid': vineyard_id,
-        'hubid': hub_id,
-        'lasthubbatchsent': batch_sent,
+        'vineid': int(vineyard_id),
     }
     query = (
-        'UPDATE {} SET lasthubbatchsent=? '
-        'WHERE vineid=? AND hubid=? AND nodeid=?;'
+        'SELECT ruleid, nodeid, since, fired, value, lastsent FROM {} '
+        'WHERE vineid=?;'
     )
     prepared_statement = session.prepare(
         query.format(table)
     )
-    batch_statement = BatchStatement()
 
     try:
-        for data_point in hub_data:
-            parameters['nodeid'] = int(data_point['node_id'])
-            batch_statement.add(
-                prepared_statement,
-                parameters
+        rows = session.execute(
+            prepared_statement,
+            parameters
+        )
+        return {
+            (row.ruleid, row.nodeid): {
+                'since': row.since,
+                'fired': bool(row.fired),
+                'value': row.value,
+                'last_sent': row.lastsent,
+            }
+            for row in rows
+        }
+    # Unknown exception
+    except Exception as e:
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def set_alert_states(vineyard_id, states):
+    """
+    Writes alert states, {(rule_id, node_id): state}, in one batch.
+    """
+
+    table = os.environ.get('DB_ALERT_STATE_TABLE', 'alert_state')
+    query = (
+        'INSERT INTO {} (vineid, ruleid, nodeid, since, fired, value, '
+        'lastsent) VALUES (?, ?, ?, ?, ?, ?, ?);'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
+    )
+    batch_statement = connection.new_batch()
+    for (rule_id, node_id), state in states.items():
+        batch_statement.add(
+            prepared_statement,
+            (
+                int(vineyard_id),
+                rule_id,
+                int(node_id),
+                state['since'],
+                state['fired'],
+                state['value'],
+                state['last_sent'],
             )
+        )
+
+    try:
         session.execute(batch_statement)
-        return True
     # Unknown exception
     except Exception as e:
-        raise Exception('Transaction Error Occurred: '.format(str(e)))
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
 
 
-def store_env_data(env_data):
+@metrics.timed('cassandra_query_seconds')
+def claim_alert(vineyard_id, rule_id, node_id, since):
     """
-    Inserts environmental data, received from a hub, into the database.
+    Records that an alert episode has been notified. Returns False if
+    another process got there first, through a lightweight transaction.
     """
 
-    table = os.environ.get('DB_ENV_TABLE')
+    table = os.environ.get('DB_ALERT_SENT_TABLE', 'alert_notifications')
+    parameters = {
+        'vineid': int(vineyard_id),
+        'ruleid': rule_id,
+        'nodeid': int(node_id),
+        'since': int(since),
+    }
     query = (
-        'INSERT INTO {} (nodeid, batchsent, datasent, hubid, '
-        'humidity, leafwetness, temperature, vineid) '
-        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+        'INSERT INTO {} (vineid, ruleid, nodeid, since) '
+        'VALUES (?, ?, ?, ?) IF NOT EXISTS;'
     )
     prepared_statement = session.prepare(
         query.format(table)
     )
-    batch_statement = BatchStatement()
 
     try:
-        set_latest_batch_time(
-            int(env_data.get('vine_id', '')),
-            int(env_data.get('hub_id', '')),
-            env_data.get('batch_sent', ''),
-            env_data.get('hub_data', '')
-        )
-        for data_point in env_data['hub_data']:
-            data = (
-                data_point['node_id'],
-                env_data['batch_sent'],
-                data_point['data_sent'],
-                env_data['hub_id'],
-                data_point['humidity'],
-                data_point['leafwetness'],
-                data_point['temperature'],
-                env_data['vine_id']
-            )
-            batch_statement.add(
-                prepared_statement,
-                data
-            )
-        session.execute(batch_statement)
+        rows = session.execute(
+            prepared_statement,
+            parameters
+        )
+        return rows.was_applied
+    # Unknown exception
     except Exception as e:
-        raise Exception('Transaction Error Occurred: '.format(str(e)))
+        raise Exception('Transaction Error Occurred: {}'.format(str(e)))
+
+
+@metrics.timed('cassandra_query_seconds')
+def update_alert_states(vine_id, rows):
+    """
+    Checks a hub batch, given as for store_env_rows, against the
+    vineyard's alert rules, stores the states that changed and queues a
+    notification for each alert that fired.
+    """
+
+    compiled = _alert_rules(vine_id)['compiled']
+    if not compiled:
+        return
+    states = get_alert_states(vine_id)
+    changed, fired = alerts.evaluate(compiled, states, rows)
+    if changed:
+        set_alert_states(vine_id, changed)
+    fired = [
+        (rule, node_id, state) for rule, node_id, state in fired
+        if claim_alert(vine_id, rule['rule_id'], node_id, state['since'])
+    ]
+    if fired:
+        metrics.increment('alerts_fired_total', amount=len(fired))
+        alerts.notify(get_vineyard_name(vine_id), fired)
 
 
+@metrics.timed('cassandra_query_seconds')
 def get_vineyard_coordinates(vineyard_id):
     """
     Obtains the coordinates for center point and boundary points of a vineyard
@@ -241,6 +1787,7 @@ def get_vineyard_coordinates(vineyard_id):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def get_node_coordinates(vineyard_id):
     """
     Obtains the latitude and longitude coordinates for the nodes of a vineyard
@@ -262,6 +1809,10 @@ def get_node_coordinates(vineyard_id):
         # Confirms vineyard_id is an integer
         # Raises ValueError if not
         vineyard_id = int(vineyard_id)
+        # Node locations rarely change, so serve recent lookups from memory.
+        coordinates = node_coordinates_cache.get(vineyard_id)
+        if coordinates is not None:
+            return coordinates
         parameters = {
             'vineid': vineyard_id,
         }
@@ -281,6 +1832,11 @@ def get_node_coordinates(vineyard_id):
                 'lon': node.nodelocation[1],
             }
             coordinates.append(location)
+        node_coordinates_cache.set(
+            vineyard_id,
+            coordinates,
+            settings.NODE_COORDINATES_CACHE_SECONDS
+        )
         return coordinates
     except PlantalyticsException as e:
         raise e
@@ -290,6 +1846,7 @@ def get_node_coordinates(vineyard_id):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def get_user_password(username):
     """
     Obtains password for the requested user.
@@ -326,6 +1883,7 @@ def get_user_password(username):
         raise Exception('Transaction Error Occurred: {}'.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def get_user_email(username):
     """
     Obtains email for the requested user.
@@ -362,6 +1920,7 @@ def get_user_email(username):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def get_authorized_vineyards(username):
     """
     Obtains authorized vineyard ids for requested user.
@@ -427,6 +1986,7 @@ def get_authorized_vineyards(username):
         raise Exception('Transaction Error Occurred: ' + str(e))
 
 
+@metrics.timed('cassandra_query_seconds')
 def get_vineyard_name(vineyard_id):
     """
     Obtains vineyard name for the submitted vineyard id.
@@ -460,6 +2020,7 @@ def get_vineyard_name(vineyard_id):
         raise Exception('Transaction Error Occurred: ' + str(e))
 
 
+@metrics.timed('cassandra_query_seconds')
 def get_user_auth_token(username, password):
     """
     Obtains session authentication token for the requested user.
@@ -471,10 +2032,9 @@ def get_user_auth_token(username, password):
     table = str(os.environ.get('DB_USER_TABLE'))
     parameters = {
         'username': username,
-        'password': password,
     }
     query = (
-        'SELECT securitytoken FROM {} WHERE username=? AND password=?;'
+        'SELECT password, securitytoken FROM {} WHERE username=?;'
     )
     prepared_statement = session.prepare(
         query.format(table)
@@ -487,6 +2047,8 @@ def get_user_auth_token(username, password):
         )
         if not rows:
             raise PlantalyticsAuthException(AUTH_NOT_FOUND)
+        if not passwords.check_password(password, rows[0].password):
+            raise PlantalyticsAuthException(AUTH_NOT_FOUND)
         else:
             return rows[0].securitytoken
     # Known exception
@@ -497,6 +2059,7 @@ def get_user_auth_token(username, password):
         raise Exception('Transaction Error Occurred: ' + str(e))
 
 
+@metrics.timed('cassandra_query_seconds')
 def set_user_auth_token(username, password, auth_token):
     """
     Stores the session authentication token for the requested user.
@@ -507,11 +2070,10 @@ def set_user_auth_token(username, password, auth_token):
     table = str(os.environ.get('DB_USER_TABLE'))
     parameters = {
         'username': username,
-        'password': password,
         'securitytoken': auth_token,
     }
     query = (
-        'INSERT INTO {} (username, password, securitytoken) VALUES(?, ?, ?);'
+        'UPDATE {} SET securitytoken=? WHERE username=?;'
     )
     prepared_statement = session.prepare(
         query.format(table)
@@ -532,6 +2094,7 @@ def set_user_auth_token(username, password, auth_token):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def verify_auth_token(auth_token):
     """
     Verifies session authentication token exists in the database.
@@ -565,76 +2128,42 @@ def verify_auth_token(auth_token):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def change_user_password(username, new_password, old_password):
     """
     Changes current password of the supplied username
-    to the supplied password.
+    to the supplied password. The change is a single conditional
+    update, so it only applies while the stored password still
+    matches the supplied old (stored, possibly hashed) password.
     """
 
     session.row_factory = named_tuple_factory
     table = str(os.environ.get('DB_USER_TABLE'))
-    parameters = {
-        'username': username,
-    }
+    # Positional, since the new and old values share the password column.
+    parameters = (
+        passwords.make_password(new_password),
+        username,
+        old_password,
+    )
     query = (
-        'SELECT * FROM {} WHERE username=?;'
+        'UPDATE {} SET password=? WHERE username=? IF password=?;'
     )
     prepared_statement = session.prepare(
         query.format(table)
     )
 
     try:
-        # Verify that the supplied username exists
+        if username == '':
+            raise PlantalyticsAuthException(RESET_ERROR_USERNAME)
         rows = session.execute(
             prepared_statement,
             parameters
         )
-        if not rows:
-            raise PlantalyticsAuthException(RESET_ERROR_USERNAME)
-
-        # Insert new row with new password.
-        new_row_values = {
-            'username': rows[0].username,
-            'password': new_password,
-            'admin': rows[0].admin,
-            'email': rows[0].email,
-            'enable': rows[0].enable,
-            'securitytoken': rows[0].securitytoken,
-            'subenddate': rows[0].subenddate,
-            'userid': rows[0].userid,
-            'vineyards': rows[0].vineyards,
-        }
-        query = (
-            'INSERT INTO {} '
-            '(username, password, admin, email, enable, securitytoken, '
-            'subenddate, userid, vineyards) '
-            'VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?);'
-        )
-        prepared_statement = session.prepare(
-            query.format(table)
-        )
-
-        session.execute(
-            prepared_statement,
-            new_row_values
-        )
-
-        # Delete old row with old password.
-        old_row_values = {
-            'username': username,
-            'password': old_password,
-        }
-        query = (
-            'DELETE FROM {} WHERE username=? AND password=?;'
-        )
-        prepared_statement = session.prepare(
-            query.format(table)
-        )
-
-        session.execute(
-            prepared_statement,
-            old_row_values
-        )
+        if not rows.was_applied:
+            # A failed condition returns the current row, if there is one.
+            if getattr(rows[0], 'password', None) is None:
+                raise PlantalyticsAuthException(RESET_ERROR_USERNAME)
+            raise PlantalyticsLoginException(LOGIN_ERROR)
     # Known exception
     except PlantalyticsException as e:
         raise e
@@ -643,6 +2172,7 @@ def change_user_password(username, new_password, old_password):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def change_user_email(username, new_email):
     """
     Changes email address of the supplied username
@@ -656,19 +2186,21 @@ def change_user_email(username, new_email):
         'email': new_email,
     }
     query = (
-        'UPDATE {} SET email=? WHERE username=? AND password=?;'
+        'UPDATE {} SET email=? WHERE username=? IF EXISTS;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
     )
 
     try:
-        password = get_user_password(username)
-        parameters['password'] = password
-        prepared_statement = session.prepare(
-            query.format(table)
-        )
-        session.execute(
+        if username == '':
+            raise PlantalyticsLoginException(LOGIN_ERROR)
+        rows = session.execute(
             prepared_statement,
             parameters
         )
+        if not rows.was_applied:
+            raise PlantalyticsLoginException(LOGIN_ERROR)
         return True
     # Known exception
     except PlantalyticsException as e:
@@ -678,6 +2210,7 @@ def change_user_email(username, new_email):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def verify_authenticated_admin(auth_token):
     """
     Verifies if supplied auth token belongs to an admin user.
@@ -710,6 +2243,7 @@ def verify_authenticated_admin(auth_token):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def get_user_info(username):
     """
     Obtains email, user id, and vineyard ids for submitted user.
@@ -752,6 +2286,7 @@ def get_user_info(username):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def create_new_user(new_user_info):
     """
     Creates new user in DB using the submitted info.
@@ -761,7 +2296,9 @@ def create_new_user(new_user_info):
     table = str(os.environ.get('DB_USER_TABLE'))
     parameters = {
             'username': new_user_info.get('username', ''),
-            'password': new_user_info.get('password', ''),
+            'password': passwords.make_password(
+                new_user_info.get('password', '')
+            ),
             'email': new_user_info.get('email', ''),
             'admin': new_user_info.get('admin', ''),
             'enable': new_user_info.get('enable', ''),
@@ -791,6 +2328,7 @@ def create_new_user(new_user_info):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def update_user_subscription(username, sub_end_date):
     """
     Updates the subscription end date for the supplied user.
@@ -803,25 +2341,23 @@ def update_user_subscription(username, sub_end_date):
         'subenddate': sub_end_date,
     }
     query = (
-        'UPDATE {} SET subenddate=? WHERE username=? AND password=?;'
+        'UPDATE {} SET subenddate=? WHERE username=? IF EXISTS;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
     )
 
     try:
-        password = get_user_password(username)
-        if not password:
+        if username == '':
             raise PlantalyticsAuthException(USER_INVALID)
-        parameters['password'] = password
-        prepared_statement = session.prepare(
-            query.format(table)
-        )
-        session.execute(
+        rows = session.execute(
             prepared_statement,
             parameters
         )
+        if not rows.was_applied:
+            raise PlantalyticsAuthException(USER_INVALID)
         return True
     # Known exception
-    except PlantalyticsLoginException as e:
-            raise PlantalyticsAuthException(USER_INVALID)
     except PlantalyticsException as e:
         raise e
     # Unknown exception
@@ -829,6 +2365,7 @@ def update_user_subscription(username, sub_end_date):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def disable_user(username):
     """
     Disables user in DB for submitted username.
@@ -841,25 +2378,23 @@ def disable_user(username):
         'enable': False,
     }
     query = (
-        'UPDATE {} SET enable=? WHERE username=? AND password=?;'
+        'UPDATE {} SET enable=? WHERE username=? IF EXISTS;'
+    )
+    prepared_statement = session.prepare(
+        query.format(table)
     )
 
     try:
-        password = get_user_password(username)
-        if not password:
+        if username == '':
             raise PlantalyticsAuthException(USER_INVALID)
-        parameters['password'] = password
-        prepared_statement = session.prepare(
-            query.format(table)
-        )
-        session.execute(
+        rows = session.execute(
             prepared_statement,
             parameters
         )
+        if not rows.was_applied:
+            raise PlantalyticsAuthException(USER_INVALID)
         return True
     # Known exception
-    except PlantalyticsLoginException as e:
-            raise PlantalyticsAuthException(USER_INVALID)
     except PlantalyticsException as e:
         raise e
     # Unknown exception
@@ -867,76 +2402,61 @@ def disable_user(username):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def edit_user(user_edit_info):
     """
     Edits user info in DB using submitted info.
+    Only the supplied columns are written, in a single update.
     """
 
+    editable_columns = [
+        'password',
+        'admin',
+        'email',
+        'enable',
+        'securitytoken',
+        'subenddate',
+        'userid',
+        'vineyards',
+    ]
     session.row_factory = named_tuple_factory
     table = str(os.environ.get('DB_USER_TABLE'))
+    username = user_edit_info.get('username', '')
     parameters = {
-        'username': user_edit_info.get('username', ''),
+        'username': username,
     }
-    query = (
-        'SELECT * FROM {} WHERE username=?;'
-    )
-    prepared_statement = session.prepare(
-        query.format(table)
-    )
-    try:
-        rows = session.execute(
-            prepared_statement,
-            parameters
+    for key in editable_columns:
+        if user_edit_info.get(key, '') != '':
+            parameters[key] = user_edit_info.get(key, '')
+    if 'password' in parameters:
+        parameters['password'] = passwords.make_password(
+            parameters['password']
         )
-        if not rows:
-            raise PlantalyticsAuthException(USER_INVALID)
-        old_row = {
-            'username': rows[0].username,
-            'password': rows[0].password,
-        }
-
-        edit_row = {
-            'username': rows[0].username,
-            'password': rows[0].password,
-            'admin': rows[0].admin,
-            'email': rows[0].email,
-            'enable': rows[0].enable,
-            'securitytoken': rows[0].securitytoken,
-            'subenddate': rows[0].subenddate,
-            'userid': rows[0].userid,
-            'vineyards': rows[0].vineyards,
-        }
 
-        for key in user_edit_info:
-            if user_edit_info.get(key, '') != '':
-                edit_row[key] = user_edit_info.get(key, '')
+    try:
+        if username == '':
+            raise PlantalyticsAuthException(USER_INVALID)
+        edit_columns = [key for key in editable_columns if key in parameters]
+        if not edit_columns:
+            if not check_username_exists(username):
+                raise PlantalyticsAuthException(USER_INVALID)
+            return True
 
         query = (
-            'INSERT INTO {} '
-            '(username, password, admin, email, enable, '
-            'securitytoken, subenddate, userid, vineyards) '
-            'VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?);'
+            'UPDATE {} SET {} WHERE username=? IF EXISTS;'
         )
         prepared_statement = session.prepare(
-            query.format(table)
+            query.format(
+                table,
+                ', '.join('{}=?'.format(key) for key in edit_columns)
+            )
         )
-        session.execute(
+        rows = session.execute(
             prepared_statement,
-            edit_row
+            parameters
         )
-        new_password = edit_row.get('password', '')
-        old_password = old_row.get('password', '')
-        if (new_password != old_password):
-            query = (
-                'DELETE FROM {} WHERE username=? AND password=?;'
-            )
-            prepared_statement = session.prepare(
-                query.format(table)
-            )
-            session.execute(
-                prepared_statement,
-                old_row
-            )
+        if not rows.was_applied:
+            raise PlantalyticsAuthException(USER_INVALID)
         return True
     # Known exception
     except PlantalyticsException as e:
@@ -946,6 +2466,7 @@ def edit_user(user_edit_info):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def edit_vineyard(edit_vineyard_info):
     """
     Edits vineyard info in DB using submitted info.
@@ -1024,6 +2545,7 @@ def edit_vineyard(edit_vineyard_info):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def create_new_vineyard(new_vineyard_info):
     """
     Creates new vineyard in DB using the submitted info.
@@ -1073,6 +2595,7 @@ def create_new_vineyard(new_vineyard_info):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def get_vineyard_users(vineyard_id):
     """
     Obtains the users of the supplied vineyard id.
@@ -1106,6 +2629,7 @@ def get_vineyard_users(vineyard_id):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def get_vineyard_info(vineyard_id):
     """
     Obtains the name, owners, and users of a vineyard
@@ -1161,6 +2685,7 @@ def get_vineyard_info(vineyard_id):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def disable_vineyard(vineyard_id):
     """
     Disables vineyard in DB for submitted vineyard id.
@@ -1214,6 +2739,7 @@ def disable_vineyard(vineyard_id):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def check_username_exists(username):
     """
     Checks if submitted username exists in the database.
@@ -1247,6 +2773,7 @@ def check_username_exists(username):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def check_user_id_exists(user_id):
     """
     Checks if submitted user ID exists in the database.
@@ -1280,6 +2807,7 @@ def check_user_id_exists(user_id):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def check_vineyard_id_exists(vineyard_id):
     """
     Checks if submitted vineyard ID exists in the database.
@@ -1313,6 +2841,7 @@ def check_vineyard_id_exists(vineyard_id):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def verify_user_account(username):
     """
     Verifies if account for supplied username is enabled.
@@ -1345,6 +2874,7 @@ def verify_user_account(username):
         raise Exception('Transaction Error Occurred: '.format(str(e)))
 
 
+@metrics.timed('cassandra_query_seconds')
 def get_user_subscription(username):
     """
     Obtains subscription end date for the requested user.
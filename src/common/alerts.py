@@ -0,0 +1,195 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Threshold alerts on environmental readings, set per vineyard and checked
+against every hub batch as it is stored.
+
+A rule fires for a node when a variable stays beyond a threshold, for
+example temperature < 0 for frost or leafwetness > 80 for 360 minutes.
+Each vineyard's rules are compiled once into a tuple of checks, so a
+batch costs only its own vineyard's rules, and a vineyard without rules
+costs nothing. A rule fires once per episode: it is not sent again until
+the reading has come back within the threshold. Notifications go
+through common.mail's queue, off the request path.
+
+Rules look like:
+
+    {'rule_id': 'frost', 'variable': 'temperature', 'operator': '<',
+     'threshold': 0, 'duration_minutes': 0, 'emails': ['a@example.com']}
+"""
+
+import operator
+
+from common import risk
+from common.errors import *
+from common.exceptions import *
+from common.mail import send_mail_async
+from django.conf import settings
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+# Position of each variable in the rows cassy.store_env_rows takes.
+VARIABLE_POSITIONS = {
+    'temperature': 2,
+    'humidity': 3,
+    'leafwetness': 4,
+}
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_rules(rules):
+    """
+    Validates a vineyard's rules and returns them with defaults filled
+    in. Raises PlantalyticsDataException(DATA_INVALID) for a bad rule.
+    """
+
+    if not isinstance(rules, list) or len(rules) > settings.ALERT_MAX_RULES:
+        raise PlantalyticsDataException(DATA_INVALID)
+    checked = []
+    rule_ids = set()
+    for rule in rules:
+        if not isinstance(rule, dict):
+            raise PlantalyticsDataException(DATA_INVALID)
+        rule_id = rule.get('rule_id')
+        duration = rule.get('duration_minutes', 0)
+        emails = rule.get('emails', [])
+        invalid = (
+            not isinstance(rule_id, str) or
+            not rule_id or
+            rule_id in rule_ids or
+            rule.get('variable') not in VARIABLE_POSITIONS or
+            rule.get('operator') not in OPERATORS or
+            not _number(rule.get('threshold')) or
+            not isinstance(duration, int) or
+            isinstance(duration, bool) or
+            duration < 0 or
+            not isinstance(emails, list) or
+            not all(isinstance(email, str) and '@' in email
+                    for email in emails)
+        )
+        if invalid:
+            raise PlantalyticsDataException(DATA_INVALID)
+        rule_ids.add(rule_id)
+        checked.append({
+            'rule_id': rule_id,
+            'variable': rule['variable'],
+            'operator': rule['operator'],
+            'threshold': float(rule['threshold']),
+            'duration_minutes': duration,
+            'emails': emails,
+        })
+    return checked
+
+
+def compile_rules(rules):
+    """
+    Returns the checks for checked rules, as (rule, position in a row,
+    test(value), duration in milliseconds) tuples.
+    """
+
+    compiled = []
+    for rule in rules:
+        compare = OPERATORS[rule['operator']]
+        threshold = rule['threshold']
+        compiled.append((
+            rule,
+            VARIABLE_POSITIONS[rule['variable']],
+            lambda value, compare=compare, threshold=threshold: (
+                value is not None and compare(value, threshold)
+            ),
+            rule['duration_minutes'] * 60000,
+        ))
+    return tuple(compiled)
+
+
+def evaluate(compiled, states, rows):
+    """
+    Checks a batch's rows, as for cassy.store_env_rows, against compiled
+    rules. states maps (rule_id, node_id) to {'since', 'fired', 'value',
+    'last_sent'}, where since is when the current episode began and
+    last_sent is the newest reading checked, and is updated in place.
+    Readings no newer than last_sent are skipped, so a replayed backlog
+    cannot reopen or fire an episode from the past. Returns (changed,
+    fired): the states to store, and (rule, node_id, state) for each
+    rule that has just fired.
+    """
+
+    changed = {}
+    fired = []
+    for row in sorted(rows, key=lambda row: (row[0], row[1])):
+        node_id = int(row[0])
+        data_sent = risk.milliseconds(row[1])
+        for rule, position, test, duration in compiled:
+            key = (rule['rule_id'], node_id)
+            state = states.get(key)
+            if state is not None and state['last_sent'] is not None and (
+                data_sent <= state['last_sent']
+            ):
+                continue
+            value = row[position]
+            if test(value):
+                if state is None or state['since'] is None:
+                    state = states[key] = {
+                        'since': data_sent,
+                        'fired': False,
+                        'value': value,
+                        'last_sent': None,
+                    }
+                if not state['fired'] and (
+                    data_sent - state['since'] >= duration
+                ):
+                    state['fired'] = True
+                    state['value'] = value
+                    fired.append((rule, node_id, state))
+            elif state is None or state['since'] is not None:
+                state = states[key] = {
+                    'since': None,
+                    'fired': False,
+                    'value': value,
+                    'last_sent': None,
+                }
+            state['last_sent'] = data_sent
+            changed[key] = state
+    return changed, fired
+
+
+def notify(vineyard_name, fired):
+    """
+    Queues an email for each alert that fired, to the rule's addresses.
+    """
+
+    for rule, node_id, state in fired:
+        if not rule['emails']:
+            continue
+        message = (
+            'Alert \'{}\' fired for node {} at the following vineyard:\n\n'
+            '{}\n\n{} {} {} (reading {}).'
+        ).format(
+            rule['rule_id'],
+            node_id,
+            vineyard_name,
+            rule['variable'],
+            rule['operator'],
+            rule['threshold'],
+            state['value']
+        )
+        send_mail_async(
+            'Plantalytics - Alert: {}'.format(rule['rule_id']),
+            message,
+            settings.EMAIL_HOST_USER,
+            rule['emails'],
+        )
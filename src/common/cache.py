@@ -0,0 +1,65 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import threading
+import time
+from collections import OrderedDict
+
+from common import metrics
+
+
+class TTLCache(object):
+    """
+    Small thread-safe in-process cache. Entries expire after the ttl
+    given when they are set, and the least recently used entry is evicted
+    once max_entries is reached. Hits and misses are counted in
+    common.metrics under the cache's name.
+    """
+
+    def __init__(self, name, max_entries=1024):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                found = True
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                found = False
+        if found:
+            metrics.increment('cache_hits_total', self.name)
+            return entry[1]
+        metrics.increment('cache_misses_total', self.name)
+        return default
+
+    def set(self, key, value, ttl):
+        expires = time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """
+        Drops one entry, or every entry when no key is given.
+        """
+
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
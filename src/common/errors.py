@@ -16,6 +16,7 @@ AUTH_UNKNOWN = 'auth_error_unknown'
 AUTH_NOT_FOUND = 'auth_error_not_found'
 AUTH_DISABLED = 'auth_error_disabled'
 AUTH_EXPIRED = 'auth_error_expired'
+AUTH_VINEYARD = 'auth_error_vineyard'
 CHANGE_ERROR_PASSWORD = 'reset_error_password'
 CHANGE_EMAIL_UNKNOWN = 'change_email_unknown'
 DATA_INVALID = 'data_invalid'
@@ -28,6 +29,7 @@ EMAIL_INVALID = 'email_bad_error'
 HUB_KEY_INVALID = 'env_key_invalid'
 LOGIN_ERROR = 'login_error'
 LOGIN_UNKNOWN = 'login_unknown'
+LOGIN_BUSY = 'login_busy'
 LOGIN_NO_VINEYARDS = 'login_no_vineyards'
 RESET_ERROR = 'reset_error'
 RESET_ERROR_USERNAME = 'reset_error_username'
@@ -50,6 +52,7 @@ responses = {
     AUTH_NOT_FOUND: 'Auth token not found.',
     AUTH_DISABLED: 'User account has been disabled.',
     AUTH_EXPIRED: 'The subscription for this account has expired.',
+    AUTH_VINEYARD: 'User is not authorized for this vineyard.',
     CHANGE_ERROR_PASSWORD: 'Invalid new password.',
     CHANGE_EMAIL_UNKNOWN: 'Unknown error while attempting to change email',
     DATA_INVALID: 'Submitted data is invalid.',
@@ -68,6 +71,7 @@ responses = {
     HUB_KEY_INVALID: 'Hub key invalid.',
     LOGIN_ERROR: 'Login Error: Invalid username or password.',
     LOGIN_UNKNOWN: 'An unexpected error occurred during login.',
+    LOGIN_BUSY: 'Login Error: The server is busy. Please try again.',
     LOGIN_NO_VINEYARDS: 'Login Error: User has no active vineyards.',
     RESET_ERROR: 'An error occurred while resetting your password.',
     RESET_ERROR_USERNAME: (
@@ -7,6 +7,10 @@ class PlantalyticsAuthException(PlantalyticsException):
     pass
 
 
+class PlantalyticsBusyException(PlantalyticsException):
+    pass
+
+
 class PlantalyticsDataException(PlantalyticsException):
     pass
 
@@ -0,0 +1,211 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Exports of environmental readings as CSV or Parquet, written a chunk at
+a time from an iterator of rows so an export of any size is held in
+memory at most EXPORT_CHUNK_ROWS rows, or one Parquet row group of
+EXPORT_ROW_GROUP_ROWS rows, at once.
+
+Rows are (vineyard_id, node_id, batch_sent, data_sent, temperature,
+humidity, leafwetness) tuples, as yielded by cassy.iter_vineyard_env_data
+and cassy.iter_env_data_token_range. Parquet needs pyarrow; without it
+only CSV is offered.
+"""
+
+import csv
+import datetime
+import io
+
+from django.conf import settings
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+COLUMNS = (
+    'vineyard_id',
+    'node_id',
+    'batch_sent',
+    'data_sent',
+    'temperature',
+    'humidity',
+    'leafwetness',
+)
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def formats():
+    """
+    Returns the export formats available in this process.
+    """
+
+    if pyarrow is None:
+        return ('csv',)
+    return ('csv', 'parquet')
+
+
+def _datetime(timestamp):
+    """
+    Returns a datetime for a datetime or milliseconds since the epoch.
+    """
+
+    if timestamp is None or isinstance(timestamp, datetime.datetime):
+        return timestamp
+    return EPOCH + datetime.timedelta(milliseconds=int(timestamp))
+
+
+def _isoformat(timestamp):
+    timestamp = _datetime(timestamp)
+    if timestamp is None:
+        return ''
+    return timestamp.strftime('%Y-%m-%dT%H:%M:%S.') + '{:03d}Z'.format(
+        timestamp.microsecond // 1000
+    )
+
+
+def _number(value):
+    """
+    Formats a reading to the 7 significant digits a Cassandra float
+    holds, so 20.1 is not written as 20.100000381469727.
+    """
+
+    if value is None:
+        return ''
+    return format(value, '.7g')
+
+
+def iter_csv(rows):
+    """
+    Yields a CSV export of rows, with a header line, as encoded chunks.
+    """
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(COLUMNS)
+    chunk_rows = settings.EXPORT_CHUNK_ROWS
+    pending = 0
+    for row in rows:
+        writer.writerow(
+            row[:2] + (_isoformat(row[2]), _isoformat(row[3])) + tuple(
+                _number(value) for value in row[4:]
+            )
+        )
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode('utf-8')
+
+
+class _Chunks(object):
+    """
+    Write-only file that keeps what is written until it is taken, so a
+    Parquet file can be sent while it is being written.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        chunks, self.chunks = self.chunks, []
+        return b''.join(chunks)
+
+
+def _schema():
+    return pyarrow.schema([
+        ('vineyard_id', pyarrow.int32()),
+        ('node_id', pyarrow.int32()),
+        ('batch_sent', pyarrow.timestamp('ms')),
+        ('data_sent', pyarrow.timestamp('ms')),
+        ('temperature', pyarrow.float32()),
+        ('humidity', pyarrow.float32()),
+        ('leafwetness', pyarrow.float32()),
+    ])
+
+
+def _row_group(schema, columns):
+    columns[2] = [_datetime(value) for value in columns[2]]
+    columns[3] = [_datetime(value) for value in columns[3]]
+    return pyarrow.Table.from_arrays(
+        [
+            pyarrow.array(values, type=field.type)
+            for values, field in zip(columns, schema)
+        ],
+        schema=schema
+    )
+
+
+def iter_parquet(rows):
+    """
+    Yields a Parquet export of rows as chunks of the file, one row group
+    of up to EXPORT_ROW_GROUP_ROWS rows at a time.
+    """
+
+    schema = _schema()
+    sink = _Chunks()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    group_rows = settings.EXPORT_ROW_GROUP_ROWS
+    columns = [[] for _ in COLUMNS]
+    pending = 0
+    for row in rows:
+        for values, value in zip(columns, row):
+            values.append(value)
+        pending += 1
+        if pending >= group_rows:
+            writer.write_table(_row_group(schema, columns))
+            columns = [[] for _ in COLUMNS]
+            pending = 0
+            yield sink.take()
+    if pending:
+        writer.write_table(_row_group(schema, columns))
+    writer.close()
+    yield sink.take()
+
+
+def iter_export(rows, export_format):
+    """
+    Yields rows exported in export_format, one of formats(), as chunks.
+    """
+
+    if export_format not in formats():
+        raise ValueError(
+            'Export format must be one of {}.'.format(', '.join(formats()))
+        )
+    if export_format == 'parquet':
+        return iter_parquet(rows)
+    return iter_csv(rows)
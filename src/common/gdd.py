@@ -0,0 +1,130 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Growing degree-days since the start of the season, kept as a running
+accumulator per node so serving them does not mean reading a season of
+readings.
+
+A day's degree-days are the mean of its lowest and highest temperature,
+each held within GDD_BASE_TEMPERATURE and GDD_CAP_TEMPERATURE, less the
+base. The season runs from GDD_SEASON_START, standing in for budbreak,
+to the end of the year. The accumulator holds the total of the season's
+finished days and the lowest and highest temperature of the day in
+progress; a day is added to the total when the first reading of a later
+day arrives. Readings no newer than the last one applied are ignored, so
+a late reading can neither reopen a finished day nor stretch the day in
+progress.
+"""
+
+import datetime
+
+from common import risk, timebuckets
+from django.conf import settings
+
+
+def new_state():
+    """
+    Returns the accumulator of a node with no readings yet.
+    """
+
+    return {
+        'last_sent': None,
+        'season': None,
+        'total': 0.0,
+        'day': None,
+        'day_min': None,
+        'day_max': None,
+    }
+
+
+def season_of(day):
+    """
+    Returns the season, its year, that a day bucket such as 20161019
+    falls in, or None before GDD_SEASON_START.
+    """
+
+    month, day_of_month = settings.GDD_SEASON_START
+    if day % 10000 < month * 100 + day_of_month:
+        return None
+    return day // 10000
+
+
+def season_start(season):
+    """
+    Returns the first moment of a season as a UTC datetime.
+    """
+
+    month, day_of_month = settings.GDD_SEASON_START
+    return datetime.datetime(season, month, day_of_month)
+
+
+def degree_days(low, high):
+    """
+    Returns the degree-days of a day with the given lowest and highest
+    temperatures, in Celsius.
+    """
+
+    base = settings.GDD_BASE_TEMPERATURE
+    cap = settings.GDD_CAP_TEMPERATURE
+    low = min(max(low, base), cap)
+    high = min(max(high, base), cap)
+    return (low + high) / 2.0 - base
+
+
+def apply(state, readings):
+    """
+    Moves state forward over readings, (data_sent, temperature) tuples in
+    any order. Returns the days finished on the way, as (day, lowest,
+    highest, degree-days) tuples, for those in a season.
+    """
+
+    finished = []
+    for data_sent, temperature in sorted(
+        (risk.milliseconds(reading[0]), reading[1]) for reading in readings
+    ):
+        last_sent = state['last_sent']
+        if last_sent is not None and data_sent <= last_sent:
+            continue
+        state['last_sent'] = data_sent
+        temperature = risk.celsius(temperature)
+        day = timebuckets.bucket_for(data_sent, 'day')
+        if day != state['day']:
+            if state['day'] is not None and state['season'] is not None:
+                gdd = degree_days(state['day_min'], state['day_max'])
+                state['total'] += gdd
+                finished.append((
+                    state['day'],
+                    state['day_min'],
+                    state['day_max'],
+                    gdd,
+                ))
+            season = season_of(day)
+            if season != state['season']:
+                state['season'] = season
+                state['total'] = 0.0
+            state['day'] = day
+            state['day_min'] = temperature
+            state['day_max'] = temperature
+        else:
+            state['day_min'] = min(state['day_min'], temperature)
+            state['day_max'] = max(state['day_max'], temperature)
+    return finished
+
+
+def current(state, season):
+    """
+    Returns (degree-days of the season's finished days, degree-days so
+    far today) for a node's accumulator, zero for a node with nothing in
+    season.
+    """
+
+    if state['season'] != season or season is None:
+        return 0.0, 0.0
+    return state['total'], degree_days(state['day_min'], state['day_max'])
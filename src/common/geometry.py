@@ -0,0 +1,160 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Plane geometry on (lat, lon) points for vineyard boundaries, blocks and
+node locations. Vineyards span a few hundred metres, so latitude and
+longitude are treated as plane coordinates for containment tests.
+
+Polygon precomputes its bounding box and edges so a point outside the
+box is rejected with four comparisons. GridIndex buckets points and
+boxes into fixed cells so a lookup only looks at what shares a cell with
+the query, whatever the number of vineyards or nodes indexed.
+"""
+
+import math
+from collections import namedtuple
+
+
+class BoundingBox(namedtuple('BoundingBox', 'south west north east')):
+    """
+    Smallest latitude and longitude box around some points.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def around(cls, points):
+        """
+        Returns the box around (lat, lon) points. Raises ValueError when
+        there are none.
+        """
+
+        points = list(points)
+        if not points:
+            raise ValueError('A bounding box needs at least one point.')
+        return cls(
+            min(point[0] for point in points),
+            min(point[1] for point in points),
+            max(point[0] for point in points),
+            max(point[1] for point in points)
+        )
+
+    def contains(self, lat, lon):
+        return (
+            self.south <= lat <= self.north and
+            self.west <= lon <= self.east
+        )
+
+    def intersects(self, other):
+        return not (
+            other.south > self.north or other.north < self.south or
+            other.west > self.east or other.east < self.west
+        )
+
+    def as_dict(self):
+        return dict(self._asdict())
+
+
+class Polygon(object):
+    """
+    A simple polygon of (lat, lon) points, closed implicitly.
+    """
+
+    def __init__(self, points):
+        self.points = [(float(lat), float(lon)) for lat, lon in points]
+        if len(self.points) < 3:
+            raise ValueError('A polygon needs at least three points.')
+        self.bounds = BoundingBox.around(self.points)
+        # Edges that cross some latitude, as (lat1, lon1, lat2, slope),
+        # so contains() does no division.
+        self.edges = []
+        previous = self.points[-1]
+        for point in self.points:
+            if point[0] != previous[0]:
+                self.edges.append((
+                    previous[0],
+                    previous[1],
+                    point[0],
+                    (point[1] - previous[1]) / (point[0] - previous[0])
+                ))
+            previous = point
+
+    def contains(self, lat, lon):
+        """
+        Returns whether (lat, lon) is inside the polygon, by ray casting.
+        Points exactly on an edge may fall either way.
+        """
+
+        if not self.bounds.contains(lat, lon):
+            return False
+        inside = False
+        for lat1, lon1, lat2, slope in self.edges:
+            if (lat1 > lat) != (lat2 > lat) and (
+                lon < lon1 + (lat - lat1) * slope
+            ):
+                inside = not inside
+        return inside
+
+
+class GridIndex(object):
+    """
+    Fixed grid of cell_size degree cells. Points and boxes are filed
+    under every cell they touch, keyed by whatever the caller likes.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+
+    def _cell(self, lat, lon):
+        return (
+            int(math.floor(lat / self.cell_size)),
+            int(math.floor(lon / self.cell_size))
+        )
+
+    def _cells(self, box):
+        south, west = self._cell(box.south, box.west)
+        north, east = self._cell(box.north, box.east)
+        for row in range(south, north + 1):
+            for col in range(west, east + 1):
+                yield row, col
+
+    def add_point(self, key, lat, lon):
+        self.cells.setdefault(self._cell(lat, lon), []).append(
+            (key, BoundingBox(lat, lon, lat, lon))
+        )
+
+    def add_box(self, key, box):
+        for cell in self._cells(box):
+            self.cells.setdefault(cell, []).append((key, box))
+
+    def at(self, lat, lon):
+        """
+        Returns the keys whose point or box covers (lat, lon).
+        """
+
+        return [
+            key for key, box in self.cells.get(self._cell(lat, lon), ())
+            if box.contains(lat, lon)
+        ]
+
+    def within(self, box):
+        """
+        Returns the keys whose point or box meets box, once each.
+        """
+
+        keys = []
+        seen = set()
+        for cell in self._cells(box):
+            for key, item in self.cells.get(cell, ()):
+                if key not in seen and box.intersects(item):
+                    seen.add(key)
+                    keys.append(key)
+        return keys
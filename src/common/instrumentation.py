@@ -0,0 +1,86 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Per-request counters of Cassandra work. cassy records every prepare and
+execute here; the instrumentation middleware starts and finishes the
+count around each request. Outside a request nothing is recorded.
+"""
+
+import threading
+
+_local = threading.local()
+# Asynchronous executes are recorded from driver threads.
+_lock = threading.Lock()
+
+
+class QueryStats(object):
+    """
+    Cassandra work done while serving one request.
+    """
+
+    def __init__(self):
+        self.prepares = 0
+        self.executes = 0
+        self.rows = 0
+        self.driver_time = 0.0
+
+    def as_dict(self):
+        return {
+            'db_prepares': self.prepares,
+            'db_executes': self.executes,
+            'db_rows': self.rows,
+            'db_ms': round(self.driver_time * 1000, 3),
+        }
+
+
+def start_request():
+    _local.stats = QueryStats()
+
+
+def finish_request():
+    """
+    Returns the stats for the current request and stops recording.
+    """
+
+    stats = getattr(_local, 'stats', None)
+    _local.stats = None
+    return stats
+
+
+def current():
+    """
+    Returns the stats being recorded on this thread, or None.
+    """
+
+    return getattr(_local, 'stats', None)
+
+
+def record_prepare(seconds):
+    stats = current()
+    if stats is not None:
+        with _lock:
+            stats.prepares += 1
+            stats.driver_time += seconds
+
+
+def record_execute(seconds, rows, stats=None):
+    """
+    Counts an execute against stats, by default this thread's. An
+    asynchronous execute passes the stats of the thread that started it,
+    since it resolves on a driver thread.
+    """
+
+    if stats is None:
+        stats = current()
+    if stats is not None:
+        with _lock:
+            stats.executes += 1
+            stats.rows += rows
+            stats.driver_time += seconds
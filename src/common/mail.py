@@ -0,0 +1,98 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Sends notification emails from a background thread so a slow SMTP server
+does not hold up the request that triggered them. Each process has its
+own bounded queue and sender thread, started on first use.
+"""
+
+import os
+import logging
+import queue
+import threading
+
+from common import metrics
+from django.conf import settings
+from django.core.mail import send_mail
+
+logger = logging.getLogger('plantalytics_backend.mail')
+
+_queue = None
+_queue_pid = None
+_queue_lock = threading.Lock()
+
+
+def _sender(mail_queue):
+    while True:
+        subject, message, from_email, recipient_list = mail_queue.get()
+        try:
+            send_mail(
+                subject,
+                message,
+                from_email,
+                recipient_list,
+                fail_silently=False,
+            )
+        except Exception:
+            logger.exception(
+                'Error occurred while sending email \'{}\'.'.format(subject)
+            )
+        finally:
+            mail_queue.task_done()
+
+
+def _get_queue():
+    """
+    Returns this process's queue, starting its sender thread if needed.
+    A forked worker does not inherit the thread, so it starts its own.
+    """
+
+    global _queue, _queue_pid
+    if _queue is None or _queue_pid != os.getpid():
+        with _queue_lock:
+            if _queue is None or _queue_pid != os.getpid():
+                mail_queue = queue.Queue(maxsize=settings.EMAIL_QUEUE_SIZE)
+                thread = threading.Thread(
+                    target=_sender,
+                    args=(mail_queue,),
+                    name='plantalytics-mail'
+                )
+                thread.daemon = True
+                thread.start()
+                _queue = mail_queue
+                _queue_pid = os.getpid()
+    return _queue
+
+
+def send_mail_async(subject, message, from_email, recipient_list):
+    """
+    Queues an email for the sender thread. Returns False, and drops the
+    email, if the queue is full.
+    """
+
+    try:
+        _get_queue().put_nowait(
+            (subject, message, from_email, list(recipient_list))
+        )
+        return True
+    except queue.Full:
+        logger.warning(
+            'Email queue full; dropping email \'{}\'.'.format(subject)
+        )
+        return False
+
+
+def queue_depth():
+    if _queue is None or _queue_pid != os.getpid():
+        return 0
+    return _queue.qsize()
+
+
+metrics.register_gauge('email_queue_depth', queue_depth)
@@ -0,0 +1,920 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+In-process stand-in for the Cassandra session, used by cassy when
+settings.DB_BACKEND is 'memory' so tests and benchmarks run without a
+cluster. It understands the statement shapes cassy issues (single-table
+SELECT with equality, ranges, token ranges, CONTAINS and LIMIT; INSERT,
+optionally IF
+NOT EXISTS, and USING TTL, which is accepted but not enforced; UPDATE
+with IF EXISTS or IF column=?; DELETE; batches) against the user,
+vineyard, hardware, hub batch and environmental tables, and can sleep
+before each prepare and execute to model network latency.
+
+The tables start out holding the fixtures the test suite expects to find
+in its keyspace, described by the same environment variables the tests
+read (LOGIN_USERNAME, ADMIN_TOKEN, VINE_ID and so on).
+"""
+
+import os
+import bisect
+import datetime
+import hashlib
+import operator
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+from common import timebuckets
+
+# Columns the driver converts to datetimes on the way in.
+RANGE_OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+TIMESTAMP_COLUMNS = frozenset([
+    'batchsent', 'datasent', 'lasthubbatchsent', 'received',
+])
+
+SELECT_PATTERN = re.compile(
+    r'^SELECT\s+(?P<columns>.+?)\s+FROM\s+(?P<table>[\w.]+)'
+    r'(?:\s+WHERE\s+(?P<where>.+?))?'
+    r'(?:\s+LIMIT\s+(?P<limit>\d+))?'
+    r'(?:\s+ALLOW\s+FILTERING)?\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+INSERT_PATTERN = re.compile(
+    r'^INSERT\s+INTO\s+(?P<table>\w+)\s*\((?P<columns>.+?)\)\s*'
+    r'VALUES\s*\((?P<values>.+?)\)\s*(?P<condition>IF\s+NOT\s+EXISTS)?'
+    r'\s*(?:USING\s+TTL\s+(?P<ttl>\?|\d+))?\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+UPDATE_PATTERN = re.compile(
+    r'^UPDATE\s+(?P<table>\w+)\s+SET\s+(?P<assignments>.+?)\s+'
+    r'WHERE\s+(?P<where>.+?)(?:\s+IF\s+(?P<condition>.+?))?\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+DELETE_PATTERN = re.compile(
+    r'^DELETE\s+FROM\s+(?P<table>\w+)\s+WHERE\s+(?P<where>.+?)'
+    r'(?P<condition>\s+IF\s+EXISTS)?\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+CONDITION_PATTERN = re.compile(
+    r'^(?P<column>\w+|token\s*\([\w\s,]+\))\s*'
+    r'(?P<operator>[<>]=?|=|CONTAINS)\s*'
+    r'(?P<value>.+)$',
+    re.IGNORECASE
+)
+
+
+class MemorySessionError(Exception):
+    pass
+
+
+def _literal(text):
+    """
+    Parses a CQL literal, or returns None for a bind marker.
+    """
+
+    text = text.strip()
+    if text == '?':
+        return None
+    if text.startswith('\'') and text.endswith('\''):
+        return text[1:-1].replace('\'\'', '\'')
+    if text.lower() in ('true', 'false'):
+        return text.lower() == 'true'
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _token(partition_key):
+    """
+    Returns a stable signed 64-bit token for a partition key, standing
+    in for the Murmur3 token Cassandra would give it.
+    """
+
+    digest = hashlib.md5(repr(partition_key).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+def _timestamp(value):
+    """
+    Converts what the driver accepts for a timestamp into a datetime.
+    """
+
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.datetime.utcfromtimestamp(value / 1000.0)
+    for timestamp_format in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.datetime.strptime(str(value), timestamp_format)
+        except ValueError:
+            continue
+    return datetime.datetime.utcfromtimestamp(int(value) / 1000.0)
+
+
+class Table(object):
+    """
+    Rows grouped by partition key and kept sorted by clustering key, so
+    a LIMIT read returns the same rows Cassandra would.
+    """
+
+    def __init__(self, name, partition_key, clustering_key=(),
+                 descending=False, columns=()):
+        self.name = name
+        self.partition_key = tuple(partition_key)
+        self.clustering_key = tuple(clustering_key)
+        self.descending = descending
+        self.columns = tuple(columns)
+        self.primary_key = self.partition_key + self.clustering_key
+        # Partition key -> (sorted clustering keys, clustering key -> row)
+        self.partitions = {}
+        self.lock = threading.RLock()
+
+    def _key(self, values, columns):
+        return tuple(values[column] for column in columns)
+
+    def _rows_in(self, partition):
+        keys, rows = partition
+        ordered = reversed(keys) if self.descending else keys
+        for key in ordered:
+            yield rows[key]
+
+    def token(self, values):
+        return _token(self._key(values, self.partition_key))
+
+    def find(self, key_values):
+        partition = self.partitions.get(
+            self._key(key_values, self.partition_key)
+        )
+        if partition is None:
+            return None
+        return partition[1].get(self._key(key_values, self.clustering_key))
+
+    def upsert(self, values):
+        partition_key = self._key(values, self.partition_key)
+        clustering_key = self._key(values, self.clustering_key)
+        with self.lock:
+            keys, rows = self.partitions.setdefault(partition_key, ([], {}))
+            row = rows.get(clustering_key)
+            if row is None:
+                bisect.insort(keys, clustering_key)
+                row = rows[clustering_key] = {}
+            row.update(values)
+
+    def delete(self, key_values):
+        """
+        Deletes one row, or the whole partition when only the partition
+        key is given. Returns whether anything was deleted.
+        """
+
+        partition_key = self._key(key_values, self.partition_key)
+        with self.lock:
+            partition = self.partitions.get(partition_key)
+            if partition is None:
+                return False
+            if not any(column in key_values
+                       for column in self.clustering_key):
+                del self.partitions[partition_key]
+                return True
+            keys, rows = partition
+            clustering_key = self._key(key_values, self.clustering_key)
+            if rows.pop(clustering_key, None) is None:
+                return False
+            keys.pop(bisect.bisect_left(keys, clustering_key))
+            if not keys:
+                del self.partitions[partition_key]
+            return True
+
+    def scan(self, equal=None):
+        """
+        Yields rows in Cassandra's order, reading a single partition when
+        the whole partition key is restricted.
+        """
+
+        equal = equal or {}
+        if all(column in equal for column in self.partition_key):
+            partition = self.partitions.get(
+                self._key(equal, self.partition_key)
+            )
+            if partition is not None:
+                for row in self._rows_in(partition):
+                    yield row
+            return
+        for partition_key in sorted(self.partitions):
+            for row in self._rows_in(self.partitions[partition_key]):
+                yield row
+
+
+class Statement(object):
+    """
+    A parsed statement. Bind markers are numbered in order of appearance
+    and remember the column they stand for, so parameters can be bound
+    positionally or by name like the driver does.
+    """
+
+    def __init__(self, query_string):
+        self.query_string = query_string
+        self.markers = []
+        self._parse(' '.join(query_string.split()))
+
+    def _conditions(self, text):
+        conditions = []
+        for part in re.split(r'\s+AND\s+', text, flags=re.IGNORECASE):
+            match = CONDITION_PATTERN.match(part.strip())
+            if match is None:
+                raise MemorySessionError('Unsupported condition: ' + part)
+            value = _literal(match.group('value'))
+            marker = None
+            if value is None:
+                marker = len(self.markers)
+                self.markers.append(match.group('column'))
+            conditions.append((
+                match.group('column'),
+                match.group('operator').upper(),
+                value,
+                marker
+            ))
+        return conditions
+
+    def _parse(self, query):
+        match = SELECT_PATTERN.match(query)
+        if match is not None:
+            self.kind = 'SELECT'
+            self.table = match.group('table')
+            self.columns = [
+                column.strip() for column in match.group('columns').split(',')
+            ]
+            self.where = []
+            if match.group('where'):
+                self.where = self._conditions(match.group('where'))
+            limit = match.group('limit')
+            self.limit = int(limit) if limit else None
+            return
+        match = INSERT_PATTERN.match(query)
+        if match is not None:
+            self.kind = 'INSERT'
+            self.table = match.group('table')
+            self.columns = [
+                column.strip() for column in match.group('columns').split(',')
+            ]
+            self.values = []
+            for column, text in zip(
+                self.columns,
+                match.group('values').split(',')
+            ):
+                value = _literal(text)
+                marker = None
+                if value is None:
+                    marker = len(self.markers)
+                    self.markers.append(column)
+                self.values.append((column, value, marker))
+            self.if_not_exists = match.group('condition') is not None
+            # TTLs are bound like the driver binds them, then ignored.
+            if match.group('ttl') == '?':
+                self.markers.append('[ttl]')
+            return
+        match = UPDATE_PATTERN.match(query)
+        if match is not None:
+            self.kind = 'UPDATE'
+            self.table = match.group('table')
+            self.assignments = [
+                (column, value, marker)
+                for column, _, value, marker in self._conditions(
+                    match.group('assignments').replace(',', ' AND ')
+                )
+            ]
+            self.where = self._conditions(match.group('where'))
+            condition = match.group('condition')
+            self.if_exists = bool(condition) and (
+                condition.strip().upper() == 'EXISTS'
+            )
+            self.if_conditions = []
+            if condition and not self.if_exists:
+                self.if_conditions = self._conditions(condition)
+            return
+        match = DELETE_PATTERN.match(query)
+        if match is not None:
+            self.kind = 'DELETE'
+            self.table = match.group('table')
+            self.where = self._conditions(match.group('where'))
+            self.if_exists = match.group('condition') is not None
+            return
+        raise MemorySessionError('Unsupported statement: ' + query)
+
+    def bind(self, parameters):
+        """
+        Returns the value for each bind marker.
+        """
+
+        if parameters is None:
+            parameters = ()
+        if isinstance(parameters, dict):
+            try:
+                return [parameters[column] for column in self.markers]
+            except KeyError as e:
+                raise MemorySessionError('Missing parameter: {}'.format(e))
+        parameters = list(parameters)
+        if len(parameters) != len(self.markers):
+            raise MemorySessionError(
+                'Expected {} parameters, got {}.'.format(
+                    len(self.markers),
+                    len(parameters)
+                )
+            )
+        return parameters
+
+
+class MemoryBatchStatement(object):
+    """
+    Collects bound statements like the driver's BatchStatement. Values
+    are bound when added, since callers reuse one parameters dict.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.statements = []
+
+    def add(self, statement, parameters=None):
+        if isinstance(statement, str):
+            statement = Statement(statement)
+        self.statements.append((statement, statement.bind(parameters)))
+
+    def clear(self):
+        self.statements = []
+
+
+class Result(list):
+    """
+    Rows of a result, with the attributes cassy reads from ResultSet.
+    """
+
+    def __init__(self, rows=(), was_applied=True):
+        super(Result, self).__init__(rows)
+        self.was_applied = was_applied
+        self.paging_state = None
+
+    @property
+    def current_rows(self):
+        return self
+
+
+class ResponseFuture(Future):
+    """
+    Future with the add_callbacks method of the driver's ResponseFuture.
+    """
+
+    def add_callbacks(self, callback, errback):
+        def done(future):
+            error = future.exception()
+            if error is None:
+                callback(future.result())
+            else:
+                errback(error)
+
+        self.add_done_callback(done)
+
+
+def default_tables():
+    """
+    The tables cassy uses, named from the same environment variables.
+    """
+
+    return [
+        Table(
+            os.environ.get('DB_USER_TABLE', 'users'),
+            partition_key=('username',),
+            columns=(
+                'username', 'admin', 'email', 'enable', 'password',
+                'securitytoken', 'subenddate', 'userid', 'vineyards',
+            )
+        ),
+        Table(
+            os.environ.get('DB_VINE_TABLE', 'vineyards'),
+            partition_key=('vineid',),
+            columns=(
+                'vineid', 'boundaries', 'center', 'enable', 'ownerlist',
+                'vinename',
+            )
+        ),
+        Table(
+            os.environ.get('DB_VINE_RETENTION_TABLE', 'vineyard_retention'),
+            partition_key=('vineid',),
+            columns=('vineid', 'rawdays')
+        ),
+        Table(
+            os.environ.get('DB_VINE_BLOCK_TABLE', 'vineyard_blocks'),
+            partition_key=('vineid',),
+            columns=('vineid', 'blocks')
+        ),
+        Table(
+            os.environ.get('DB_HW_TABLE', 'hardware'),
+            partition_key=('vineid',),
+            clustering_key=('hubid', 'nodeid'),
+            columns=(
+                'vineid', 'hubid', 'nodeid', 'lasthubbatchsent',
+                'nodelocation',
+            )
+        ),
+        Table(
+            os.environ.get('DB_RISK_TABLE', 'node_risk'),
+            partition_key=('nodeid',),
+            columns=(
+                'nodeid', 'vineid', 'lastsent', 'wethours',
+                'wetdegreehours', 'lastinfection', 'powderyindex',
+                'powderyday', 'powderyrun', 'powderybest',
+            )
+        ),
+        Table(
+            os.environ.get('DB_GDD_TABLE', 'node_gdd'),
+            partition_key=('nodeid',),
+            columns=(
+                'nodeid', 'vineid', 'lastsent', 'season', 'total', 'day',
+                'daymin', 'daymax',
+            )
+        ),
+        Table(
+            os.environ.get('DB_GDD_DAILY_TABLE', 'node_gdd_daily'),
+            partition_key=('nodeid', 'season'),
+            clustering_key=('day',),
+            columns=(
+                'nodeid', 'season', 'day', 'vineid', 'tmin', 'tmax', 'gdd',
+            )
+        ),
+        Table(
+            os.environ.get('DB_SENSOR_TABLE', 'node_sensors'),
+            partition_key=('nodeid',),
+            columns=('nodeid', 'vineid', 'health')
+        ),
+        Table(
+            os.environ.get('DB_ALERT_RULE_TABLE', 'alert_rules'),
+            partition_key=('vineid',),
+            columns=('vineid', 'rules')
+        ),
+        Table(
+            os.environ.get('DB_ALERT_STATE_TABLE', 'alert_state'),
+            partition_key=('vineid',),
+            clustering_key=('ruleid', 'nodeid'),
+            columns=(
+                'vineid', 'ruleid', 'nodeid', 'since', 'fired', 'value',
+                'lastsent',
+            )
+        ),
+        Table(
+            os.environ.get('DB_ALERT_SENT_TABLE', 'alert_notifications'),
+            partition_key=('vineid',),
+            clustering_key=('ruleid', 'nodeid', 'since'),
+            columns=('vineid', 'ruleid', 'nodeid', 'since')
+        ),
+        Table(
+            os.environ.get('DB_HUB_BATCH_TABLE', 'hub_batches'),
+            partition_key=('hubid',),
+            clustering_key=('batchsent',),
+            columns=('hubid', 'batchsent', 'received')
+        ),
+        Table(
+            os.environ.get('DB_HUB_UPLOAD_TABLE', 'hub_uploads'),
+            partition_key=('hubid',),
+            clustering_key=('uploadid',),
+            columns=('hubid', 'uploadid', 'committed', 'batches')
+        ),
+        Table(
+            os.environ.get('DB_ENV_TABLE', 'env_data'),
+            partition_key=('nodeid',),
+            clustering_key=('batchsent', 'datasent'),
+            descending=True,
+            columns=(
+                'nodeid', 'batchsent', 'datasent', 'hubid', 'humidity',
+                'leafwetness', 'temperature', 'vineid',
+            )
+        ),
+        Table(
+            os.environ.get('DB_ENV_SUMMARY_TABLE', 'env_data_daily'),
+            partition_key=('nodeid',),
+            clustering_key=('day',),
+            descending=True,
+            columns=(
+                'nodeid', 'day', 'vineid', 'readings',
+                'temperaturemin', 'temperaturemax', 'temperaturemean',
+                'humiditymin', 'humiditymax', 'humiditymean',
+                'leafwetnessmin', 'leafwetnessmax', 'leafwetnessmean',
+            )
+        ),
+        Table(
+            os.environ.get('DB_ENV_BUCKET_TABLE', 'env_data_by_bucket'),
+            partition_key=('nodeid', 'bucket'),
+            clustering_key=('batchsent', 'datasent'),
+            descending=True,
+            columns=(
+                'nodeid', 'bucket', 'batchsent', 'datasent', 'hubid',
+                'humidity', 'leafwetness', 'temperature', 'vineid',
+            )
+        ),
+    ]
+
+
+class MemorySession(object):
+    """
+    Executes cassy's statements against in-memory tables. latency is
+    slept before every prepare and execute, plus up to jitter more.
+    """
+
+    def __init__(self, tables=None, latency=0.0, jitter=0.0,
+                 prepare_latency=None):
+        self.tables = {
+            table.name: table for table in (tables or default_tables())
+        }
+        self.latency = latency
+        self.jitter = jitter
+        self.prepare_latency = (
+            latency if prepare_latency is None else prepare_latency
+        )
+        self.row_factory = None
+        self.prepares = 0
+        self.executes = 0
+        self._row_types = {}
+        self._counter_lock = threading.Lock()
+
+    def _wait(self, latency):
+        if self.jitter:
+            latency += random.uniform(0, self.jitter)
+        if latency > 0:
+            time.sleep(latency)
+
+    def _table(self, name):
+        try:
+            return self.tables[name]
+        except KeyError:
+            raise MemorySessionError('Unknown table: ' + name)
+
+    def _row(self, columns, values):
+        row_type = self._row_types.get(columns)
+        if row_type is None:
+            row_type = self._row_types[columns] = namedtuple('Row', columns)
+        return row_type(*values)
+
+    def prepare(self, query):
+        with self._counter_lock:
+            self.prepares += 1
+        self._wait(self.prepare_latency)
+        return Statement(query)
+
+    def execute(self, statement, parameters=None, timeout=None, **kwargs):
+        with self._counter_lock:
+            self.executes += 1
+        self._wait(self.latency)
+        if isinstance(statement, MemoryBatchStatement):
+            for batched, values in statement.statements:
+                self._run(batched, values)
+            return Result()
+        if isinstance(statement, str):
+            statement = Statement(statement)
+        elif not isinstance(statement, Statement):
+            statement = Statement(statement.query_string)
+        return self._run(statement, statement.bind(parameters))
+
+    def execute_async(self, statement, parameters=None, **kwargs):
+        """
+        Executes statement at once, returning a future that holds the
+        result, so callers can fan queries out as they do with the
+        driver's ResponseFuture.
+        """
+
+        future = ResponseFuture()
+        try:
+            future.set_result(self.execute(statement, parameters, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _value(self, value, marker, values):
+        return values[marker] if marker is not None else value
+
+    def _run(self, statement, values):
+        if statement.kind == 'SELECT' and statement.table == 'system.local':
+            return Result([self._row(('release_version',), ('memory',))])
+        table = self._table(statement.table)
+        with table.lock:
+            if statement.kind == 'SELECT':
+                return self._select(table, statement, values)
+            if statement.kind == 'INSERT':
+                return self._insert(table, statement, values)
+            if statement.kind == 'DELETE':
+                return self._delete(table, statement, values)
+            return self._update(table, statement, values)
+
+    def _select(self, table, statement, values):
+        equal = {}
+        contains = []
+        ranges = []
+        tokens = []
+        for column, operator, value, marker in statement.where:
+            value = self._value(value, marker, values)
+            if column in TIMESTAMP_COLUMNS:
+                value = _timestamp(value)
+            if column.lower().startswith('token'):
+                tokens.append((RANGE_OPERATORS[operator], value))
+            elif operator == 'CONTAINS':
+                contains.append((column, value))
+            elif operator in RANGE_OPERATORS:
+                ranges.append((column, RANGE_OPERATORS[operator], value))
+            else:
+                equal[column] = value
+        columns = statement.columns
+        if columns == ['*']:
+            columns = list(table.columns)
+        columns = tuple(columns)
+        rows = []
+        for row in table.scan(equal):
+            if any(row.get(column) != value
+                   for column, value in equal.items()):
+                continue
+            if any(value not in (row.get(column) or ())
+                   for column, value in contains):
+                continue
+            if any(row.get(column) is None or not compare(row[column], value)
+                   for column, compare, value in ranges):
+                continue
+            if any(not compare(table.token(row), value)
+                   for compare, value in tokens):
+                continue
+            rows.append(self._row(
+                columns,
+                [row.get(column) for column in columns]
+            ))
+            if statement.limit is not None and len(rows) >= statement.limit:
+                break
+        return Result(rows)
+
+    def _rejected(self, columns, existing):
+        """
+        Returns the result of a conditional write that did not apply:
+        like Cassandra, a row of [applied], read as applied, and the
+        current values of columns, None where there is no row.
+        """
+
+        existing = existing or {}
+        return Result(
+            [self._row(
+                ('applied',) + tuple(columns),
+                [False] + [existing.get(column) for column in columns]
+            )],
+            was_applied=False
+        )
+
+    def _insert(self, table, statement, values):
+        row = {}
+        for column, value, marker in statement.values:
+            value = self._value(value, marker, values)
+            if column in TIMESTAMP_COLUMNS:
+                value = _timestamp(value)
+            row[column] = value
+        existing = table.find(row) if statement.if_not_exists else None
+        if existing is not None:
+            return self._rejected(table.columns, existing)
+        table.upsert(row)
+        return Result()
+
+    def _delete(self, table, statement, values):
+        key = {}
+        for column, _, value, marker in statement.where:
+            value = self._value(value, marker, values)
+            if column in TIMESTAMP_COLUMNS:
+                value = _timestamp(value)
+            key[column] = value
+        deleted = table.delete(key)
+        return Result(was_applied=deleted or not statement.if_exists)
+
+    def _update(self, table, statement, values):
+        key = {}
+        for column, _, value, marker in statement.where:
+            value = self._value(value, marker, values)
+            if column in TIMESTAMP_COLUMNS:
+                value = _timestamp(value)
+            key[column] = value
+        if set(key) != set(table.primary_key):
+            raise MemorySessionError(
+                'UPDATE must restrict the full primary key of ' + table.name
+            )
+        existing = table.find(key)
+        if statement.if_exists and existing is None:
+            return self._rejected((), None)
+        for column, _, value, marker in statement.if_conditions:
+            expected = self._value(value, marker, values)
+            if existing is None or existing.get(column) != expected:
+                return self._rejected(
+                    [column for column, _, _, _ in statement.if_conditions],
+                    existing
+                )
+        row = dict(key)
+        for column, value, marker in statement.assignments:
+            value = self._value(value, marker, values)
+            if column in TIMESTAMP_COLUMNS:
+                value = _timestamp(value)
+            row[column] = value
+        table.upsert(row)
+        return Result()
+
+
+def _store_env(session, row, bucket_size):
+    """
+    Adds an environmental reading to both layouts of the environmental
+    data table, so fixtures read the same whichever one is configured.
+    """
+
+    session.tables[os.environ.get('DB_ENV_TABLE', 'env_data')].upsert(row)
+    row = dict(row, bucket=timebuckets.bucket_for(
+        row['batchsent'],
+        bucket_size
+    ))
+    session.tables[
+        os.environ.get('DB_ENV_BUCKET_TABLE', 'env_data_by_bucket')
+    ].upsert(row)
+
+
+def _tables(session):
+    """
+    Returns the user, vineyard and hardware tables.
+    """
+
+    return [
+        session.tables[os.environ.get(variable, default)]
+        for variable, default in (
+            ('DB_USER_TABLE', 'users'),
+            ('DB_VINE_TABLE', 'vineyards'),
+            ('DB_HW_TABLE', 'hardware'),
+        )
+    ]
+
+
+def seed(session, vineyards, nodes, hubs=1, password='benchmark',
+         stored_password=None, bucket_size='day'):
+    """
+    Loads vineyards 0..N-1, each with `nodes` nodes spread across `hubs`
+    hubs and one reading per node. Two users own every vineyard: admin
+    'benchmark', holding auth token 'benchmark-token', and 'login', for
+    logging in without replacing that token. Readings go in both
+    environmental layouts, bucketed by bucket_size.
+    """
+
+    user_table, vine_table, hw_table = _tables(session)
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+
+    for user_id, username in enumerate(['benchmark', 'login']):
+        user_table.upsert({
+            'username': username,
+            'admin': username == 'benchmark',
+            'email': '{}@example.com'.format(username),
+            'enable': True,
+            'password': stored_password or password,
+            'securitytoken': '{}-token'.format(username),
+            'subenddate': '2999-12-31',
+            'userid': user_id,
+            'vineyards': list(range(vineyards)),
+        })
+    for vineyard_id in range(vineyards):
+        lat, lon = 45.0 + vineyard_id * 0.01, -123.0
+        vine_table.upsert({
+            'vineid': vineyard_id,
+            'boundaries': [
+                (lat, lon), (lat, lon + 0.005),
+                (lat + 0.005, lon + 0.005), (lat + 0.005, lon),
+            ],
+            'center': (lat + 0.0025, lon + 0.0025),
+            'enable': True,
+            'ownerlist': ['benchmark'],
+            'vinename': 'Vineyard {}'.format(vineyard_id),
+        })
+        for index in range(nodes):
+            node_id = vineyard_id * nodes + index
+            hw_table.upsert({
+                'vineid': vineyard_id,
+                'hubid': index % hubs,
+                'nodeid': node_id,
+                'lasthubbatchsent': now,
+                'nodelocation': (
+                    lat + 0.005 * random.random(),
+                    lon + 0.005 * random.random()
+                ),
+            })
+            _store_env(session, {
+                'nodeid': node_id,
+                'batchsent': now,
+                'datasent': now,
+                'hubid': index % hubs,
+                'humidity': 50.0,
+                'leafwetness': 10.0,
+                'temperature': 20.0,
+                'vineid': vineyard_id,
+            }, bucket_size)
+
+
+def seed_from_environment(session, make_password=None, bucket_size='day'):
+    """
+    Loads the rows the test suite expects in its keyspace: the users
+    named by LOGIN_USERNAME and LOGIN_USERNAME_MULTI, an admin holding
+    ADMIN_TOKEN, vineyard VINE_ID, and vineyard 0 with three reporting
+    nodes. Variables that are not set are skipped. Passwords are stored
+    through make_password when given. Readings go in both
+    environmental layouts, bucketed by bucket_size.
+    """
+
+    user_table, vine_table, hw_table = _tables(session)
+    environ = os.environ
+    make_password = make_password or (lambda password: password)
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    vineyard_ids = [0]
+    if environ.get('VINE_ID', '').isdigit() and int(environ['VINE_ID']):
+        vineyard_ids.append(int(environ['VINE_ID']))
+
+    users = [
+        (
+            environ.get('LOGIN_USERNAME'),
+            environ.get('LOGIN_PASSWORD'),
+            environ.get('LOGIN_SEC_TOKEN'),
+            False,
+            vineyard_ids[-1:],
+        ),
+        (
+            environ.get('LOGIN_USERNAME_MULTI'),
+            environ.get('LOGIN_PASSWORD_MULTI'),
+            None,
+            False,
+            vineyard_ids,
+        ),
+        ('admin', None, environ.get('ADMIN_TOKEN'), True, vineyard_ids),
+    ]
+    user_id = int(environ.get('LOGIN_USER_ID', '0') or 0)
+    for username, password, token, is_admin, vineyards in users:
+        if not username:
+            continue
+        user_table.upsert({
+            'username': username,
+            'admin': is_admin,
+            'email': environ.get('RESET_EMAIL'),
+            'enable': True,
+            'password': make_password(password) if password else None,
+            'securitytoken': token,
+            'subenddate': environ.get('LOGIN_SUB_END_DATE', '2999-12-31'),
+            'userid': user_id,
+            'vineyards': list(vineyards),
+        })
+        user_id += 1
+
+    for vineyard_id in vineyard_ids:
+        is_fixture = vineyard_id == vineyard_ids[-1]
+        center = (
+            float(environ.get('VINE_CENTER_LAT', 45.0)),
+            float(environ.get('VINE_CENTER_LON', -123.0))
+        )
+        vine_table.upsert({
+            'vineid': vineyard_id,
+            'boundaries': [(
+                float(environ.get('VINE_BOUND_LAT', center[0])),
+                float(environ.get('VINE_BOUND_LON', center[1]))
+            )],
+            'center': center,
+            'enable': True,
+            'ownerlist': [
+                environ.get('VINE_OWNERS', 'admin') if is_fixture
+                else 'admin'
+            ],
+            'vinename': (
+                environ.get('VINE_NAME', 'Vineyard') if is_fixture
+                else 'Vineyard {}'.format(vineyard_id)
+            ),
+        })
+
+    for node_id in range(3):
+        hw_table.upsert({
+            'vineid': 0,
+            'hubid': 0,
+            'nodeid': node_id,
+            'lasthubbatchsent': now,
+            'nodelocation': center,
+        })
+        _store_env(session, {
+            'nodeid': node_id,
+            'batchsent': now,
+            'datasent': now,
+            'hubid': 0,
+            'humidity': 50.0,
+            'leafwetness': 10.0,
+            'temperature': 20.0,
+            'vineid': 0,
+        }, bucket_size)
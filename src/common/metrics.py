@@ -0,0 +1,365 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+In-process counters, gauges and latency histograms, keyed by metric name
+and a single label value such as the endpoint. Histograms use fixed
+buckets, so recording is O(1) and the percentiles reported by snapshot()
+are interpolated within a bucket.
+
+Each uWSGI worker keeps its own metrics. When settings.METRICS_DIR is set,
+flush() writes them to a per-process file there, and collect() merges the
+files of every worker so /metrics reports the whole server.
+"""
+
+import os
+import atexit
+import bisect
+import functools
+import json
+import threading
+import time
+
+from django.conf import settings
+
+# Upper bounds in seconds, from half a millisecond to thirty seconds.
+BUCKETS = (
+    0.0005, 0.001, 0.002, 0.003, 0.005, 0.0075,
+    0.01, 0.015, 0.02, 0.03, 0.05, 0.075,
+    0.1, 0.15, 0.2, 0.3, 0.5, 0.75,
+    1.0, 2.0, 5.0, 10.0, 30.0,
+)
+
+# Metric name: (label name, help text) for the Prometheus exposition.
+DESCRIPTIONS = {
+    'request_duration_seconds': (
+        'endpoint', 'Time to serve a request, per view.'
+    ),
+    'request_db_seconds': (
+        'endpoint', 'Time spent in the Cassandra driver, per view.'
+    ),
+    'cassandra_query_seconds': (
+        'function', 'Time spent in each cassy function.'
+    ),
+    'ingest_rows_total': (
+        None, 'Environmental data points stored from hubs.'
+    ),
+    'ingest_batches_total': (
+        None, 'Hub batches stored.'
+    ),
+    'ingest_duplicate_batches_total': (
+        None, 'Hub batches skipped because they were already stored.'
+    ),
+    'ingest_rejected_points_total': (
+        None, 'Data points left out of hub batches as invalid.'
+    ),
+    'ingest_state_errors_total': (
+        'state', 'Hub batches stored without updating a running state.'
+    ),
+    'alerts_fired_total': (
+        None, 'Alert rules that fired for a node.'
+    ),
+    'sensor_spikes_total': (
+        'variable', 'Readings far outside a sensor\'s usual values.'
+    ),
+    'cache_hits_total': ('cache', 'Cache lookups that found a value.'),
+    'cache_misses_total': ('cache', 'Cache lookups that did not.'),
+    'email_queue_depth': (None, 'Emails waiting to be sent.'),
+    'dependency_probe_seconds': (
+        'dependency', 'Time taken by each readiness probe.'
+    ),
+}
+
+_histograms = {}
+_counters = {}
+_gauges = {}
+_lock = threading.Lock()
+_last_flush = 0.0
+
+
+class Histogram(object):
+    """
+    Thread-safe bucketed histogram of durations in seconds.
+    """
+
+    def __init__(self, counts=None, count=0, total=0.0):
+        self._lock = threading.Lock()
+        # One extra bucket for values above the last bound.
+        self.counts = counts or [0] * (len(BUCKETS) + 1)
+        self.count = count
+        self.sum = total
+
+    def observe(self, value):
+        index = bisect.bisect_left(BUCKETS, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def merge(self, counts, count, total):
+        with self._lock:
+            for index, bucket_count in enumerate(counts):
+                self.counts[index] += bucket_count
+            self.count += count
+            self.sum += total
+
+    def quantile(self, q):
+        """
+        Estimates the q-th quantile (0 < q < 1) by linear interpolation
+        inside the bucket that contains it.
+        """
+
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else lower
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return BUCKETS[-1]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'p50': self.quantile(0.50),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+        }
+
+
+def histogram(name, label=''):
+    """
+    Returns the histogram for a metric name and label, creating it on
+    first use.
+    """
+
+    key = (name, label)
+    found = _histograms.get(key)
+    if found is None:
+        with _lock:
+            found = _histograms.setdefault(key, Histogram())
+    return found
+
+
+def observe(name, label, value):
+    histogram(name, label).observe(value)
+
+
+def increment(name, label='', amount=1):
+    with _lock:
+        _counters[(name, label)] = _counters.get((name, label), 0) + amount
+
+
+def register_gauge(name, callback, label=''):
+    """
+    Registers a function whose return value is the gauge's current value.
+    """
+
+    with _lock:
+        _gauges[(name, label)] = callback
+
+
+def timed(name):
+    """
+    Decorator recording each call's duration in the named histogram,
+    labelled with the function name.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(name, function.__name__, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """
+    Returns {name: {label: summary}} for every histogram in this process.
+    """
+
+    with _lock:
+        items = list(_histograms.items())
+    result = {}
+    for (name, label), found in sorted(items):
+        result.setdefault(name, {})[label] = found.summary()
+    return result
+
+
+def state():
+    """
+    Returns this process's metrics in a JSON serialisable form.
+    """
+
+    with _lock:
+        counters = list(_counters.items())
+        gauges = list(_gauges.items())
+        histograms = list(_histograms.items())
+    gauge_values = []
+    for (name, label), callback in gauges:
+        try:
+            gauge_values.append([name, label, float(callback())])
+        except Exception:
+            continue
+    return {
+        'pid': os.getpid(),
+        'counters': [
+            [name, label, value] for (name, label), value in counters
+        ],
+        'gauges': gauge_values,
+        'histograms': [
+            [name, label, list(found.counts), found.count, found.sum]
+            for (name, label), found in histograms
+        ],
+    }
+
+
+def _metrics_path(pid):
+    return os.path.join(settings.METRICS_DIR, 'metrics-{}.json'.format(pid))
+
+
+def flush(force=False):
+    """
+    Writes this process's metrics to METRICS_DIR, at most once per
+    METRICS_FLUSH_SECONDS unless forced.
+    """
+
+    global _last_flush
+    if not settings.METRICS_DIR:
+        return
+    now = time.time()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_SECONDS:
+        return
+    _last_flush = now
+    path = _metrics_path(os.getpid())
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as metrics_file:
+        json.dump(state(), metrics_file)
+    os.replace(temp_path, path)
+
+
+atexit.register(flush, True)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    """
+    Merges the metrics of every worker. Counters and histograms of
+    workers that have exited are kept so totals never go backwards;
+    their gauges are dropped.
+    """
+
+    states = [state()]
+    if settings.METRICS_DIR and os.path.isdir(settings.METRICS_DIR):
+        own_file = os.path.basename(_metrics_path(os.getpid()))
+        for filename in os.listdir(settings.METRICS_DIR):
+            if not filename.endswith('.json') or filename == own_file:
+                continue
+            try:
+                path = os.path.join(settings.METRICS_DIR, filename)
+                with open(path) as metrics_file:
+                    states.append(json.load(metrics_file))
+            except (IOError, ValueError):
+                continue
+
+    counters = {}
+    gauges = {}
+    histograms = {}
+    for process_state in states:
+        for name, label, value in process_state['counters']:
+            counters[(name, label)] = counters.get((name, label), 0) + value
+        if process_state['pid'] == os.getpid() or _process_alive(
+            process_state['pid']
+        ):
+            for name, label, value in process_state['gauges']:
+                gauges[(name, label)] = gauges.get((name, label), 0) + value
+        for name, label, counts, count, total in process_state['histograms']:
+            merged = histograms.setdefault((name, label), Histogram())
+            merged.merge(counts, count, total)
+    return counters, gauges, histograms
+
+
+def _format_labels(name, label, extra=None):
+    pairs = []
+    label_name = DESCRIPTIONS.get(name, ('label', ''))[0]
+    if label_name and label != '':
+        pairs.append((label_name, label))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(key, str(value).replace('"', '\\"'))
+        for key, value in pairs
+    ) + '}'
+
+
+def render_prometheus(prefix='plantalytics_'):
+    """
+    Renders the merged metrics in the Prometheus text format.
+    """
+
+    counters, gauges, histograms = collect()
+    lines = []
+    described = set()
+
+    def describe(name, metric_type):
+        if name not in described:
+            described.add(name)
+            help_text = DESCRIPTIONS.get(name, (None, name))[1]
+            lines.append('# HELP {}{} {}'.format(prefix, name, help_text))
+            lines.append('# TYPE {}{} {}'.format(prefix, name, metric_type))
+
+    for (name, label), value in sorted(counters.items()):
+        describe(name, 'counter')
+        lines.append('{}{}{} {}'.format(
+            prefix, name, _format_labels(name, label), value
+        ))
+    for (name, label), value in sorted(gauges.items()):
+        describe(name, 'gauge')
+        lines.append('{}{}{} {}'.format(
+            prefix, name, _format_labels(name, label), value
+        ))
+    for (name, label), found in sorted(histograms.items()):
+        describe(name, 'histogram')
+        cumulative = 0
+        bounds = [str(bound) for bound in BUCKETS] + ['+Inf']
+        for bound, bucket_count in zip(bounds, found.counts):
+            cumulative += bucket_count
+            lines.append('{}{}_bucket{} {}'.format(
+                prefix, name, _format_labels(name, label, ('le', bound)),
+                cumulative
+            ))
+        lines.append('{}{}_sum{} {}'.format(
+            prefix, name, _format_labels(name, label), found.sum
+        ))
+        lines.append('{}{}_count{} {}'.format(
+            prefix, name, _format_labels(name, label), found.count
+        ))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,64 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import json
+import logging
+import time
+
+from common import instrumentation, metrics
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger('plantalytics_backend.requests')
+
+
+class RequestInstrumentationMiddleware(MiddlewareMixin):
+    """
+    Times each request and the Cassandra work it does. The numbers are
+    logged as one JSON line, returned in a Server-Timing header, and
+    added to per-endpoint histograms in common.metrics.
+    """
+
+    def process_request(self, request):
+        request.instrumentation_start = time.perf_counter()
+        instrumentation.start_request()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.instrumentation_endpoint = '{}.{}'.format(
+            view_func.__module__,
+            view_func.__name__
+        )
+
+    def process_response(self, request, response):
+        stats = instrumentation.finish_request()
+        start = getattr(request, 'instrumentation_start', None)
+        if stats is None or start is None:
+            return response
+        duration = time.perf_counter() - start
+        endpoint = getattr(request, 'instrumentation_endpoint', 'unresolved')
+
+        metrics.observe('request_duration_seconds', endpoint, duration)
+        metrics.observe('request_db_seconds', endpoint, stats.driver_time)
+
+        response['Server-Timing'] = (
+            'db;desc="{} queries";dur={:.2f}, total;dur={:.2f}'
+        ).format(
+            stats.prepares + stats.executes,
+            stats.driver_time * 1000,
+            duration * 1000
+        )
+        line = {
+            'endpoint': endpoint,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+        }
+        line.update(stats.as_dict())
+        logger.info(json.dumps(line, sort_keys=True))
+        metrics.flush()
+        return response
@@ -0,0 +1,255 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Password hashing for stored user passwords.
+
+Encoded passwords look like ``pbkdf2_sha256$<iterations>$<salt>$<hash>``
+or ``scrypt$<n>$<r>$<p>$<salt>$<hash>``. Anything else is treated as a
+legacy plaintext password, which still verifies (in constant time) but
+reports that it needs rehashing. scrypt needs Python 3.6 or later built
+against OpenSSL 1.1; where hashlib lacks it, new passwords are hashed
+with PBKDF2 whatever PASSWORD_HASH_ALGORITHM says.
+
+Key derivation is CPU bound, so make_password and check_password run it
+on a small bounded thread pool. hashlib releases the GIL while deriving,
+which keeps other request threads in the worker responsive during a
+login burst.
+"""
+
+import os
+import base64
+import hashlib
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from common.exceptions import PlantalyticsBusyException
+from common.errors import LOGIN_BUSY
+from django.conf import settings
+
+PBKDF2 = 'pbkdf2_sha256'
+SCRYPT = 'scrypt'
+HAS_SCRYPT = hasattr(hashlib, 'scrypt')
+
+_executor = None
+_executor_pid = None
+_executor_slots = None
+_executor_lock = threading.Lock()
+
+
+def _b64(raw):
+    """
+    Returns raw bytes as base64 text.
+    """
+
+    return base64.b64encode(raw).decode('ascii').strip()
+
+
+def _new_salt():
+    """
+    Returns a random salt for a new hash.
+    """
+
+    return _b64(os.urandom(12))
+
+
+def _current_algorithm():
+    """
+    Returns the algorithm new hashes are made with: the configured one,
+    or PBKDF2 if that is scrypt and this Python lacks it.
+    """
+
+    algorithm = settings.PASSWORD_HASH_ALGORITHM
+    if algorithm == SCRYPT and not HAS_SCRYPT:
+        return PBKDF2
+    return algorithm
+
+
+def _current_cost(algorithm):
+    """
+    Returns the configured work factor for the supplied algorithm.
+    """
+
+    if algorithm == SCRYPT:
+        return (
+            settings.PASSWORD_HASH_SCRYPT_N,
+            settings.PASSWORD_HASH_SCRYPT_R,
+            settings.PASSWORD_HASH_SCRYPT_P,
+        )
+    return (settings.PASSWORD_HASH_ITERATIONS,)
+
+
+def _derive(password, salt, algorithm, cost):
+    """
+    Returns the key derived from a password with an algorithm and work
+    factor.
+    """
+
+    if algorithm == PBKDF2:
+        (iterations,) = cost
+        return hashlib.pbkdf2_hmac(
+            'sha256',
+            password.encode('utf-8'),
+            salt.encode('ascii'),
+            iterations
+        )
+    if algorithm == SCRYPT and HAS_SCRYPT:
+        n, r, p = cost
+        return hashlib.scrypt(
+            password.encode('utf-8'),
+            salt=salt.encode('ascii'),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=256 * n * r + 1024 * 1024,
+            dklen=32
+        )
+    raise ValueError('Unsupported password hash algorithm: ' + algorithm)
+
+
+def _split(encoded):
+    """
+    Splits an encoded password into (algorithm, cost, salt, hash).
+    Returns None for legacy plaintext passwords.
+    """
+
+    parts = str(encoded).split('$')
+    try:
+        if parts[0] == PBKDF2 and len(parts) == 4:
+            return PBKDF2, (int(parts[1]),), parts[2], parts[3]
+        if parts[0] == SCRYPT and len(parts) == 6:
+            cost = (int(parts[1]), int(parts[2]), int(parts[3]))
+            return SCRYPT, cost, parts[4], parts[5]
+    except ValueError:
+        pass
+    return None
+
+
+def encode(password, algorithm=None, cost=None, salt=None):
+    """
+    Hashes the supplied password on the calling thread.
+    Defaults to the algorithm and work factor in settings.
+    """
+
+    algorithm = algorithm or _current_algorithm()
+    cost = tuple(cost or _current_cost(algorithm))
+    salt = salt or _new_salt()
+    derived = _b64(_derive(password, salt, algorithm, cost))
+    return '$'.join(
+        [algorithm] + [str(value) for value in cost] + [salt, derived]
+    )
+
+
+def verify(password, encoded):
+    """
+    Checks the supplied password against an encoded or legacy
+    plaintext password on the calling thread, in constant time.
+    """
+
+    if encoded is None:
+        return False
+    parts = _split(encoded)
+    if parts is None:
+        return hmac.compare_digest(
+            str(password).encode('utf-8'),
+            str(encoded).encode('utf-8')
+        )
+    algorithm, cost, salt, expected = parts
+    derived = _b64(_derive(str(password), salt, algorithm, cost))
+    return hmac.compare_digest(
+        derived.encode('ascii'),
+        expected.encode('ascii')
+    )
+
+
+def is_hashed(encoded):
+    """
+    True for encoded passwords, False for legacy plaintext ones.
+    """
+
+    return _split(encoded) is not None
+
+
+def needs_rehash(encoded):
+    """
+    True for legacy plaintext passwords and for hashes made with a
+    different algorithm or work factor than the current settings.
+    """
+
+    parts = _split(encoded)
+    if parts is None:
+        return True
+    algorithm, cost = parts[0], parts[1]
+    return (
+        algorithm != _current_algorithm() or
+        cost != _current_cost(algorithm)
+    )
+
+
+def _get_executor():
+    """
+    Returns this process's hashing pool. The pool is created lazily and
+    again after a fork, since a forked worker does not inherit threads.
+    """
+
+    global _executor, _executor_pid, _executor_slots
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                workers = settings.PASSWORD_HASH_THREADS
+                _executor = ThreadPoolExecutor(max_workers=workers)
+                _executor_slots = threading.BoundedSemaphore(
+                    workers + settings.PASSWORD_HASH_BACKLOG
+                )
+                _executor_pid = pid
+    return _executor, _executor_slots
+
+
+def _run(function, *args):
+    """
+    Runs function on the hashing pool. Raises
+    PlantalyticsBusyException(LOGIN_BUSY) rather than queueing without
+    bound when the pool and its backlog are full.
+    """
+
+    executor, slots = _get_executor()
+    timeout = settings.PASSWORD_HASH_TIMEOUT
+    if not slots.acquire(timeout=timeout):
+        raise PlantalyticsBusyException(LOGIN_BUSY)
+    try:
+        future = executor.submit(function, *args)
+    except Exception as e:
+        slots.release()
+        raise e
+    # The slot is held until the work finishes, even if we stop waiting.
+    future.add_done_callback(lambda done: slots.release())
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        raise PlantalyticsBusyException(LOGIN_BUSY)
+
+
+def make_password(password):
+    """
+    Hashes the supplied password on the hashing pool.
+    """
+
+    return _run(encode, str(password))
+
+
+def check_password(password, encoded):
+    """
+    Verifies the supplied password on the hashing pool.
+    """
+
+    if not is_hashed(encoded):
+        return verify(password, encoded)
+    return _run(verify, str(password), encoded)
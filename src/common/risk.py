@@ -0,0 +1,167 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Grape mildew risk, kept as a small running state per node that each
+hub batch moves forward, so the cost of a batch does not depend on how
+much history a node has.
+
+Two models are tracked:
+
+* Downy mildew: while leaves are wet (leafwetness at or above
+  RISK_LEAF_WET_THRESHOLD), hours and degree-hours above
+  RISK_DOWNY_BASE_TEMPERATURE are summed. Reaching
+  RISK_DOWNY_DEGREE_HOURS in one wet period counts as an infection
+  event; the index is the share of that reached, up to 100. Drying out
+  starts a new period.
+* Powdery mildew, after the Gubler-Thomas index: a day with at least
+  RISK_POWDERY_HOURS consecutive hours within RISK_POWDERY_RANGE adds
+  20 to the index and any other day takes 10 off, within 0 to 100.
+
+Each reading counts for the time since the node's previous one, capped
+at RISK_MAX_GAP_HOURS so an outage is not read as hours of weather.
+Readings no newer than the last one applied are ignored, so a retried or
+backfilled batch cannot count twice.
+"""
+
+import datetime
+
+from common import timebuckets
+from django.conf import settings
+
+MILLISECONDS_PER_HOUR = 3600000.0
+
+
+def new_state():
+    """
+    Returns the state of a node with no readings yet.
+    """
+
+    return {
+        'last_sent': None,
+        'wet_hours': 0.0,
+        'wet_degree_hours': 0.0,
+        'last_infection': None,
+        'powdery_index': 0.0,
+        'powdery_day': None,
+        'powdery_run': 0.0,
+        'powdery_best': 0.0,
+    }
+
+
+def milliseconds(timestamp):
+    """
+    Returns a datetime or milliseconds since the epoch as milliseconds.
+    """
+
+    if isinstance(timestamp, datetime.datetime):
+        epoch = datetime.datetime(1970, 1, 1)
+        return int((timestamp - epoch).total_seconds() * 1000)
+    return int(timestamp)
+
+
+def celsius(temperature):
+    if settings.RISK_TEMPERATURE_FAHRENHEIT:
+        return (temperature - 32.0) * 5.0 / 9.0
+    return temperature
+
+
+def _close_powdery_day(state):
+    """
+    Applies the finished day's Gubler-Thomas score to the index.
+    """
+
+    if state['powdery_day'] is None:
+        return
+    if state['powdery_best'] >= settings.RISK_POWDERY_HOURS:
+        change = 20.0
+    else:
+        change = -10.0
+    state['powdery_index'] = min(
+        100.0,
+        max(0.0, state['powdery_index'] + change)
+    )
+
+
+def apply(state, readings):
+    """
+    Moves state forward over readings, (data_sent, temperature,
+    leafwetness) tuples in any order, and returns it.
+    """
+
+    low, high = settings.RISK_POWDERY_RANGE
+    base = settings.RISK_DOWNY_BASE_TEMPERATURE
+    max_gap = settings.RISK_MAX_GAP_HOURS
+    for data_sent, temperature, leafwetness in sorted(
+        (milliseconds(reading[0]),) + tuple(reading[1:])
+        for reading in readings
+    ):
+        last_sent = state['last_sent']
+        if last_sent is not None and data_sent <= last_sent:
+            continue
+        if last_sent is None:
+            hours = 0.0
+        else:
+            hours = min(
+                (data_sent - last_sent) / MILLISECONDS_PER_HOUR,
+                max_gap
+            )
+        state['last_sent'] = data_sent
+        temperature = celsius(temperature)
+
+        if leafwetness >= settings.RISK_LEAF_WET_THRESHOLD:
+            before = state['wet_degree_hours']
+            state['wet_hours'] += hours
+            state['wet_degree_hours'] += max(temperature - base, 0.0) * hours
+            threshold = settings.RISK_DOWNY_DEGREE_HOURS
+            if before < threshold <= state['wet_degree_hours']:
+                state['last_infection'] = data_sent
+        else:
+            state['wet_hours'] = 0.0
+            state['wet_degree_hours'] = 0.0
+
+        day = timebuckets.bucket_for(data_sent, 'day')
+        if day != state['powdery_day']:
+            _close_powdery_day(state)
+            state['powdery_day'] = day
+            state['powdery_run'] = 0.0
+            state['powdery_best'] = 0.0
+        if low <= temperature <= high:
+            state['powdery_run'] += hours
+            state['powdery_best'] = max(
+                state['powdery_best'],
+                state['powdery_run']
+            )
+        else:
+            state['powdery_run'] = 0.0
+    return state
+
+
+def indices(state):
+    """
+    Returns the risk indices of a node's state, 0 to 100 each.
+    """
+
+    downy = min(
+        100.0,
+        100.0 * state['wet_degree_hours'] / settings.RISK_DOWNY_DEGREE_HOURS
+    )
+    return {
+        'last_reading': state['last_sent'],
+        'downy_mildew': {
+            'index': round(downy, 1),
+            'wet_hours': round(state['wet_hours'], 2),
+            'wet_degree_hours': round(state['wet_degree_hours'], 2),
+            'last_infection': state['last_infection'],
+        },
+        'powdery_mildew': {
+            'index': state['powdery_index'],
+            'favourable_hours_today': round(state['powdery_best'], 2),
+        },
+    }
@@ -0,0 +1,279 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Sensor health, kept as a small running state per node that each hub
+batch moves forward, so faulty sensors can be found before they spoil
+the maps.
+
+For each variable a node keeps a running mean and variance, updated with
+Welford's method until SENSOR_WINDOW readings have been seen and as an
+exponentially weighted average of about that many readings after that,
+so the statistics follow the seasons. A reading further than
+SENSOR_SPIKE_SIGMAS deviations from the mean is a spike. The last
+SENSOR_RING_SIZE readings are kept in a ring buffer of 32-bit floats,
+from which a sensor is found stuck when its last SENSOR_STUCK_READINGS
+readings are all the same.
+
+A state encodes to about 500 bytes, so the states of tens of thousands
+of nodes fit in a few megabytes. Readings no newer than the last one
+applied are ignored, so a retried or backfilled batch cannot count
+twice.
+"""
+
+import array
+import math
+import struct
+import sys
+
+from common import risk
+from django.conf import settings
+
+VARIABLES = ('temperature', 'humidity', 'leafwetness')
+VERSION = 1
+# Version, last data_sent (-1 for none), ring position, readings in the
+# ring, then readings since the last spike and spikes, per variable.
+HEADER = struct.Struct('<BqHH3H3I')
+# Count, mean and variance per variable.
+STATS_SIZE = 3 * len(VARIABLES)
+NO_SPIKE = 0xFFFF
+MAX_SPIKES = 0xFFFFFFFF
+
+
+def _little_endian(values):
+    """
+    Returns a copy of an array in little-endian order, or the array
+    itself on a little-endian machine.
+    """
+
+    if sys.byteorder == 'little':
+        return values
+    values = array.array(values.typecode, values)
+    values.byteswap()
+    return values
+
+
+class NodeHealth(object):
+    """
+    Running sensor statistics of one node. The ring holds one reading per
+    slot, its variables side by side.
+    """
+
+    __slots__ = (
+        'last_sent',
+        'position',
+        'filled',
+        'since_spike',
+        'spikes',
+        'stats',
+        'ring',
+    )
+
+    def __init__(self, size):
+        self.last_sent = None
+        self.position = 0
+        self.filled = 0
+        self.since_spike = [NO_SPIKE] * len(VARIABLES)
+        self.spikes = [0] * len(VARIABLES)
+        self.stats = array.array('d', [0.0] * STATS_SIZE)
+        self.ring = array.array('f', [0.0] * (size * len(VARIABLES)))
+
+    @property
+    def size(self):
+        return len(self.ring) // len(VARIABLES)
+
+    def recent(self, index):
+        """
+        Returns the ring's readings of the variable at index, oldest
+        first.
+        """
+
+        width = len(VARIABLES)
+        start = (self.position - self.filled) % self.size
+        return [
+            self.ring[((start + slot) % self.size) * width + index]
+            for slot in range(self.filled)
+        ]
+
+    def push(self, values):
+        """
+        Writes a reading's values into the ring, over the oldest when it
+        is full.
+        """
+
+        width = len(VARIABLES)
+        offset = self.position * width
+        self.ring[offset:offset + width] = array.array('f', values)
+        self.position = (self.position + 1) % self.size
+        self.filled = min(self.filled + 1, self.size)
+
+    def encode(self):
+        return HEADER.pack(
+            VERSION,
+            -1 if self.last_sent is None else self.last_sent,
+            self.position,
+            self.filled,
+            *(self.since_spike + self.spikes)
+        ) + _little_endian(self.stats).tobytes() + (
+            _little_endian(self.ring).tobytes()
+        )
+
+
+def new_state():
+    """
+    Returns the state of a node with no readings yet.
+    """
+
+    return NodeHealth(settings.SENSOR_RING_SIZE)
+
+
+def decode(data):
+    """
+    Returns the state encoded by NodeHealth.encode. A ring of another
+    size than SENSOR_RING_SIZE is resized, keeping the newest readings.
+    """
+
+    fields = HEADER.unpack_from(data)
+    if fields[0] != VERSION:
+        return new_state()
+    width = len(VARIABLES)
+    stats = array.array('d')
+    stats.frombytes(data[HEADER.size:HEADER.size + STATS_SIZE * 8])
+    ring = array.array('f')
+    ring.frombytes(data[HEADER.size + STATS_SIZE * 8:])
+    if sys.byteorder != 'little':
+        stats.byteswap()
+        ring.byteswap()
+
+    state = NodeHealth(len(ring) // width)
+    state.last_sent = None if fields[1] < 0 else fields[1]
+    state.position = fields[2]
+    state.filled = fields[3]
+    state.since_spike = list(fields[4:4 + width])
+    state.spikes = list(fields[4 + width:])
+    state.stats = stats
+    state.ring = ring
+    if state.size == settings.SENSOR_RING_SIZE:
+        return state
+
+    resized = new_state()
+    resized.last_sent = state.last_sent
+    resized.since_spike = state.since_spike
+    resized.spikes = state.spikes
+    resized.stats = state.stats
+    recent = [state.recent(index) for index in range(width)]
+    for values in list(zip(*recent))[-resized.size:]:
+        resized.push(values)
+    return resized
+
+
+def apply(state, readings):
+    """
+    Moves state forward over readings, (data_sent, temperature,
+    humidity, leafwetness) tuples in any order. Returns {variable:
+    spikes} for the variables that spiked.
+    """
+
+    window = settings.SENSOR_WINDOW
+    minimum = settings.SENSOR_MIN_READINGS
+    sigmas = settings.SENSOR_SPIKE_SIGMAS
+    floors = [settings.SENSOR_MIN_DEVIATION[name] for name in VARIABLES]
+    stats = state.stats
+    spiked = {}
+    for reading in sorted(
+        (risk.milliseconds(reading[0]),) + tuple(reading[1:])
+        for reading in readings
+    ):
+        data_sent = reading[0]
+        if state.last_sent is not None and data_sent <= state.last_sent:
+            continue
+        state.last_sent = data_sent
+        values = reading[1:]
+        for index, value in enumerate(values):
+            offset = index * 3
+            count, mean, variance = stats[offset:offset + 3]
+            delta = value - mean
+            deviation = max(math.sqrt(variance), floors[index])
+            if count >= minimum and abs(delta) > sigmas * deviation:
+                state.since_spike[index] = 0
+                state.spikes[index] = min(state.spikes[index] + 1, MAX_SPIKES)
+                name = VARIABLES[index]
+                spiked[name] = spiked.get(name, 0) + 1
+            else:
+                state.since_spike[index] = min(
+                    state.since_spike[index] + 1,
+                    NO_SPIKE
+                )
+            # Welford's update, weighting each reading at least 1/window.
+            count = min(count + 1, window)
+            weight = 1.0 / count
+            stats[offset] = count
+            stats[offset + 1] = mean + weight * delta
+            stats[offset + 2] = (1.0 - weight) * (
+                variance + weight * delta * delta
+            )
+        state.push(values)
+    return spiked
+
+
+def is_stuck(variable, recent):
+    """
+    Returns whether the last SENSOR_STUCK_READINGS readings of a variable
+    are the same. A reading at either end of its range in
+    HUB_DATA_RANGES, such as a dry leaf, is left alone since it can
+    really hold steady.
+    """
+
+    needed = settings.SENSOR_STUCK_READINGS[variable]
+    if needed is None or len(recent) < needed:
+        return False
+    recent = recent[-needed:]
+    if recent[-1] in settings.HUB_DATA_RANGES[variable]:
+        return False
+    return max(recent) - min(recent) <= settings.SENSOR_STUCK_TOLERANCE
+
+
+def report(state, now):
+    """
+    Returns the health of a node's sensors at now, in milliseconds since
+    the epoch. A node is silent when it has not reported for
+    HUB_REPORTING_MINUTES, and lists a fault for each stuck sensor and
+    each one that spiked within its last SENSOR_SPIKE_MEMORY readings.
+    """
+
+    variables = {}
+    faults = []
+    for index, name in enumerate(VARIABLES):
+        count, mean, variance = state.stats[index * 3:index * 3 + 3]
+        recent = state.recent(index)
+        stuck = is_stuck(name, recent)
+        spiking = state.since_spike[index] < settings.SENSOR_SPIKE_MEMORY
+        if stuck:
+            faults.append('{}_stuck'.format(name))
+        if spiking:
+            faults.append('{}_spiking'.format(name))
+        variables[name] = {
+            'latest': round(recent[-1], 2) if recent else None,
+            'mean': round(mean, 2) if count else None,
+            'deviation': round(math.sqrt(variance), 2) if count else None,
+            'recent_min': round(min(recent), 2) if recent else None,
+            'recent_max': round(max(recent), 2) if recent else None,
+            'spikes': state.spikes[index],
+            'stuck': stuck,
+            'spiking': spiking,
+        }
+    silent = state.last_sent is None or (
+        now - state.last_sent > settings.HUB_REPORTING_MINUTES * 60000
+    )
+    return {
+        'last_reading': state.last_sent,
+        'silent': silent,
+        'faults': faults,
+        'variables': variables,
+    }
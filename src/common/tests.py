@@ -0,0 +1,199 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import os
+import json
+import time
+
+from django.test import TestCase, Client, override_settings
+from django.test.utils import setup_test_environment
+from unittest.mock import MagicMock, patch
+
+import cassy
+from common import instrumentation, metrics, timebuckets
+
+
+class MainTests(TestCase):
+    """
+    Executes all of the unit tests for the shared common modules.
+    """
+
+    def test_buckets_between(self):
+        """
+        Tests a range is split into day buckets across a month end,
+        newest first.
+        """
+        self.assertEqual(
+            timebuckets.buckets_between(
+                1475193600000,
+                1475366400000,
+                'day'
+            ),
+            [20161002, 20161001, 20160930]
+        )
+        self.assertEqual(timebuckets.previous_bucket(201601, 'month'), 201512)
+
+    def test_histogram_quantiles(self):
+        """
+        Tests histogram percentiles fall in the expected buckets.
+        """
+        histogram = metrics.Histogram()
+        for _ in range(90):
+            histogram.observe(0.004)
+        for _ in range(10):
+            histogram.observe(0.4)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertTrue(0.003 < summary['p50'] <= 0.005)
+        self.assertTrue(0.3 < summary['p99'] <= 0.5)
+
+    @patch('cassy.connection')
+    def test_session_records_queries(self, connection_mock):
+        """
+        Tests prepares and executes through cassy.session are counted
+        for the current request.
+        """
+        result = MagicMock()
+        result.current_rows = [1, 2, 3]
+        connection_mock.get_session.return_value.execute.return_value = (
+            result
+        )
+        instrumentation.start_request()
+        cassy.session.prepare('SELECT 1;')
+        cassy.session.execute('SELECT 1;')
+        stats = instrumentation.finish_request()
+        self.assertEqual(stats.prepares, 1)
+        self.assertEqual(stats.executes, 1)
+        self.assertEqual(stats.rows, 3)
+
+    def test_server_timing_header(self):
+        """
+        Tests responses carry a Server-Timing header and are added
+        to the per-endpoint histogram.
+        """
+        setup_test_environment()
+        client = Client()
+        response = client.get('/health_check')
+        self.assertTrue(response.has_header('Server-Timing'))
+        self.assertTrue('db;' in response['Server-Timing'])
+        summary = metrics.snapshot()['request_duration_seconds']
+        self.assertTrue(summary['health_check.views.index']['count'] >= 1)
+
+
+@override_settings(DB_BACKEND='memory')
+class MemoryBackendTests(TestCase):
+    """
+    Executes cassy against the in-memory storage backend.
+    """
+
+    def setUp(self):
+        cassy.connection.reset()
+
+    def tearDown(self):
+        cassy.connection.reset()
+
+    def test_latest_env_data_returned(self):
+        """
+        Tests a stored hub batch is the reading returned for its node.
+        """
+        cassy.store_env_data({
+            'vine_id': 0,
+            'hub_id': 0,
+            'batch_sent': 4102444800000,
+            'hub_data': [{
+                'node_id': 1,
+                'temperature': 31.5,
+                'humidity': 40.0,
+                'leafwetness': 2.0,
+                'data_sent': 4102444800000,
+            }],
+        })
+        self.assertEqual(cassy.get_env_data(1, 'temperature'), 31.5)
+        self.assertEqual(cassy.get_env_data(2, 'temperature'), 20.0)
+
+    def test_session_records_async_queries(self):
+        """
+        Tests asynchronous executes through cassy.session are counted
+        for the request that started them once they resolve.
+        """
+        query = (
+            'SELECT release_version FROM system.local;'
+        )
+        instrumentation.start_request()
+        cassy.session.execute_async(query).result()
+        stats = instrumentation.finish_request()
+        self.assertEqual(stats.executes, 1)
+        self.assertEqual(stats.rows, 1)
+
+    def test_vineyard_users_contains(self):
+        """
+        Tests users are found by the vineyards in their list.
+        """
+        users = cassy.get_vineyard_users(0)
+        self.assertTrue('admin' in users)
+
+    def test_password_change_conditional(self):
+        """
+        Tests a password change only applies when the old password
+        matches.
+        """
+        cassy.create_new_user({
+            'username': 'memoryuser',
+            'password': 'first',
+            'admin': False,
+            'email': 'memory@example.com',
+            'enable': True,
+            'subenddate': '2999-12-31',
+            'userid': 4242,
+            'vineyards': [0],
+        })
+        stored = cassy.get_user_password('memoryuser')
+        with self.assertRaises(Exception):
+            cassy.change_user_password('memoryuser', 'second', 'wrong')
+        cassy.change_user_password('memoryuser', 'second', stored)
+        self.assertNotEqual(cassy.get_user_password('memoryuser'), stored)
+
+    def test_env_data_endpoint(self):
+        """
+        Tests the env_data endpoint serves the seeded fixtures offline.
+        """
+        setup_test_environment()
+        client = Client()
+        body = {
+            'vineyard_id': '0',
+            'env_variable': 'humidity',
+            'auth_token': os.environ.get('ADMIN_TOKEN'),
+        }
+        response = client.post(
+            '/env_data',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(content['env_data']), 3)
+
+    @override_settings(ENV_DATA_PARTITIONING='bucketed', ENV_DATA_BUCKET='day')
+    def test_bucketed_env_data(self):
+        """
+        Tests readings in the bucketed table are found by latest reads
+        and by range reads spanning several buckets.
+        """
+        now = int(time.time() * 1000)
+        day = 24 * 60 * 60 * 1000
+        for days_ago, temperature in ((0, 25.0), (2, 15.0)):
+            cassy.store_env_rows(0, 0, now - days_ago * day, [
+                (7, now - days_ago * day, temperature, 40.0, 2.0),
+            ])
+        self.assertEqual(cassy.get_env_data(7, 'temperature'), 25.0)
+        rows = cassy.get_env_data_range(7, 'temperature', now - 3 * day, now)
+        self.assertEqual([row[2] for row in rows], [25.0, 15.0])
+        rows = cassy.get_env_data_range(7, 'temperature', now - 3 * day,
+                                        now - day)
+        self.assertEqual([row[2] for row in rows], [15.0])
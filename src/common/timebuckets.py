@@ -0,0 +1,92 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Time buckets for the bucketed environmental data table, which is
+partitioned by (nodeid, bucket) so no node's partition grows without
+bound. A bucket is the UTC day or month of a batch's batch_sent time,
+written as an int that reads as a date: 20161019 for a day bucket and
+201610 for a month bucket.
+"""
+
+import datetime
+
+SIZES = ('day', 'month')
+
+
+def _datetime(timestamp):
+    """
+    Returns a UTC datetime for a datetime or milliseconds since the
+    epoch.
+    """
+
+    if isinstance(timestamp, datetime.datetime):
+        return timestamp
+    return datetime.datetime.utcfromtimestamp(int(timestamp) / 1000.0)
+
+
+def bucket_for(timestamp, size):
+    """
+    Returns the bucket holding timestamp.
+    """
+
+    moment = _datetime(timestamp)
+    if size == 'day':
+        return moment.year * 10000 + moment.month * 100 + moment.day
+    if size == 'month':
+        return moment.year * 100 + moment.month
+    raise ValueError('Bucket size must be one of {}.'.format(
+        ', '.join(SIZES)
+    ))
+
+
+def previous_bucket(bucket, size):
+    """
+    Returns the bucket before bucket.
+    """
+
+    if size == 'day':
+        day = datetime.date(
+            bucket // 10000,
+            bucket // 100 % 100,
+            bucket % 100
+        ) - datetime.timedelta(days=1)
+        return day.year * 10000 + day.month * 100 + day.day
+    year, month = divmod(bucket, 100)
+    if month == 1:
+        return (year - 1) * 100 + 12
+    return bucket - 1
+
+
+def buckets_between(start, end, size):
+    """
+    Returns the buckets from the one holding end back to the one holding
+    start, newest first, the order range reads want them in.
+    """
+
+    first = bucket_for(start, size)
+    bucket = bucket_for(end, size)
+    buckets = []
+    while bucket >= first:
+        buckets.append(bucket)
+        bucket = previous_bucket(bucket, size)
+    return buckets
+
+
+def latest_buckets(now, size, count):
+    """
+    Returns the count buckets up to the one holding now, newest first.
+    """
+
+    bucket = bucket_for(now, size)
+    buckets = []
+    for _ in range(count):
+        buckets.append(bucket)
+        bucket = previous_bucket(bucket, size)
+    return buckets
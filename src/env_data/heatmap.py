@@ -0,0 +1,248 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Heatmaps of environmental readings, interpolated server-side so the map
+does not have to do it on the tablet.
+
+Node readings are spread over a grid covering the vineyard by inverse
+distance weighting, and cells outside the vineyard boundary are left
+empty. Distances are taken on a local flat projection, which is exact
+enough across a vineyard. The distance weights are computed once per
+grid and shared by every variable; with NumPy installed this is done
+with whole-grid array operations, otherwise cell by cell.
+
+Grids are cached per vineyard and keyed by the vineyard's latest hub
+batch time, so a grid is computed once and reused until the next batch
+arrives.
+"""
+
+import math
+
+from common.cache import TTLCache
+from common.geometry import Polygon
+from django.conf import settings
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Metres per degree of latitude, and of longitude at the equator.
+METRES_PER_DEGREE_LAT = 110540.0
+METRES_PER_DEGREE_LON = 111320.0
+# Distances are clamped to this many metres so a cell on a node takes
+# that node's reading instead of dividing by zero.
+MIN_DISTANCE = 0.01
+
+grid_cache = TTLCache('heatmap', max_entries=256)
+
+
+def _bounds(points):
+    """
+    Returns (south, west, north, east) around points, widened a little
+    when they all share a latitude or longitude.
+    """
+
+    south = min(point[0] for point in points)
+    north = max(point[0] for point in points)
+    west = min(point[1] for point in points)
+    east = max(point[1] for point in points)
+    if north - south < 1e-6:
+        south, north = south - 0.0005, north + 0.0005
+    if east - west < 1e-6:
+        west, east = west - 0.0005, east + 0.0005
+    return south, west, north, east
+
+
+def grid_shape(bounds, resolution):
+    """
+    Returns (rows, cols) for roughly square cells, with resolution cells
+    along the longer side of bounds.
+    """
+
+    south, west, north, east = bounds
+    scale = math.cos(math.radians((south + north) / 2))
+    height = (north - south) * METRES_PER_DEGREE_LAT
+    width = (east - west) * METRES_PER_DEGREE_LON * scale
+    cell = max(height, width) / resolution
+    rows = max(1, min(resolution, int(round(height / cell))))
+    cols = max(1, min(resolution, int(round(width / cell))))
+    return rows, cols
+
+
+def _cell_centres(bounds, rows, cols):
+    """
+    Returns the (lat, lon) of each cell centre, row by row from the
+    north-west corner.
+    """
+
+    south, west, north, east = bounds
+    cell_lat = (north - south) / rows
+    cell_lon = (east - west) / cols
+    return [
+        (north - (row + 0.5) * cell_lat, west + (col + 0.5) * cell_lon)
+        for row in range(rows)
+        for col in range(cols)
+    ]
+
+
+def _interpolate_python(centres, boundary, nodes, series, power, scale):
+    polygon = Polygon(boundary) if boundary else None
+    cells = []
+    for lat, lon in centres:
+        if polygon is not None and not polygon.contains(lat, lon):
+            cells.append(None)
+            continue
+        weights = []
+        for node_lat, node_lon in nodes:
+            distance = math.hypot(
+                (lat - node_lat) * METRES_PER_DEGREE_LAT,
+                (lon - node_lon) * METRES_PER_DEGREE_LON * scale
+            )
+            weights.append(max(distance, MIN_DISTANCE) ** -power)
+        cells.append(weights)
+
+    grids = {}
+    for variable, values in series.items():
+        grid = []
+        for weights in cells:
+            if weights is None:
+                grid.append(None)
+                continue
+            total = 0.0
+            weight_sum = 0.0
+            for weight, value in zip(weights, values):
+                if value is not None:
+                    total += weight * value
+                    weight_sum += weight
+            grid.append(total / weight_sum if weight_sum else None)
+        grids[variable] = grid
+    return grids
+
+
+def _interpolate_numpy(centres, boundary, nodes, series, power, scale):
+    centres = numpy.array(centres, dtype=float)
+    lats, lons = centres[:, 0], centres[:, 1]
+    inside = numpy.ones(len(centres), dtype=bool)
+    if boundary:
+        inside[:] = False
+        polygon = numpy.array(boundary, dtype=float)
+        previous = polygon[-1]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            for point in polygon:
+                crosses = (point[0] > lats) != (previous[0] > lats)
+                edge_lon = (
+                    (previous[1] - point[1]) * (lats - point[0]) /
+                    (previous[0] - point[0]) + point[1]
+                )
+                inside ^= crosses & (lons < edge_lon)
+                previous = point
+
+    # (cells, nodes) weights for the cells inside the boundary only.
+    nodes = numpy.array(nodes, dtype=float)
+    dy = (lats[inside][:, None] - nodes[None, :, 0]) * METRES_PER_DEGREE_LAT
+    dx = (lons[inside][:, None] - nodes[None, :, 1]) * (
+        METRES_PER_DEGREE_LON * scale
+    )
+    distances = numpy.maximum(numpy.hypot(dx, dy), MIN_DISTANCE)
+    weights = distances ** -float(power)
+
+    grids = {}
+    for variable, values in series.items():
+        reported = numpy.array([value is not None for value in values])
+        grid = [None] * len(centres)
+        if reported.any():
+            known = numpy.array(
+                [value for value in values if value is not None],
+                dtype=float
+            )
+            used = weights[:, reported]
+            cells = used.dot(known) / used.sum(axis=1)
+            for index, value in zip(numpy.flatnonzero(inside), cells):
+                grid[index] = float(value)
+        grids[variable] = grid
+    return grids
+
+
+def interpolate(boundary, points, variables, resolution, power):
+    """
+    Returns a heatmap of points, a list of {'latitude', 'longitude',
+    variable: value}, over the vineyard boundary, a list of {'lat',
+    'lon'}:
+
+        {'bounds': {'south', 'west', 'north', 'east'}, 'rows', 'cols',
+         'grids': {variable: {'min', 'max', 'values'}}}
+
+    values lists each cell row by row from the north-west corner,
+    rounded to two places, with None for cells outside the boundary.
+    A boundary of fewer than three points is not clipped to.
+    """
+
+    polygon = [(point['lat'], point['lon']) for point in boundary]
+    if len(polygon) < 3:
+        polygon = []
+    nodes = [(point['latitude'], point['longitude']) for point in points]
+    bounds = _bounds(polygon + nodes)
+    rows, cols = grid_shape(bounds, resolution)
+    centres = _cell_centres(bounds, rows, cols)
+    scale = math.cos(math.radians((bounds[0] + bounds[2]) / 2))
+    series = {
+        variable: [point.get(variable) for point in points]
+        for variable in variables
+    }
+    if not nodes:
+        grids = {variable: [None] * len(centres) for variable in variables}
+    elif numpy is not None:
+        grids = _interpolate_numpy(
+            centres, polygon, nodes, series, power, scale
+        )
+    else:
+        grids = _interpolate_python(
+            centres, polygon, nodes, series, power, scale
+        )
+
+    heatmap = {
+        'bounds': dict(zip(('south', 'west', 'north', 'east'), bounds)),
+        'rows': rows,
+        'cols': cols,
+        'grids': {},
+    }
+    for variable, grid in grids.items():
+        values = [value for value in grid if value is not None]
+        heatmap['grids'][variable] = {
+            'min': round(min(values), 2) if values else None,
+            'max': round(max(values), 2) if values else None,
+            'values': [
+                round(value, 2) if value is not None else None
+                for value in grid
+            ],
+        }
+    return heatmap
+
+
+def cached_heatmap(vineyard_id, latest_batch, boundary, points, variables,
+                   resolution, power):
+    """
+    Returns interpolate's heatmap from the cache when it was computed
+    for the same latest hub batch, and computes and caches it otherwise.
+    """
+
+    key = (
+        str(vineyard_id),
+        latest_batch,
+        tuple(variables),
+        resolution,
+        power,
+    )
+    heatmap = grid_cache.get(key)
+    if heatmap is None:
+        heatmap = interpolate(boundary, points, variables, resolution, power)
+        grid_cache.set(key, heatmap, settings.ENV_DATA_HEATMAP_CACHE_SECONDS)
+    return heatmap
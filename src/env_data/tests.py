@@ -14,6 +14,8 @@ from django.test import TestCase, Client
 from django.test.utils import setup_test_environment
 from unittest.mock import patch
 
+from env_data import heatmap
+
 
 class MainTests(TestCase):
     """
@@ -224,3 +226,158 @@ class MainTests(TestCase):
             content_type='application/json'
         )
         self.assertEqual(response.status_code, 403)
+
+    def test_response_all_env_data(self):
+        """
+        Test env data endpoint when all variables are requested at once.
+        """
+        setup_test_environment()
+        client = Client()
+        body = {
+            'vineyard_id': '0',
+            'env_variable': 'all',
+            'auth_token': os.environ.get('LOGIN_SEC_TOKEN'),
+        }
+        response = client.post(
+            '/env_data',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        for data_point in content['env_data']:
+            self.assertTrue('temperature' in data_point)
+            self.assertTrue('humidity' in data_point)
+            self.assertTrue('leafwetness' in data_point)
+
+    @patch('cassy.get_env_data')
+    def test_response_env_data_list(self, env_data_mock):
+        """
+        Test env data endpoint reads a list of variables in one call per
+        node.
+        """
+        setup_test_environment()
+        client = Client()
+        env_data_mock.return_value = {'humidity': 40.0, 'temperature': 20.0}
+        body = {
+            'vineyard_id': '0',
+            'env_variable': ['humidity', 'temperature', 'humidity'],
+            'auth_token': os.environ.get('LOGIN_SEC_TOKEN'),
+        }
+        response = client.post(
+            '/env_data',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            env_data_mock.call_count,
+            len(content['env_data'])
+        )
+        self.assertEqual(
+            env_data_mock.call_args[0][1],
+            ['humidity', 'temperature']
+        )
+        self.assertEqual(content['env_data'][0]['humidity'], 40.0)
+
+    def test_response_invalid_env_variable_list(self):
+        """
+        Test env data endpoint when a listed variable is not supported.
+        """
+        setup_test_environment()
+        client = Client()
+        body = {
+            'vineyard_id': '0',
+            'env_variable': ['temperature', 'rainfall'],
+            'auth_token': os.environ.get('LOGIN_SEC_TOKEN'),
+        }
+        response = client.post(
+            '/env_data',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_response_heatmap(self):
+        """
+        Test env data endpoint returns an interpolated grid in heatmap
+        mode, and reuses it until the next hub batch.
+        """
+        setup_test_environment()
+        client = Client()
+        heatmap.grid_cache.invalidate()
+        body = {
+            'vineyard_id': '0',
+            'env_variable': 'temperature',
+            'auth_token': os.environ.get('LOGIN_SEC_TOKEN'),
+            'mode': 'heatmap',
+            'resolution': 16,
+        }
+        with patch(
+            'env_data.heatmap.interpolate',
+            wraps=heatmap.interpolate
+        ) as interpolate_mock:
+            responses = [
+                client.post(
+                    '/env_data',
+                    data=json.dumps(body),
+                    content_type='application/json'
+                )
+                for _ in range(2)
+            ]
+        content = json.loads(responses[1].content.decode('utf-8'))
+        self.assertEqual(responses[1].status_code, 200)
+        self.assertEqual(interpolate_mock.call_count, 1)
+        grid = content['heatmap']
+        self.assertTrue(max(grid['rows'], grid['cols']) <= 16)
+        self.assertEqual(
+            len(grid['grids']['temperature']['values']),
+            grid['rows'] * grid['cols']
+        )
+
+    def test_response_heatmap_invalid_resolution(self):
+        """
+        Test env data endpoint rejects a heatmap resolution out of range.
+        """
+        setup_test_environment()
+        client = Client()
+        body = {
+            'vineyard_id': '0',
+            'env_variable': 'temperature',
+            'auth_token': os.environ.get('LOGIN_SEC_TOKEN'),
+            'mode': 'heatmap',
+            'resolution': 100000,
+        }
+        response = client.post(
+            '/env_data',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_heatmap_interpolation(self):
+        """
+        Tests cells take the reading of a node on them, lie between the
+        readings elsewhere, and are empty outside the boundary.
+        """
+        boundary = [
+            {'lat': 45.0, 'lon': -123.0},
+            {'lat': 45.0, 'lon': -122.99},
+            {'lat': 45.01, 'lon': -122.99},
+        ]
+        points = [
+            {'latitude': 45.0005, 'longitude': -122.9905,
+             'temperature': 10.0},
+            {'latitude': 45.0095, 'longitude': -122.9905,
+             'temperature': 20.0},
+        ]
+        grid = heatmap.interpolate(boundary, points, ['temperature'], 10, 2)
+        values = grid['grids']['temperature']['values']
+        self.assertEqual((grid['rows'], grid['cols']), (10, 7))
+        self.assertEqual(values[-1], 10.0)
+        self.assertTrue(grid['grids']['temperature']['max'] > 19.0)
+        self.assertEqual(values[0], None)
+        self.assertTrue(
+            all(10.0 <= value <= 20.0 for value in values if value)
+        )
@@ -15,7 +15,7 @@ import os
 
 from common.exceptions import *
 from common.errors import *
-from django.core.mail import send_mail
+from common.mail import send_mail_async
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.http import (
@@ -26,9 +26,48 @@ from django.http import (
 )
 
 import cassy
+from .heatmap import cached_heatmap
 
 logger = logging.getLogger('plantalytics_backend.env_data')
 
+ENV_VARIABLES = ['temperature', 'humidity', 'leafwetness']
+
+
+def requested_env_variables(env_variable):
+    """
+    Returns the list of variables asked for by a list of names or 'all',
+    without repeats, or None for a single variable.
+    """
+
+    if env_variable == 'all':
+        return list(ENV_VARIABLES)
+    if not isinstance(env_variable, list):
+        return None
+    env_variables = []
+    for variable in env_variable:
+        if str(variable) not in env_variables:
+            env_variables.append(str(variable))
+    return env_variables
+
+
+def heatmap_resolution(request_data):
+    """
+    Returns the number of heatmap cells asked for along the longer side
+    of the vineyard, or ENV_DATA_HEATMAP_RESOLUTION. Raises
+    PlantalyticsDataException(ENV_DATA_INVALID) outside 2 to
+    ENV_DATA_HEATMAP_MAX_RESOLUTION.
+    """
+
+    resolution = request_data.get(
+        'resolution',
+        settings.ENV_DATA_HEATMAP_RESOLUTION
+    )
+    if isinstance(resolution, bool) or not isinstance(resolution, int) or (
+        not 2 <= resolution <= settings.ENV_DATA_HEATMAP_MAX_RESOLUTION
+    ):
+        raise PlantalyticsDataException(ENV_DATA_INVALID)
+    return resolution
+
 
 def check_hubs_not_reporting(latest_times):
     """
@@ -75,12 +114,11 @@ def send_hub_not_reporting_email(vineyard_id):
             'A hub has failed to report data within the last 20 minutes at '
             'the following vineyard:\n\n{}'
         ).format(vineyard_name)
-        send_mail(
+        send_mail_async(
             'Plantalytics - Hub Not Reporting',
             message,
             settings.EMAIL_HOST_USER,
             [os.environ.get('RESET_EMAIL')],
-            fail_silently=False,
         )
     except Exception as e:
         raise e
@@ -98,7 +136,14 @@ def index(request):
     request_data = json.loads(request.body.decode('utf-8'))
     auth_token = str(request_data.get('auth_token', ''))
     vineyard_id = request_data.get('vineyard_id', '')
-    env_variable = str(request_data.get('env_variable', ''))
+    env_variables = requested_env_variables(
+        request_data.get('env_variable', '')
+    )
+    if env_variables is None:
+        env_variable = str(request_data.get('env_variable', ''))
+    else:
+        env_variable = ', '.join(env_variables)
+    heatmap = request_data.get('mode') == 'heatmap'
 
     try:
         message = (
@@ -119,13 +164,15 @@ def index(request):
             'Fetching {} data.'
         ).format(env_variable)
         logger.info(message)
+        if heatmap:
+            resolution = heatmap_resolution(request_data)
 
         # Check most recent hub batch timestamp
         message = (
             'Checking latest hub batch times.'
         )
         logger.info(message)
-        latest_times = cassy.check_latest_batch_time(vineyard_id)
+        latest_times = list(cassy.check_latest_batch_time(vineyard_id))
         hubs_are_reporting = check_hubs_not_reporting(latest_times)
         if(hubs_are_reporting is False):
             message = (
@@ -137,21 +184,40 @@ def index(request):
         coordinates = cassy.get_node_coordinates(vineyard_id)
 
         # Build data structure to return as JSON response content.
+        # Several variables are read from a node's row in one query.
         map_data = []
         for coordinate in coordinates:
-            value = cassy.get_env_data(
-                coordinate['node_id'],
-                env_variable
-            )
             map_data_point = {
                 'latitude': coordinate['lat'],
                 'longitude': coordinate['lon'],
-                env_variable: value,
             }
+            if env_variables is None:
+                map_data_point[env_variable] = cassy.get_env_data(
+                    coordinate['node_id'],
+                    env_variable
+                )
+            else:
+                map_data_point.update(cassy.get_env_data(
+                    coordinate['node_id'],
+                    env_variables
+                ))
             map_data.append(map_data_point)
         response = {
             'env_data': map_data,
         }
+        if heatmap:
+            # The grid only changes when a hub sends a batch, so it is
+            # cached under the latest batch time.
+            boundary = cassy.get_vineyard_coordinates(vineyard_id)[1]
+            response['heatmap'] = cached_heatmap(
+                vineyard_id,
+                max(row.lasthubbatchsent for row in latest_times),
+                boundary,
+                map_data,
+                env_variables or [env_variable],
+                resolution,
+                settings.ENV_DATA_HEATMAP_POWER
+            )
 
         message = (
             'Successfully fetched {} data for vineyard id {}.'
@@ -0,0 +1,129 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import os
+import csv
+import json
+import datetime
+
+from common import export
+from django.test import TestCase, Client, override_settings
+from django.test.utils import setup_test_environment
+
+import cassy
+
+MINUTE = 60000
+# Midnight UTC on 19 October 2016, in milliseconds.
+START = 1476835200000
+
+
+class MainTests(TestCase):
+    """
+    Executes all of the unit tests for the export endpoint.
+    """
+
+    @override_settings(EXPORT_CHUNK_ROWS=2)
+    def test_csv_chunks(self):
+        """
+        Tests CSV exports come out a few rows at a time, with readable
+        times and readings.
+        """
+        sent = datetime.datetime(2016, 10, 19, 12, 30)
+        rows = [
+            (0, node_id, sent, START + node_id * MINUTE, 20.1, 55.0, None)
+            for node_id in range(5)
+        ]
+        chunks = list(export.iter_csv(iter(rows)))
+        self.assertEqual(len(chunks), 3)
+        lines = list(csv.reader(b''.join(chunks).decode('utf-8').splitlines()))
+        self.assertEqual(tuple(lines[0]), export.COLUMNS)
+        self.assertEqual(lines[2], [
+            '0',
+            '1',
+            '2016-10-19T12:30:00.000Z',
+            '2016-10-19T00:01:00.000Z',
+            '20.1',
+            '55',
+            '',
+        ])
+
+    @override_settings(DB_BACKEND='memory')
+    def test_response_export(self):
+        """
+        Tests a stored hub batch is exported as CSV for its day only.
+        """
+        setup_test_environment()
+        cassy.connection.reset()
+        cassy.hub_batch_cache.invalidate()
+        cassy.store_env_data({
+            'vine_id': 0,
+            'hub_id': 0,
+            'batch_sent': START + 30 * MINUTE,
+            'hub_data': [
+                {
+                    'node_id': 1,
+                    'temperature': 20.0,
+                    'humidity': 50.0,
+                    'leafwetness': 10.0,
+                    'data_sent': START + minute * MINUTE,
+                }
+                for minute in range(3)
+            ],
+        })
+        client = Client()
+        body = {
+            'vineyard_id': '0',
+            'auth_token': os.environ.get('ADMIN_TOKEN'),
+            'start': '2016-10-19',
+            'end': '2016-10-19',
+        }
+        response = client.post(
+            '/export',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        content = b''.join(response.streaming_content).decode('utf-8')
+        cassy.connection.reset()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = list(csv.reader(content.splitlines()))
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[1][:2], ['0', '1'])
+        self.assertEqual(lines[1][4:], ['20', '50', '10'])
+
+    @override_settings(DB_BACKEND='memory')
+    def test_response_export_invalid_range(self):
+        """
+        Tests the export endpoint with an end before its start.
+        """
+        setup_test_environment()
+        cassy.connection.reset()
+        client = Client()
+        body = {
+            'vineyard_id': '0',
+            'auth_token': os.environ.get('ADMIN_TOKEN'),
+            'start': '2016-10-19',
+            'end': '2016-10-18',
+        }
+        response = client.post(
+            '/export',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        cassy.connection.reset()
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_invalid_method(self):
+        """
+        Tests the export endpoint with unsupported HTTP method.
+        """
+        setup_test_environment()
+        client = Client()
+        response = client.get('/export')
+        self.assertEqual(response.status_code, 405)
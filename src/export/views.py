@@ -0,0 +1,138 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import datetime
+import json
+import logging
+
+from common import export
+from common.exceptions import *
+from common.errors import *
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+from django.http import (
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed,
+    StreamingHttpResponse
+)
+
+import cassy
+
+logger = logging.getLogger('plantalytics_backend.export')
+
+
+def date_range(start, end):
+    """
+    Returns (start, end) datetimes covering the days start to end,
+    inclusive, given as YYYY-MM-DD. Raises
+    PlantalyticsDataException(DATA_INVALID) for a bad or reversed range.
+    """
+
+    try:
+        first = datetime.datetime.strptime(str(start), '%Y-%m-%d')
+        last = datetime.datetime.strptime(str(end), '%Y-%m-%d')
+    except ValueError:
+        raise PlantalyticsDataException(DATA_INVALID)
+    if last < first:
+        raise PlantalyticsDataException(DATA_INVALID)
+    # Inclusive range ending the millisecond before the next day began.
+    return first, last + datetime.timedelta(days=1, milliseconds=-1)
+
+
+@csrf_exempt
+def index(request):
+    """
+    Streams a vineyard's readings for a range of days as CSV or, when
+    pyarrow is installed, Parquet.
+    """
+
+    if request.method != "POST":
+        return HttpResponseNotAllowed(['POST'])
+
+    data = json.loads(request.body.decode('utf-8'))
+    vineyard_id = str(data.get('vineyard_id', ''))
+    auth_token = str(data.get('auth_token', ''))
+    export_format = str(data.get('format', 'csv'))
+
+    try:
+        message = (
+            'Validating auth token for export of vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+
+        username = cassy.verify_auth_token(auth_token)
+        authorized = set(
+            str(vineyard['vineyard_id'])
+            for vineyard in cassy.get_authorized_vineyards(username)
+        )
+        if vineyard_id not in authorized:
+            raise PlantalyticsAuthException(AUTH_VINEYARD)
+    except PlantalyticsException as e:
+        message = (
+            'Invalid auth token for export of vineyard id {}'
+        ).format(vineyard_id)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while auth token for export of vineyard id '
+            '{}\n{}.'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        error = custom_error(AUTH_UNKNOWN, str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+
+    try:
+        message = (
+            'Exporting vineyard id {} as {}.'
+        ).format(vineyard_id, export_format)
+        logger.info(message)
+
+        if export_format not in export.formats():
+            raise PlantalyticsDataException(DATA_INVALID)
+        start, end = date_range(data.get('start'), data.get('end'))
+        if (end - start).days >= settings.EXPORT_MAX_DAYS:
+            raise PlantalyticsDataException(DATA_INVALID)
+        node_ids = [
+            node['node_id']
+            for node in cassy.get_node_coordinates(vineyard_id)
+        ]
+    except PlantalyticsException as e:
+        message = (
+            'Invalid export request for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while exporting vineyard id {}. {}'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        error = custom_error(VINEYARD_UNKNOWN, str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
+
+    response = StreamingHttpResponse(
+        export.iter_export(
+            cassy.iter_vineyard_env_data(vineyard_id, node_ids, start, end),
+            export_format
+        ),
+        content_type=export.CONTENT_TYPES[export_format]
+    )
+    response['Content-Disposition'] = (
+        'attachment; filename="vineyard-{}-{}-{}.{}"'
+    ).format(
+        vineyard_id,
+        start.strftime('%Y%m%d'),
+        end.strftime('%Y%m%d'),
+        export_format
+    )
+    return response
@@ -0,0 +1,123 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import os
+import json
+import datetime
+
+from common import gdd
+from django.test import TestCase, Client, override_settings
+from django.test.utils import setup_test_environment
+
+import cassy
+from gdd.views import daily_series
+
+HOUR = 3600000
+# Midnight UTC on 19 October 2016, in milliseconds.
+START = 1476835200000
+
+
+class MainTests(TestCase):
+    """
+    Executes all of the unit tests for the gdd endpoint.
+    """
+
+    @override_settings(GDD_SEASON_START=(4, 1))
+    def test_accumulate_degree_days(self):
+        """
+        Tests a day is added to the season once the next one starts,
+        with its highest temperature capped and a late reading ignored.
+        """
+        state = gdd.new_state()
+        finished = gdd.apply(state, [
+            (START + hour * HOUR, 12.0 + hour) for hour in range(24)
+        ])
+        self.assertEqual(finished, [])
+        finished = gdd.apply(state, [
+            (START + 24 * HOUR, 15.0),
+            (START + 2 * HOUR, -5.0),
+        ])
+        self.assertEqual(finished, [(20161019, 12.0, 35.0, 11.0)])
+        self.assertEqual(gdd.current(state, 2016), (11.0, 5.0))
+        self.assertEqual(gdd.current(state, 2017), (0.0, 0.0))
+
+    def test_daily_series(self):
+        """
+        Tests the daily series averages the nodes reporting each day.
+        """
+        series = daily_series({
+            1: [(20161019, 4.0), (20161020, 6.0)],
+            2: [(20161019, 2.0)],
+        })
+        self.assertEqual(series, [
+            {'day': 20161019, 'gdd': 3.0, 'cumulative': 3.0},
+            {'day': 20161020, 'gdd': 6.0, 'cumulative': 9.0},
+        ])
+
+    @override_settings(DB_BACKEND='memory', GDD_SEASON_START=(1, 1))
+    def test_response_gdd(self):
+        """
+        Tests stored hub batches move a node's degree-days forward and
+        are served with the daily series.
+        """
+        setup_test_environment()
+        cassy.connection.reset()
+        cassy.hub_batch_cache.invalidate()
+        today = datetime.datetime.utcnow().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        if today.month == 1 and today.day == 1:
+            today += datetime.timedelta(days=1)
+        for offset, temperatures in ((1, (10.0, 20.0)), (0, (14.0,))):
+            moment = today - datetime.timedelta(days=offset)
+            batch_sent = int((
+                moment - datetime.datetime(1970, 1, 1)
+            ).total_seconds() * 1000)
+            cassy.store_env_data({
+                'vine_id': 0,
+                'hub_id': 0,
+                'batch_sent': batch_sent,
+                'hub_data': [
+                    {
+                        'node_id': 2,
+                        'temperature': temperature,
+                        'humidity': 50.0,
+                        'leafwetness': 0.0,
+                        'data_sent': batch_sent + index * HOUR,
+                    }
+                    for index, temperature in enumerate(temperatures)
+                ],
+            })
+        client = Client()
+        body = {
+            'vineyard_id': '0',
+            'auth_token': os.environ.get('LOGIN_SEC_TOKEN'),
+            'daily': True,
+        }
+        response = client.post(
+            '/gdd',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        cassy.connection.reset()
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content['nodes'][0]['node_id'], 2)
+        self.assertEqual(content['nodes'][0]['gdd'], 5.0)
+        self.assertEqual(content['nodes'][0]['today'], 4.0)
+        self.assertEqual(content['daily'][0]['cumulative'], 5.0)
+
+    def test_gdd_invalid_method(self):
+        """
+        Tests the gdd endpoint with unsupported HTTP method.
+        """
+        setup_test_environment()
+        client = Client()
+        response = client.get('/gdd')
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,153 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import datetime
+import json
+import logging
+
+from common import gdd, timebuckets
+from common.exceptions import PlantalyticsException
+from common.errors import *
+from django.views.decorators.csrf import csrf_exempt
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed
+)
+
+import cassy
+
+logger = logging.getLogger('plantalytics_backend.gdd')
+
+
+def daily_series(daily):
+    """
+    Returns the vineyard's daily series from {node_id: [(day,
+    degree-days)]}: each day's mean across the nodes that reported it,
+    and the running total of those means.
+    """
+
+    by_day = {}
+    for days in daily.values():
+        for day, degree_days in days:
+            by_day.setdefault(day, []).append(degree_days)
+    series = []
+    cumulative = 0.0
+    for day in sorted(by_day):
+        mean = sum(by_day[day]) / len(by_day[day])
+        cumulative += mean
+        series.append({
+            'day': day,
+            'gdd': round(mean, 2),
+            'cumulative': round(cumulative, 2),
+        })
+    return series
+
+
+@csrf_exempt
+def index(request):
+    """
+    Responds with the growing degree-days of a vineyard's nodes since the
+    start of the season, their mean, and optionally the daily series.
+    """
+
+    if request.method != "POST":
+        return HttpResponseNotAllowed(['POST'])
+
+    data = json.loads(request.body.decode('utf-8'))
+    vineyard_id = str(data.get('vineyard_id', ''))
+    auth_token = str(data.get('auth_token', ''))
+    include_daily = data.get('daily', False) is True
+
+    try:
+        message = (
+            'Validating auth token for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+
+        cassy.verify_auth_token(auth_token)
+    except PlantalyticsException as e:
+        message = (
+            'Invalid auth token for vineyard id {}'
+        ).format(vineyard_id)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while auth token for vineyard id {}\n{}.'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        error = custom_error(AUTH_UNKNOWN, str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+
+    try:
+        message = (
+            'Fetching growing degree-days for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+
+        season = gdd.season_of(
+            timebuckets.bucket_for(datetime.datetime.utcnow(), 'day')
+        )
+        coordinates = cassy.get_node_coordinates(vineyard_id)
+        node_ids = [coordinate['node_id'] for coordinate in coordinates]
+        states = cassy.get_gdd_states(node_ids)
+        nodes = []
+        for coordinate in coordinates:
+            state = states.get(coordinate['node_id'])
+            if state is None:
+                continue
+            total, today = gdd.current(state, season)
+            nodes.append({
+                'node_id': coordinate['node_id'],
+                'latitude': coordinate['lat'],
+                'longitude': coordinate['lon'],
+                'gdd': round(total, 2),
+                'today': round(today, 2),
+            })
+        response = {
+            'season': season,
+            'gdd': round(
+                sum(node['gdd'] for node in nodes) / len(nodes), 2
+            ) if nodes else None,
+            'nodes': nodes,
+        }
+        if include_daily:
+            if season is None:
+                response['daily'] = []
+            else:
+                response['daily'] = daily_series(
+                    cassy.get_gdd_daily(node_ids, season)
+                )
+
+        message = (
+            'Successfully fetched growing degree-days for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+        return HttpResponse(
+            json.dumps(response),
+            content_type='application/json'
+        )
+    except PlantalyticsException as e:
+        message = (
+            'Invalid vineyard ID while fetching growing degree-days: {}'
+        ).format(vineyard_id)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while fetching growing degree-days for '
+            'vineyard id {}. {}'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        error = custom_error(VINEYARD_UNKNOWN, str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
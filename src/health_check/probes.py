@@ -0,0 +1,96 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Readiness probes for the services the backend depends on. Each probe
+returns nothing when the dependency is usable and raises otherwise.
+Results are cached for HEALTH_CHECK_CACHE_SECONDS so a load balancer
+polling every worker does not turn into a steady load on Cassandra.
+"""
+
+import time
+
+import cassy
+from common import mail, metrics
+from common.cache import TTLCache
+from django.conf import settings
+from django.core.mail import get_connection
+
+results_cache = TTLCache('readiness', max_entries=1)
+
+
+def probe_cassandra():
+    cassy.check_database(settings.HEALTH_CHECK_DATABASE_TIMEOUT)
+
+
+def probe_mail():
+    mail_connection = get_connection(
+        fail_silently=False,
+        timeout=settings.HEALTH_CHECK_MAIL_TIMEOUT
+    )
+    mail_connection.open()
+    mail_connection.close()
+
+
+def probe_mail_queue():
+    depth = mail.queue_depth()
+    if depth >= settings.EMAIL_QUEUE_SIZE:
+        raise Exception('Email queue is full ({} waiting).'.format(depth))
+
+
+# Name, probe, and whether the backend is unusable when it fails. Only
+# Cassandra is required: every endpoint reads or writes it, while mail
+# only delays notifications.
+PROBES = (
+    ('cassandra', probe_cassandra, True),
+    ('mail', probe_mail, False),
+    ('mail_queue', probe_mail_queue, False),
+)
+
+
+def run_probes():
+    """
+    Runs every probe and returns (ready, dependencies), where
+    dependencies maps each name to its status and latency.
+    """
+
+    ready = True
+    dependencies = {}
+    for name, probe, required in PROBES:
+        start = time.perf_counter()
+        try:
+            probe()
+            error = None
+        except Exception as e:
+            error = str(e)
+        latency = time.perf_counter() - start
+        metrics.observe('dependency_probe_seconds', name, latency)
+        dependencies[name] = {
+            'ok': error is None,
+            'required': required,
+            'latencyMs': round(latency * 1000, 3),
+        }
+        if error is not None:
+            dependencies[name]['error'] = error
+            if required:
+                ready = False
+    return ready, dependencies
+
+
+def check_readiness():
+    """
+    Returns (ready, dependencies, cached), reusing a recent result.
+    """
+
+    result = results_cache.get('result')
+    if result is not None:
+        return result + (True,)
+    result = run_probes()
+    results_cache.set('result', result, settings.HEALTH_CHECK_CACHE_SECONDS)
+    return result + (False,)
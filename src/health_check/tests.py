@@ -9,6 +9,8 @@
 
 import json
 
+from unittest.mock import patch
+from health_check import probes
 from django.test import TestCase, Client
 from django.test.utils import setup_test_environment
 
@@ -25,3 +27,72 @@ class MainTests(TestCase):
         status = json.loads(response.content.decode('utf-8'))
         self.assertEqual(status['isAlive'], True)
         self.assertEqual(response.status_code, 200)
+
+    @patch('health_check.probes.get_connection')
+    @patch('cassy.check_database')
+    def test_ready_response(self, check_database_mock, get_connection_mock):
+        """
+        Tests the readiness check with Cassandra and mail both up.
+        """
+        setup_test_environment()
+        probes.results_cache.invalidate()
+        client = Client()
+        response = client.get('/health_check/ready')
+        status = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(status['isReady'], True)
+        self.assertEqual(status['cached'], False)
+        self.assertEqual(status['dependencies']['cassandra']['ok'], True)
+        self.assertIn('latencyMs', status['dependencies']['mail'])
+        check_database_mock.assert_called_once_with(2)
+
+    @patch('health_check.probes.get_connection')
+    @patch('cassy.check_database')
+    def test_ready_database_down(self, check_database_mock,
+                                 get_connection_mock):
+        """
+        Tests the readiness check answers 503 when Cassandra is down.
+        """
+        setup_test_environment()
+        probes.results_cache.invalidate()
+        check_database_mock.side_effect = Exception('No hosts available')
+        client = Client()
+        response = client.get('/health_check/ready')
+        status = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(status['isReady'], False)
+        self.assertEqual(
+            status['dependencies']['cassandra']['error'],
+            'No hosts available'
+        )
+
+    @patch('health_check.probes.get_connection')
+    @patch('cassy.check_database')
+    def test_ready_mail_down(self, check_database_mock, get_connection_mock):
+        """
+        Tests the readiness check stays ready when only mail is down.
+        """
+        setup_test_environment()
+        probes.results_cache.invalidate()
+        get_connection_mock.return_value.open.side_effect = OSError('refused')
+        client = Client()
+        response = client.get('/health_check/ready')
+        status = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(status['dependencies']['mail']['ok'], False)
+
+    @patch('health_check.probes.get_connection')
+    @patch('cassy.check_database')
+    def test_ready_result_cached(self, check_database_mock,
+                                get_connection_mock):
+        """
+        Tests a second readiness check is answered from the cache.
+        """
+        setup_test_environment()
+        probes.results_cache.invalidate()
+        client = Client()
+        client.get('/health_check/ready')
+        response = client.get('/health_check/ready')
+        status = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(status['cached'], True)
+        self.assertEqual(check_database_mock.call_count, 1)
@@ -12,4 +12,5 @@ from . import views
 
 urlpatterns = [
     url(r'^$', views.index, name='index'),
+    url(r'^/ready$', views.ready, name='ready'),
 ]
@@ -10,8 +10,9 @@
 import json
 import logging
 
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotAllowed
 from django.views.decorators.csrf import csrf_exempt
+from . import probes
 
 logger = logging.getLogger('plantalytics_backend.health_check')
 
@@ -23,3 +24,32 @@ def index(request):
         'isAlive': True,
     }
     return HttpResponse(json.dumps(response), content_type='application/json')
+
+
+@csrf_exempt
+def ready(request):
+    """
+    Reports whether this worker can serve requests, with the status and
+    latency of each dependency. Answers 503 when a required dependency
+    is down so the load balancer stops routing here.
+    """
+
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    is_ready, dependencies, cached = probes.check_readiness()
+    if not is_ready:
+        message = (
+            'Readiness check failed: {}.'
+        ).format(json.dumps(dependencies, sort_keys=True))
+        logger.warning(message)
+    response = {
+        'isReady': is_ready,
+        'cached': cached,
+        'dependencies': dependencies,
+    }
+    return HttpResponse(
+        json.dumps(response),
+        content_type='application/json',
+        status=200 if is_ready else 503
+    )
@@ -0,0 +1,149 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Compressed and binary hub uploads.
+
+Bodies may be sent with Content-Encoding gzip or deflate. Instead of
+JSON, a hub may send Content-Type application/vnd.plantalytics.hub-batch,
+a little-endian binary batch:
+
+    magic       4 bytes   b'PLH1'
+    key length  uint16
+    key         UTF-8 hub key
+    vine_id     int32
+    hub_id      int32
+    batch_sent  int64     milliseconds since the epoch
+    count       uint32    number of records that follow
+
+followed by `count` fixed-width records of 24 bytes:
+
+    node_id     int32
+    data_sent   int64     milliseconds since the epoch
+    temperature float32
+    humidity    float32
+    leafwetness float32
+
+Records are unpacked straight from a memoryview of the body into tuples
+in the row layout cassy.store_env_rows inserts.
+"""
+
+import struct
+import zlib
+
+from django.conf import settings
+
+BINARY_CONTENT_TYPE = 'application/vnd.plantalytics.hub-batch'
+MAGIC = b'PLH1'
+
+PREFIX = struct.Struct('<4sH')
+HEADER = struct.Struct('<iiqI')
+RECORD = struct.Struct('<iqfff')
+
+# wbits for zlib: gzip framing, zlib framing, and raw deflate, which some
+# clients send for Content-Encoding: deflate.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+DEFLATE_WBITS = (zlib.MAX_WBITS, -zlib.MAX_WBITS)
+
+
+class UnsupportedEncoding(ValueError):
+    pass
+
+
+def _inflate(body, wbits, limit):
+    decompressor = zlib.decompressobj(wbits)
+    data = decompressor.decompress(body, limit + 1)
+    if len(data) > limit:
+        raise ValueError(
+            'Body inflates to more than {} bytes.'.format(limit)
+        )
+    if not decompressor.eof:
+        raise ValueError('Compressed body is truncated.')
+    return data
+
+
+def decompress(body, content_encoding):
+    """
+    Undoes a gzip or deflate Content-Encoding, refusing bodies that
+    inflate past HUB_DATA_MAX_BODY_BYTES. Raises ValueError for a
+    corrupt body and UnsupportedEncoding for other encodings.
+    """
+
+    content_encoding = (content_encoding or '').strip().lower()
+    limit = settings.HUB_DATA_MAX_BODY_BYTES
+    if content_encoding in ('', 'identity'):
+        return body
+    try:
+        if content_encoding in ('gzip', 'x-gzip'):
+            return _inflate(body, GZIP_WBITS, limit)
+        if content_encoding == 'deflate':
+            try:
+                return _inflate(body, DEFLATE_WBITS[0], limit)
+            except zlib.error:
+                return _inflate(body, DEFLATE_WBITS[1], limit)
+    except zlib.error as e:
+        raise ValueError('Compressed body is corrupt. {}'.format(str(e)))
+    raise UnsupportedEncoding(
+        'Unsupported Content-Encoding \'{}\'.'.format(content_encoding)
+    )
+
+
+def parse_binary(body):
+    """
+    Splits a binary batch into (header, records), where header holds
+    key, vine_id, hub_id and batch_sent and records is a list of
+    (node_id, data_sent, temperature, humidity, leafwetness) tuples.
+    Raises ValueError if the framing is wrong.
+    """
+
+    view = memoryview(body)
+    if len(view) < PREFIX.size:
+        raise ValueError('Binary batch is too short.')
+    magic, key_length = PREFIX.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError('Binary batch does not start with {}.'.format(
+            MAGIC.decode('ascii')
+        ))
+    offset = PREFIX.size
+    key = bytes(view[offset:offset + key_length]).decode('utf-8')
+    offset += key_length
+    if len(view) < offset + HEADER.size:
+        raise ValueError('Binary batch header is truncated.')
+    vine_id, hub_id, batch_sent, count = HEADER.unpack_from(view, offset)
+    offset += HEADER.size
+    if len(view) - offset != count * RECORD.size:
+        raise ValueError(
+            'Binary batch declares {} records but carries {} bytes.'.format(
+                count,
+                len(view) - offset
+            )
+        )
+    header = {
+        'key': key,
+        'vine_id': vine_id,
+        'hub_id': hub_id,
+        'batch_sent': batch_sent,
+    }
+    return header, list(RECORD.iter_unpack(view[offset:]))
+
+
+def encode_binary(key, vine_id, hub_id, batch_sent, records):
+    """
+    Builds a binary batch from (node_id, data_sent, temperature,
+    humidity, leafwetness) records, as a hub would.
+    """
+
+    key = key.encode('utf-8')
+    parts = [
+        PREFIX.pack(MAGIC, len(key)),
+        key,
+        HEADER.pack(vine_id, hub_id, batch_sent, len(records)),
+    ]
+    parts.extend(RECORD.pack(*record) for record in records)
+    return b''.join(parts)
@@ -0,0 +1,402 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Streaming ingest of large hub backlogs, read from the request a chunk at
+a time instead of through request.body.
+
+Two stream formats are accepted, optionally gzip or deflate encoded:
+
+* application/x-ndjson: a header line {"key", "vine_id", "hub_id"}
+  followed by one line per batch, {"batch_sent", "hub_data"}.
+* application/vnd.plantalytics.hub-stream: binary batches, as described
+  in hub_data.encoding, one after another.
+
+Batches are validated as they arrive and stored in windows of
+HUB_STREAM_WINDOW batches written concurrently, so memory stays bounded
+however long the backlog is. Once a window is written, the nodes' risk,
+degree-day, alert and sensor state is moved forward one stored batch at
+a time, oldest first, since each update reads and rewrites a node's
+state. Offsets count bytes of the decoded stream,
+after the NDJSON header line. After each window the offset up to which
+every batch is stored is saved for the upload, so an interrupted upload
+can be resumed from there.
+"""
+
+import os
+import json
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+import cassy
+from . import encoding
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+BINARY_STREAM_CONTENT_TYPE = 'application/vnd.plantalytics.hub-stream'
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+class StoreError(Exception):
+    """
+    A batch of a streamed upload could not be stored.
+    """
+
+
+class DecodedStream(object):
+    """
+    File-like reader over a request that undoes a gzip or deflate
+    Content-Encoding incrementally. Each read inflates to at most
+    HUB_STREAM_CHUNK_BYTES, keeping compressed input it has not reached
+    yet, so a highly compressed chunk cannot fill memory. Like
+    encoding.decompress, deflate is read as zlib data and, failing
+    that, as raw deflate data.
+    """
+
+    def __init__(self, raw, content_encoding):
+        self.raw = raw
+        self.chunk_size = settings.HUB_STREAM_CHUNK_BYTES
+        self.buffer = b''
+        # Compressed input read from raw but not inflated yet.
+        self.pending = b''
+        self.raw_deflate_fallback = False
+        content_encoding = (content_encoding or '').strip().lower()
+        if content_encoding in ('', 'identity'):
+            self.decompressor = None
+        elif content_encoding in ('gzip', 'x-gzip'):
+            self.decompressor = zlib.decompressobj(encoding.GZIP_WBITS)
+        elif content_encoding == 'deflate':
+            self.decompressor = zlib.decompressobj(
+                encoding.DEFLATE_WBITS[0]
+            )
+            self.raw_deflate_fallback = True
+        else:
+            raise encoding.UnsupportedEncoding(
+                'Unsupported Content-Encoding \'{}\'.'.format(
+                    content_encoding
+                )
+            )
+
+    def _fill(self):
+        """
+        Adds the next decoded chunk to the buffer. Returns False at the
+        end of the stream.
+        """
+
+        if self.decompressor is None:
+            chunk = self.raw.read(self.chunk_size)
+            if not chunk:
+                return False
+            self.buffer += chunk
+            return True
+        if not self.pending:
+            self.pending = self.raw.read(self.chunk_size)
+            if not self.pending:
+                self.buffer += self.decompressor.flush()
+                self.decompressor = None
+                return True
+        try:
+            data = self.decompressor.decompress(
+                self.pending,
+                self.chunk_size
+            )
+        except zlib.error as e:
+            if not self.raw_deflate_fallback:
+                raise ValueError(
+                    'Compressed stream is corrupt. {}'.format(str(e))
+                )
+            # Nothing was inflated yet, so start again as raw deflate.
+            self.raw_deflate_fallback = False
+            self.decompressor = zlib.decompressobj(
+                encoding.DEFLATE_WBITS[1]
+            )
+            return True
+        self.raw_deflate_fallback = False
+        self.pending = self.decompressor.unconsumed_tail
+        self.buffer += data
+        return True
+
+    def read_exactly(self, size):
+        """
+        Returns the next size bytes, or fewer only at the end of the
+        stream.
+        """
+
+        while len(self.buffer) < size and self._fill():
+            pass
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readline(self, limit):
+        """
+        Returns the next line including its newline, or the remainder at
+        the end of the stream. Raises ValueError for a line over limit.
+        """
+
+        start = 0
+        while True:
+            end = self.buffer.find(b'\n', start)
+            if end != -1:
+                line, self.buffer = (
+                    self.buffer[:end + 1],
+                    self.buffer[end + 1:]
+                )
+                return line
+            if len(self.buffer) > limit:
+                raise ValueError(
+                    'Line is longer than {} bytes.'.format(limit)
+                )
+            start = len(self.buffer)
+            if not self._fill():
+                line, self.buffer = self.buffer, b''
+                return line
+
+
+def iter_ndjson(stream, offset):
+    """
+    Yields (end offset, batch) for each line after the header, where
+    batch is the decoded object, or a ValueError if it is not JSON.
+    """
+
+    limit = settings.HUB_DATA_MAX_BODY_BYTES
+    while True:
+        line = stream.readline(limit)
+        if not line:
+            return
+        offset += len(line)
+        if not line.strip():
+            continue
+        try:
+            yield offset, json.loads(line.decode('utf-8'))
+        except ValueError as e:
+            yield offset, e
+
+
+def iter_binary(stream, offset):
+    """
+    Yields (end offset, (header, records)) for each binary batch.
+    Raises ValueError if a batch is truncated or malformed, since the
+    stream cannot be resynchronised after that.
+    """
+
+    while True:
+        prefix = stream.read_exactly(encoding.PREFIX.size)
+        if not prefix:
+            return
+        if len(prefix) < encoding.PREFIX.size:
+            raise ValueError('Binary batch is truncated.')
+        key_length = encoding.PREFIX.unpack(prefix)[1]
+        head = stream.read_exactly(key_length + encoding.HEADER.size)
+        if len(head) < key_length + encoding.HEADER.size:
+            raise ValueError('Binary batch is truncated.')
+        count = encoding.HEADER.unpack_from(head, key_length)[3]
+        if count * encoding.RECORD.size > settings.HUB_DATA_MAX_BODY_BYTES:
+            raise ValueError('Binary batch is too large.')
+        records = stream.read_exactly(count * encoding.RECORD.size)
+        body = prefix + head + records
+        batch = encoding.parse_binary(body)
+        offset += len(body)
+        yield offset, batch
+
+
+def json_rows(points):
+    """
+    Turns validated JSON data points into the rows stored by
+    cassy.insert_env_rows.
+    """
+
+    return [
+        (
+            point['node_id'],
+            point['data_sent'],
+            point['temperature'],
+            point['humidity'],
+            point['leafwetness'],
+        )
+        for point in points
+    ]
+
+
+def _get_executor():
+    """
+    Returns this process's pool for concurrent batch inserts, created
+    lazily and again after a fork.
+    """
+
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.HUB_STREAM_CONCURRENCY
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def store_window(window):
+    """
+    Runs the store calls of a window concurrently. window is a list of
+    (end offset, function, args); a function of None marks a batch that
+    was skipped and only moves the offset on. Returns (stored,
+    duplicates, offset, handled, error), where stored lists the args of
+    the batches stored, offset is the end of the last batch up to which
+    every batch was handled, or None, handled is the number of batches
+    up to offset and error is the first failure, if any.
+    """
+
+    executor = _get_executor()
+    futures = [
+        (end, function and executor.submit(function, *args))
+        for end, function, args in window
+    ]
+    stored = []
+    duplicates = 0
+    committed = None
+    handled = 0
+    error = None
+    for (end, future), (_, _, args) in zip(futures, window):
+        if future is not None:
+            try:
+                result = future.result()
+            except Exception as e:
+                if error is None:
+                    error = e
+                continue
+            if result is False:
+                duplicates += 1
+            else:
+                stored.append(args)
+        if error is None:
+            committed = end
+            handled += 1
+    return stored, duplicates, committed, handled, error
+
+
+class Upload(object):
+    """
+    Progress of one streamed upload. Batches are queued with add() and
+    skip() and stored a window at a time; after each window the offset
+    reached is saved with cassy.set_hub_upload_offset.
+    """
+
+    def __init__(self, upload_id, offset):
+        self.upload_id = upload_id
+        self.hub_id = None
+        self.offset = offset
+        self.stored = 0
+        self.duplicates = 0
+        self.skipped = 0
+        # Batches up to offset, stored, duplicate or skipped.
+        self.handled = 0
+        self.rejected_points = 0
+        self.window = []
+        # (batch_sent, vine_id, node ids) of the newest batch queued.
+        self.latest = None
+
+    def add(self, end, batch):
+        """
+        Queues a validated batch, given in row form as for
+        cassy.store_env_rows, that ends at stream offset end.
+        """
+
+        if self.latest is None or batch['batch_sent'] > self.latest[0]:
+            self.latest = (
+                batch['batch_sent'],
+                batch['vine_id'],
+                [row[0] for row in batch['hub_data']],
+            )
+        self.window.append((
+            end,
+            cassy.insert_env_rows,
+            (
+                batch['vine_id'],
+                batch['hub_id'],
+                batch['batch_sent'],
+                batch['hub_data'],
+            ),
+        ))
+        if len(self.window) >= settings.HUB_STREAM_WINDOW:
+            self.flush()
+
+    def skip(self, end):
+        """
+        Passes over a batch that ends at stream offset end without
+        storing it.
+        """
+
+        self.skipped += 1
+        self.window.append((end, None, ()))
+        if len(self.window) >= settings.HUB_STREAM_WINDOW:
+            self.flush()
+
+    def flush(self):
+        """
+        Stores the queued window, moves the state of the nodes in it
+        forward and saves the offset reached. Raises StoreError for the
+        first failure, after saving the offset up to the batch that
+        failed.
+        """
+
+        window, self.window = self.window, []
+        if not window:
+            return
+        stored, duplicates, committed, handled, error = store_window(window)
+        for vine_id, hub_id, batch_sent, rows in sorted(
+            stored,
+            key=lambda args: args[2]
+        ):
+            cassy.update_node_states(vine_id, hub_id, rows)
+        self.stored += len(stored)
+        self.duplicates += duplicates
+        if committed is not None:
+            self.offset = committed
+            self.handled += handled
+            if self.hub_id is not None:
+                cassy.set_hub_upload_offset(
+                    self.hub_id,
+                    self.upload_id,
+                    self.offset,
+                    self.handled
+                )
+        if error is not None:
+            raise StoreError(str(error))
+
+    def finish(self):
+        """
+        Stores what is left. Since batches in a window are written
+        concurrently, the hub's latest batch time is set again from the
+        newest batch in case an older one was written last.
+        """
+
+        self.flush()
+        if self.latest is not None and self.stored:
+            batch_sent, vine_id, node_ids = self.latest
+            cassy.set_latest_batch_time(
+                vine_id,
+                self.hub_id,
+                batch_sent,
+                node_ids
+            )
+
+    def progress(self):
+        return {
+            'upload_id': self.upload_id,
+            'offset': self.offset,
+            'batches': self.stored,
+            'duplicates': self.duplicates,
+            'skipped': self.skipped,
+            'rejected_points': self.rejected_points,
+        }
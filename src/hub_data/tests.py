@@ -8,12 +8,18 @@
 #
 
 import os
+import gzip
 import json
 import time
+import zlib
 
 from common.exceptions import *
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.test.utils import setup_test_environment
+from hub_data import encoding, validation
+from unittest.mock import patch
+
+import cassy
 
 
 class MainTests(TestCase):
@@ -37,9 +43,9 @@ class MainTests(TestCase):
         while num_of_nodes <= 2:
             data_point = {
                 'node_id': num_of_nodes,
-                'temperature': 12345.00,
-                'humidity': 12345.00,
-                'leafwetness': 12345.00,
+                'temperature': 21.5,
+                'humidity': 45.0,
+                'leafwetness': 3.0,
                 'data_sent': int(time.time()*1000),
             }
             hub_data.append(data_point)
@@ -98,9 +104,9 @@ class MainTests(TestCase):
         while num_of_nodes <= 2:
             data_point = {
                 'node_id': num_of_nodes,
-                'temperature': 12345.00,
-                'humidity': 12345.00,
-                'leafwetness': 12345.00,
+                'temperature': 21.5,
+                'humidity': 45.0,
+                'leafwetness': 3.0,
                 'data_sent': int(time.time()*1000),
             }
             hub_data.append(data_point)
@@ -124,3 +130,462 @@ class MainTests(TestCase):
         client = Client()
         response = client.get('/hub_data')
         self.assertEqual(response.status_code, 405)
+
+    def build_payload(self, data_points):
+        """
+        Returns a hub batch of data_points, sent now.
+        """
+        now = int(time.time()*1000)
+        return {
+            'key': str(os.environ.get('HUB_KEY')),
+            'vine_id': 0,
+            'hub_id': 0,
+            'batch_sent': now,
+            'hub_data': data_points,
+        }
+
+    def build_data_point(self, node_id, **values):
+        """
+        Returns a valid reading of node_id, sent now, with values
+        overriding the defaults.
+        """
+        data_point = {
+            'node_id': node_id,
+            'temperature': 21.5,
+            'humidity': 45.0,
+            'leafwetness': 3.0,
+            'data_sent': int(time.time()*1000),
+        }
+        data_point.update(values)
+        return data_point
+
+    @patch('cassy.store_env_data')
+    def test_response_bad_points_rejected(self, store_mock):
+        """
+        Tests only invalid data points are left out of a batch.
+        """
+        setup_test_environment()
+        client = Client()
+        payload = self.build_payload([
+            self.build_data_point(0),
+            self.build_data_point(1, humidity=250.0),
+            self.build_data_point(2, temperature='warm'),
+        ])
+        response = client.post(
+            '/hub_data',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue('data_invalid' in content['errors'])
+        self.assertEqual(
+            [point['index'] for point in content['rejected']],
+            [1, 2]
+        )
+        stored = store_mock.call_args[0][0]
+        self.assertEqual(len(stored['hub_data']), 1)
+        self.assertEqual(stored['hub_data'][0]['node_id'], 0)
+
+    @patch('cassy.store_env_data')
+    def test_response_bad_batch_not_stored(self, store_mock):
+        """
+        Tests a batch with invalid batch fields writes nothing.
+        """
+        setup_test_environment()
+        client = Client()
+        payload = self.build_payload([self.build_data_point(0)])
+        payload['batch_sent'] = 'yesterday'
+        response = client.post(
+            '/hub_data',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(store_mock.called)
+
+    def test_response_invalid_json(self):
+        """
+        Tests a body that is not JSON is rejected.
+        """
+        setup_test_environment()
+        client = Client()
+        response = client.post(
+            '/hub_data',
+            data='{"hub_data": [',
+            content_type='application/json'
+        )
+        error = json.loads(response.content.decode('utf-8'))['errors']
+        self.assertTrue('data_invalid' in error)
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(HUB_DATA_FAST_PARSE_BYTES=0)
+    def test_parse_body_fast_path(self):
+        """
+        Tests the fast parser, when used, decodes the same payload.
+        """
+        payload = self.build_payload([self.build_data_point(0)])
+        body = json.dumps(payload).encode('utf-8')
+        self.assertEqual(validation.parse_body(body), payload)
+
+    def test_validator_normalises_points(self):
+        """
+        Tests accepted points come back with numeric types.
+        """
+        payload = self.build_payload([
+            self.build_data_point('7', temperature=20),
+        ])
+        batch, rejected = validation.validate(payload)
+        self.assertEqual(rejected, [])
+        self.assertEqual(batch['hub_data'][0]['node_id'], 7)
+        self.assertEqual(batch['hub_data'][0]['temperature'], 20.0)
+
+    @override_settings(DB_BACKEND='memory')
+    @patch('cassy.set_latest_batch_time')
+    def test_response_duplicate_batch(self, batch_time_mock):
+        """
+        Tests a retried batch is acknowledged without being stored again.
+        """
+        setup_test_environment()
+        cassy.connection.reset()
+        cassy.hub_batch_cache.invalidate()
+        client = Client()
+        payload = self.build_payload([self.build_data_point(0)])
+        responses = [
+            client.post(
+                '/hub_data',
+                data=json.dumps(payload),
+                content_type='application/json'
+            )
+            for _ in range(2)
+        ]
+        cassy.connection.reset()
+        contents = [
+            json.loads(response.content.decode('utf-8'))
+            for response in responses
+        ]
+        self.assertEqual(responses[1].status_code, 200)
+        self.assertFalse('duplicate' in contents[0])
+        self.assertEqual(contents[1]['duplicate'], True)
+        self.assertEqual(batch_time_mock.call_count, 1)
+
+    @override_settings(DB_BACKEND='memory')
+    def test_duplicate_batch_other_process(self):
+        """
+        Tests a batch stored by another process is found in the marker
+        table after this process has forgotten it, and only one of two
+        copies stored at once is counted.
+        """
+        cassy.connection.reset()
+        cassy.hub_batch_cache.invalidate()
+        self.assertFalse(cassy.hub_batch_stored(3, 1500000000000))
+        self.assertTrue(cassy.mark_hub_batch(3, 1500000000000))
+        cassy.hub_batch_cache.invalidate()
+        self.assertTrue(cassy.hub_batch_stored(3, 1500000000000))
+        self.assertFalse(cassy.mark_hub_batch(3, 1500000000000))
+        cassy.connection.reset()
+
+    @override_settings(DB_BACKEND='memory')
+    @patch('cassy.set_latest_batch_time')
+    def test_failed_batch_released(self, batch_time_mock):
+        """
+        Tests a batch that fails to store can be retried.
+        """
+        cassy.connection.reset()
+        cassy.hub_batch_cache.invalidate()
+        payload = validation.validate(
+            self.build_payload([self.build_data_point(0)])
+        )[0]
+        batch_time_mock.side_effect = Exception('Test exception')
+        with self.assertRaises(Exception):
+            cassy.store_env_data(payload)
+        batch_time_mock.side_effect = None
+        self.assertTrue(cassy.store_env_data(payload))
+        cassy.connection.reset()
+
+    @patch('cassy.store_env_rows')
+    def test_response_binary_batch(self, store_mock):
+        """
+        Tests a gzipped binary batch is stored as rows, leaving out the
+        out of range record.
+        """
+        setup_test_environment()
+        client = Client()
+        now = int(time.time()*1000)
+        body = encoding.encode_binary(
+            str(os.environ.get('HUB_KEY')),
+            0,
+            0,
+            now,
+            [
+                (0, now, 21.5, 45.0, 3.0),
+                (1, now, 21.5, 145.0, 3.0),
+            ]
+        )
+        response = client.post(
+            '/hub_data',
+            data=gzip.compress(body),
+            content_type=encoding.BINARY_CONTENT_TYPE,
+            HTTP_CONTENT_ENCODING='gzip'
+        )
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content['rejected'][0]['index'], 1)
+        store_mock.assert_called_once_with(
+            0,
+            0,
+            now,
+            [(0, now, 21.5, 45.0, 3.0)]
+        )
+
+    @patch('cassy.store_env_data')
+    def test_response_gzip_json(self, store_mock):
+        """
+        Tests a gzip encoded JSON batch is accepted.
+        """
+        setup_test_environment()
+        client = Client()
+        payload = self.build_payload([self.build_data_point(0)])
+        response = client.post(
+            '/hub_data',
+            data=gzip.compress(json.dumps(payload).encode('utf-8')),
+            content_type='application/json',
+            HTTP_CONTENT_ENCODING='gzip'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(store_mock.called)
+
+    def test_response_unsupported_encoding(self):
+        """
+        Tests an unknown Content-Encoding is refused.
+        """
+        setup_test_environment()
+        client = Client()
+        response = client.post(
+            '/hub_data',
+            data=b'compressed',
+            content_type='application/json',
+            HTTP_CONTENT_ENCODING='br'
+        )
+        self.assertEqual(response.status_code, 415)
+
+    def test_response_truncated_binary_batch(self):
+        """
+        Tests a binary batch shorter than its declared records is
+        rejected.
+        """
+        setup_test_environment()
+        client = Client()
+        body = encoding.encode_binary(
+            str(os.environ.get('HUB_KEY')),
+            0,
+            0,
+            int(time.time()*1000),
+            [(0, 0, 21.5, 45.0, 3.0)]
+        )
+        response = client.post(
+            '/hub_data',
+            data=body[:-4],
+            content_type=encoding.BINARY_CONTENT_TYPE
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def build_stream(self, batches):
+        """
+        Returns an NDJSON upload body of the hub's header line followed
+        by batches, with strings sent as they are.
+        """
+        header = {
+            'key': str(os.environ.get('HUB_KEY')),
+            'vine_id': 0,
+            'hub_id': 0,
+        }
+        lines = [json.dumps(header)] + [
+            batch if isinstance(batch, str) else json.dumps(batch)
+            for batch in batches
+        ]
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    @override_settings(DB_BACKEND='memory', HUB_STREAM_WINDOW=2)
+    @patch('cassy.set_latest_batch_time')
+    def test_response_stream_ndjson(self, batch_time_mock):
+        """
+        Tests a streamed upload stores every valid batch, skips lines
+        that are not batches and reports the offset reached, which a
+        GET returns afterwards.
+        """
+        setup_test_environment()
+        cassy.connection.reset()
+        cassy.hub_batch_cache.invalidate()
+        client = Client()
+        now = int(time.time()*1000)
+        batches = [
+            {
+                'batch_sent': now + index,
+                'hub_data': [self.build_data_point(index)],
+            }
+            for index in range(3)
+        ]
+        body = self.build_stream(batches[:2] + ['not json'] + batches[2:])
+        response = client.post(
+            '/hub_data/stream?upload_id=backlog',
+            data=gzip.compress(body),
+            content_type='application/x-ndjson',
+            HTTP_CONTENT_ENCODING='gzip'
+        )
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content['batches'], 3)
+        self.assertEqual(content['skipped'], 1)
+        header = body.split(b'\n')[0]
+        self.assertEqual(content['offset'], len(body) - len(header) - 1)
+        response = client.get('/hub_data/stream', {
+            'key': str(os.environ.get('HUB_KEY')),
+            'hub_id': 0,
+            'upload_id': 'backlog',
+        })
+        self.assertEqual(
+            json.loads(response.content.decode('utf-8'))['offset'],
+            content['offset']
+        )
+        # The newest batch sets the hub's latest batch time last.
+        self.assertEqual(batch_time_mock.call_args[0][2], now + 2)
+        cassy.connection.reset()
+
+    @override_settings(DB_BACKEND='memory', HUB_STREAM_CHUNK_BYTES=64)
+    @patch('cassy.set_latest_batch_time')
+    def test_response_stream_raw_deflate(self, batch_time_mock):
+        """
+        Tests a stream sent as raw deflate data is inflated in bounded
+        chunks and every batch is stored.
+        """
+        setup_test_environment()
+        cassy.connection.reset()
+        cassy.hub_batch_cache.invalidate()
+        now = int(time.time()*1000)
+        body = self.build_stream([
+            {
+                'batch_sent': now + index,
+                'hub_data': [self.build_data_point(index)] * 20,
+            }
+            for index in range(2)
+        ])
+        compressor = zlib.compressobj(wbits=encoding.DEFLATE_WBITS[1])
+        response = Client().post(
+            '/hub_data/stream?upload_id=raw',
+            data=compressor.compress(body) + compressor.flush(),
+            content_type='application/x-ndjson',
+            HTTP_CONTENT_ENCODING='deflate'
+        )
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content['batches'], 2)
+        self.assertEqual(batch_time_mock.call_args[0][2], now + 1)
+        cassy.connection.reset()
+
+    def test_response_stream_malformed_offset(self):
+        """
+        Tests a streamed upload with an offset that is not a whole number
+        is refused as a bad request.
+        """
+        setup_test_environment()
+        client = Client()
+        for offset in ('--5', '%C2%B2', '1.5'):
+            response = client.post(
+                '/hub_data/stream?upload_id=bad&offset=' + offset,
+                data=b'',
+                content_type='application/x-ndjson'
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(validation.to_integer(' -12 '), -12)
+        self.assertIsNone(validation.to_integer('--5'))
+
+    @patch('cassy.update_node_states')
+    @patch('cassy.set_hub_upload_offset')
+    @patch('cassy.insert_env_rows')
+    def test_response_stream_binary_resume(self, store_mock, offset_mock,
+                                           states_mock):
+        """
+        Tests a binary stream cut off mid-batch reports the offset after
+        the last whole batch, and the rest can be sent from there.
+        """
+        setup_test_environment()
+        client = Client()
+        now = int(time.time()*1000)
+        batches = [
+            encoding.encode_binary(
+                str(os.environ.get('HUB_KEY')),
+                0,
+                0,
+                now + index,
+                [(0, now, 21.5, 45.0, 3.0)]
+            )
+            for index in range(2)
+        ]
+        response = client.post(
+            '/hub_data/stream?upload_id=binary',
+            data=batches[0] + batches[1][:-4],
+            content_type='application/vnd.plantalytics.hub-stream'
+        )
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content['offset'], len(batches[0]))
+        response = client.post(
+            '/hub_data/stream?upload_id=binary&offset={}'.format(
+                content['offset']
+            ),
+            data=batches[1],
+            content_type='application/vnd.plantalytics.hub-stream'
+        )
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content['offset'], len(batches[0] + batches[1]))
+        self.assertEqual(store_mock.call_count, 2)
+
+    @override_settings(HUB_STREAM_WINDOW=4)
+    @patch('cassy.update_node_states')
+    @patch('cassy.set_hub_upload_offset')
+    @patch('cassy.insert_env_rows')
+    def test_response_stream_store_failure(self, store_mock, offset_mock,
+                                           states_mock):
+        """
+        Tests a batch that fails to store stops the upload at the offset
+        before it, while the state of batches stored around it still
+        moves forward.
+        """
+        setup_test_environment()
+        client = Client()
+        now = int(time.time()*1000)
+
+        def store(vine_id, hub_id, batch_sent, rows):
+            """
+            Stands in for cassy.insert_env_rows, failing the second
+            batch.
+            """
+            if batch_sent == now + 1:
+                raise Exception('Test exception')
+            return True
+
+        store_mock.side_effect = store
+        body = self.build_stream([
+            {
+                'batch_sent': now + index,
+                'hub_data': [self.build_data_point(index)],
+            }
+            for index in range(3)
+        ])
+        response = client.post(
+            '/hub_data/stream?upload_id=failure',
+            data=body,
+            content_type='application/x-ndjson'
+        )
+        content = json.loads(response.content.decode('utf-8'))
+        lines = body.split(b'\n')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(content['offset'], len(lines[1]) + 1)
+        offset_mock.assert_called_once_with(0, 'failure', len(lines[1]) + 1, 1)
+        # Stored batches move the state on oldest first, by node id here.
+        self.assertEqual(
+            [call[0][2][0][0] for call in states_mock.call_args_list],
+            [0, 2]
+        )
@@ -0,0 +1,241 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Parsing and validation of hub batches, done before anything is written
+so one malformed data point cannot fail a batch after partial work.
+
+The validators are compiled once per set of ranges into closures that
+check every data point in a single pass, one for JSON batches and one
+for the records of binary batches (see hub_data.encoding). Bad points
+are returned with their problems instead of failing the batch; only a
+batch whose own fields (vine_id, hub_id, batch_sent, hub_data) are
+wrong is rejected.
+"""
+
+import json
+import math
+import re
+
+from common.exceptions import *
+from common.errors import *
+from django.conf import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SENSOR_FIELDS = ('temperature', 'humidity', 'leafwetness')
+# ASCII digits only, since str.isdigit and \d also match the likes of '²'.
+INTEGER_PATTERN = re.compile(r'^\s*-?[0-9]+\s*$')
+
+_validators = {}
+
+
+def parse_body(body):
+    """
+    Decodes a JSON request body, using orjson for bodies of at least
+    HUB_DATA_FAST_PARSE_BYTES when it is installed. Raises ValueError
+    for invalid JSON.
+    """
+
+    if orjson is not None and (
+        len(body) >= settings.HUB_DATA_FAST_PARSE_BYTES
+    ):
+        return orjson.loads(body)
+    return json.loads(body.decode('utf-8'))
+
+
+def to_integer(value):
+    """
+    Returns value as an int, or None if it is not a whole number.
+    Booleans are rejected even though Python treats them as ints.
+    """
+
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and INTEGER_PATTERN.match(value):
+        return int(value)
+    return None
+
+
+def compile_validator(ranges):
+    """
+    Returns validate(payload) for the given {field: (low, high)} sensor
+    ranges. validate returns (batch, rejected), where batch holds the
+    normalised batch fields and accepted points and rejected lists
+    {'index', 'node_id', 'errors'} for each point left out. Raises
+    PlantalyticsDataException(DATA_INVALID) if the batch itself is bad.
+    """
+
+    checks = tuple(
+        (field, float(ranges[field][0]), float(ranges[field][1]))
+        for field in SENSOR_FIELDS
+    )
+    isfinite = math.isfinite
+    integer = to_integer
+
+    def validate(payload):
+        if not isinstance(payload, dict):
+            raise PlantalyticsDataException(DATA_INVALID)
+        vine_id = integer(payload.get('vine_id'))
+        hub_id = integer(payload.get('hub_id'))
+        batch_sent = integer(payload.get('batch_sent'))
+        points = payload.get('hub_data')
+        if (vine_id is None or vine_id < 0 or hub_id is None or
+                batch_sent is None or batch_sent < 0 or
+                not isinstance(points, list)):
+            raise PlantalyticsDataException(DATA_INVALID)
+
+        accepted = []
+        rejected = []
+        for index, point in enumerate(points):
+            if not isinstance(point, dict):
+                rejected.append({
+                    'index': index,
+                    'node_id': None,
+                    'errors': {'data_point': 'not an object'},
+                })
+                continue
+            errors = {}
+            node_id = integer(point.get('node_id'))
+            if node_id is None or node_id < 0:
+                errors['node_id'] = 'missing or not a non-negative integer'
+            data_sent = integer(point.get('data_sent'))
+            if data_sent is None or data_sent < 0:
+                errors['data_sent'] = 'missing or not a timestamp'
+            clean = {
+                'node_id': node_id,
+                'data_sent': data_sent,
+            }
+            for field, low, high in checks:
+                value = point.get(field)
+                if (value is None or isinstance(value, bool) or
+                        not isinstance(value, (int, float))):
+                    errors[field] = 'missing or not a number'
+                elif not isfinite(value) or not low <= value <= high:
+                    errors[field] = 'outside {} to {}'.format(low, high)
+                else:
+                    clean[field] = float(value)
+            if errors:
+                rejected.append({
+                    'index': index,
+                    'node_id': point.get('node_id'),
+                    'errors': errors,
+                })
+            else:
+                accepted.append(clean)
+
+        batch = {
+            'vine_id': vine_id,
+            'hub_id': hub_id,
+            'batch_sent': batch_sent,
+            'hub_data': accepted,
+        }
+        return batch, rejected
+
+    return validate
+
+
+def compile_record_validator(ranges):
+    """
+    Returns validate_records(header, records) for binary batches, where
+    records are (node_id, data_sent, temperature, humidity, leafwetness)
+    tuples. Accepted records are returned as they are, so they can go
+    straight to cassy.store_env_rows; otherwise it behaves like the
+    validator from compile_validator.
+    """
+
+    (temperature_low, temperature_high), (humidity_low, humidity_high), (
+        leafwetness_low, leafwetness_high
+    ) = [
+        (float(ranges[field][0]), float(ranges[field][1]))
+        for field in SENSOR_FIELDS
+    ]
+
+    def record_errors(record):
+        errors = {}
+        if record[0] < 0:
+            errors['node_id'] = 'missing or not a non-negative integer'
+        if record[1] < 0:
+            errors['data_sent'] = 'missing or not a timestamp'
+        for field, value in zip(SENSOR_FIELDS, record[2:]):
+            low, high = ranges[field]
+            if not low <= value <= high:
+                errors[field] = 'outside {} to {}'.format(
+                    float(low),
+                    float(high)
+                )
+        return errors
+
+    def validate_records(header, records):
+        if (header['vine_id'] < 0 or header['batch_sent'] < 0):
+            raise PlantalyticsDataException(DATA_INVALID)
+        accepted = []
+        rejected = []
+        for index, record in enumerate(records):
+            node_id, data_sent, temperature, humidity, leafwetness = record
+            # NaN fails every comparison, so it is rejected here too.
+            if (node_id >= 0 and data_sent >= 0 and
+                    temperature_low <= temperature <= temperature_high and
+                    humidity_low <= humidity <= humidity_high and
+                    leafwetness_low <= leafwetness <= leafwetness_high):
+                accepted.append(record)
+            else:
+                rejected.append({
+                    'index': index,
+                    'node_id': node_id,
+                    'errors': record_errors(record),
+                })
+        batch = {
+            'vine_id': header['vine_id'],
+            'hub_id': header['hub_id'],
+            'batch_sent': header['batch_sent'],
+            'hub_data': accepted,
+        }
+        return batch, rejected
+
+    return validate_records
+
+
+def _compiled(factory):
+    """
+    Returns factory's validator for settings.HUB_DATA_RANGES, compiling
+    it the first time those ranges are seen.
+    """
+
+    ranges = settings.HUB_DATA_RANGES
+    key = (factory.__name__,) + tuple(sorted(
+        (field, tuple(bounds)) for field, bounds in ranges.items()
+    ))
+    validator = _validators.get(key)
+    if validator is None:
+        validator = _validators[key] = factory(ranges)
+    return validator
+
+
+def validate(payload):
+    """
+    Validates a JSON hub batch against settings.HUB_DATA_RANGES.
+    """
+
+    return _compiled(compile_validator)(payload)
+
+
+def validate_records(header, records):
+    """
+    Validates a binary hub batch against settings.HUB_DATA_RANGES.
+    """
+
+    return _compiled(compile_record_validator)(header, records)
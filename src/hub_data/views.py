@@ -11,8 +11,10 @@ import os
 import json
 import logging
 
+from common import metrics
 from common.exceptions import *
 from common.errors import *
+from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.http import (
     HttpResponse,
@@ -22,21 +24,71 @@ from django.http import (
 )
 
 import cassy
+from . import encoding, streaming, validation
 
 logger = logging.getLogger('plantalytics_backend.hub_data')
+quarantine_logger = logging.getLogger(
+    'plantalytics_backend.hub_data.quarantine'
+)
+
+
+def quarantine_data_points(data, points, rejected):
+    """
+    Records data points left out of a batch, one JSON line each with the
+    point as sent, so bad sensors can be found and points replayed.
+    Binary records are logged as lists in record order.
+    """
+
+    metrics.increment('ingest_rejected_points_total', amount=len(rejected))
+    for point in rejected:
+        quarantine_logger.warning(json.dumps({
+            'hub_id': data.get('hub_id'),
+            'batch_sent': data.get('batch_sent'),
+            'errors': point['errors'],
+            'data_point': points[point['index']],
+        }, sort_keys=True, default=str))
 
 
 @csrf_exempt
 def index(request):
     """
-    Receive data from hub to insert into database.
+    Receive data from hub to insert into database. Accepts JSON or the
+    binary batch format described in hub_data.encoding, either of them
+    optionally gzip or deflate encoded.
     """
 
     allowed_methods = ['POST', 'PUT']
     if request.method not in (allowed_methods):
         return HttpResponseNotAllowed(allowed_methods)
 
-    data = json.loads(request.body.decode("utf-8"))
+    is_binary = request.content_type == encoding.BINARY_CONTENT_TYPE
+    try:
+        body = encoding.decompress(
+            request.body,
+            request.META.get('HTTP_CONTENT_ENCODING')
+        )
+        if is_binary:
+            data, points = encoding.parse_binary(body)
+        else:
+            data = validation.parse_body(body)
+            if not isinstance(data, dict):
+                data = {}
+            points = data.get('hub_data')
+    except encoding.UnsupportedEncoding as e:
+        logger.warning(str(e))
+        error = custom_error(DATA_INVALID, str(e))
+        return HttpResponse(
+            error,
+            content_type='application/json',
+            status=415
+        )
+    except ValueError as e:
+        message = (
+            'Hub data could not be decoded. {}'
+        ).format(str(e))
+        logger.warning(message)
+        error = custom_error(DATA_INVALID, 'Body could not be decoded.')
+        return HttpResponseBadRequest(error, content_type='application/json')
     hub_key = str(data.get('key', ''))
     hub_id = str(data.get('hub_id', ''))
 
@@ -48,11 +100,48 @@ def index(request):
         if hub_key != os.environ.get('HUB_KEY'):
             raise PlantalyticsHubException(HUB_KEY_INVALID)
 
+        if is_binary:
+            batch, rejected = validation.validate_records(data, points)
+        else:
+            batch, rejected = validation.validate(data)
+        if rejected:
+            quarantine_data_points(data, points, rejected)
+        if not batch['hub_data']:
+            raise PlantalyticsDataException(DATA_INVALID)
+
         logger.info('Inserting hub data.')
-        cassy.store_env_data(data)
-        logger.info('Successfully inserted hub data.')
+        if is_binary:
+            stored = cassy.store_env_rows(
+                batch['vine_id'],
+                batch['hub_id'],
+                batch['batch_sent'],
+                batch['hub_data']
+            )
+        else:
+            stored = cassy.store_env_data(batch)
         body = {'errors': {}}
+        if stored is False:
+            message = (
+                'Skipped duplicate batch {} from hub id \'{}\'.'
+            ).format(batch['batch_sent'], hub_id)
+            logger.info(message)
+            body['duplicate'] = True
+        else:
+            logger.info('Successfully inserted hub data.')
+        if rejected:
+            message = (
+                '{} of {} data points rejected.'
+            ).format(len(rejected), len(rejected) + len(batch['hub_data']))
+            body['errors'][DATA_INVALID] = message
+            body['rejected'] = rejected
         return HttpResponse(json.dumps(body), content_type='application/json')
+    except PlantalyticsDataException as e:
+        message = (
+            'Invalid hub data for hub id \'{}\'. Error code: {}'
+        ).format(hub_id, str(e))
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
     except PlantalyticsException as e:
         message = (
             'Error attempting to process hub data. Error code: {}'
@@ -67,3 +156,217 @@ def index(request):
         logger.exception(message)
         error = custom_error(str(e))
         return HttpResponseBadRequest(error, content_type='application/json')
+
+
+def read_ndjson_stream(stream, upload):
+    """
+    Queues the batches of an NDJSON stream on upload. The header line
+    gives the key, vine_id and hub_id shared by every batch; a line that
+    is not a valid batch is quarantined and skipped.
+    """
+
+    header = stream.readline(settings.HUB_DATA_MAX_BODY_BYTES)
+    try:
+        header = json.loads(header.decode('utf-8'))
+    except ValueError:
+        raise PlantalyticsDataException(DATA_INVALID)
+    if not isinstance(header, dict):
+        raise PlantalyticsDataException(DATA_INVALID)
+    if str(header.get('key', '')) != os.environ.get('HUB_KEY'):
+        raise PlantalyticsHubException(HUB_KEY_INVALID)
+    vine_id = validation.to_integer(header.get('vine_id'))
+    upload.hub_id = validation.to_integer(header.get('hub_id'))
+    if vine_id is None or upload.hub_id is None:
+        raise PlantalyticsDataException(DATA_INVALID)
+
+    for end, data in streaming.iter_ndjson(stream, upload.offset):
+        try:
+            if isinstance(data, ValueError) or not isinstance(data, dict):
+                raise PlantalyticsDataException(DATA_INVALID)
+            data['vine_id'] = vine_id
+            data['hub_id'] = upload.hub_id
+            batch, rejected = validation.validate(data)
+        except PlantalyticsDataException:
+            quarantine_logger.warning(json.dumps({
+                'hub_id': upload.hub_id,
+                'upload_id': upload.upload_id,
+                'offset': end,
+                'errors': {'batch': 'not a valid batch'},
+            }, sort_keys=True))
+            upload.skip(end)
+            continue
+        if rejected:
+            quarantine_data_points(data, data['hub_data'], rejected)
+            upload.rejected_points += len(rejected)
+        if not batch['hub_data']:
+            upload.skip(end)
+            continue
+        batch['hub_data'] = streaming.json_rows(batch['hub_data'])
+        upload.add(end, batch)
+
+
+def read_binary_stream(stream, upload):
+    """
+    Queues the batches of a binary stream on upload. Every batch must
+    carry the hub key and the hub id of the first.
+    """
+
+    for end, (data, records) in streaming.iter_binary(stream, upload.offset):
+        if data['key'] != os.environ.get('HUB_KEY'):
+            raise PlantalyticsHubException(HUB_KEY_INVALID)
+        if upload.hub_id is None:
+            upload.hub_id = data['hub_id']
+        elif data['hub_id'] != upload.hub_id:
+            raise PlantalyticsDataException(DATA_INVALID)
+        batch, rejected = validation.validate_records(data, records)
+        if rejected:
+            quarantine_data_points(data, records, rejected)
+            upload.rejected_points += len(rejected)
+        if batch['hub_data']:
+            upload.add(end, batch)
+        else:
+            upload.skip(end)
+
+
+def stream_response(upload, status=200, code=None, message=None):
+    """
+    Reports an upload's progress, with an error if it stopped early.
+    """
+
+    body = upload.progress()
+    body['errors'] = {}
+    if code is not None:
+        body.update(json.loads(custom_error(code, message)))
+    return HttpResponse(
+        json.dumps(body),
+        content_type='application/json',
+        status=status
+    )
+
+
+@csrf_exempt
+def stream(request):
+    """
+    Receive a hub's backlog as a stream of batches, read and stored a
+    window at a time (see hub_data.streaming). The upload is named by
+    upload_id in the query string. The response, and a GET with key,
+    hub_id and upload_id, give the offset stored up to, so an upload
+    that was cut off can be resumed by posting the rest of the stream
+    from there with offset set.
+    """
+
+    allowed_methods = ['GET', 'POST', 'PUT']
+    if request.method not in (allowed_methods):
+        return HttpResponseNotAllowed(allowed_methods)
+
+    upload_id = request.GET.get('upload_id', '')
+    offset = validation.to_integer(request.GET.get('offset', 0))
+    if not upload_id or offset is None or offset < 0:
+        error = custom_error(DATA_MISSING)
+        return HttpResponseBadRequest(error, content_type='application/json')
+
+    if request.method == 'GET':
+        hub_id = validation.to_integer(request.GET.get('hub_id'))
+        if request.GET.get('key') != os.environ.get('HUB_KEY'):
+            error = custom_error(HUB_KEY_INVALID)
+            return HttpResponseForbidden(
+                error,
+                content_type='application/json'
+            )
+        if hub_id is None:
+            error = custom_error(DATA_MISSING)
+            return HttpResponseBadRequest(
+                error,
+                content_type='application/json'
+            )
+        try:
+            upload = streaming.Upload(upload_id, 0)
+            upload.offset = cassy.get_hub_upload_offset(hub_id, upload_id)
+            return stream_response(upload)
+        except Exception as e:
+            message = (
+                'Error occurred while reading upload \'{}\' of hub id '
+                '\'{}\'. {}'
+            ).format(upload_id, hub_id, str(e))
+            logger.exception(message)
+            error = custom_error(str(e))
+            return HttpResponseBadRequest(
+                error,
+                content_type='application/json'
+            )
+
+    if request.content_type == streaming.NDJSON_CONTENT_TYPE:
+        read_stream = read_ndjson_stream
+    elif request.content_type == streaming.BINARY_STREAM_CONTENT_TYPE:
+        read_stream = read_binary_stream
+    else:
+        message = (
+            'Content-Type must be {} or {}.'
+        ).format(
+            streaming.NDJSON_CONTENT_TYPE,
+            streaming.BINARY_STREAM_CONTENT_TYPE
+        )
+        error = custom_error(DATA_INVALID, message)
+        return HttpResponse(
+            error,
+            content_type='application/json',
+            status=415
+        )
+    try:
+        stream = streaming.DecodedStream(
+            request,
+            request.META.get('HTTP_CONTENT_ENCODING')
+        )
+    except encoding.UnsupportedEncoding as e:
+        logger.warning(str(e))
+        error = custom_error(DATA_INVALID, str(e))
+        return HttpResponse(
+            error,
+            content_type='application/json',
+            status=415
+        )
+
+    upload = streaming.Upload(upload_id, offset)
+    message = (
+        'Receiving upload \'{}\' from offset {}.'
+    ).format(upload_id, offset)
+    logger.info(message)
+    error = None
+    try:
+        try:
+            read_stream(stream, upload)
+        except (PlantalyticsException, ValueError) as e:
+            error = e
+        # Whatever was read before a bad batch is still stored.
+        if error is None:
+            upload.finish()
+        else:
+            upload.flush()
+    except Exception as e:
+        message = (
+            'Error occurred while storing upload \'{}\' of hub id \'{}\' '
+            'after offset {}. {}'
+        ).format(upload_id, upload.hub_id, upload.offset, str(e))
+        logger.exception(message)
+        return stream_response(upload, 503, UNKNOWN)
+
+    if isinstance(error, PlantalyticsHubException):
+        message = (
+            'Error attempting to process upload \'{}\'. Error code: {}'
+        ).format(upload_id, str(error))
+        logger.warn(message)
+        return stream_response(upload, 403, str(error))
+    if error is not None:
+        message = (
+            'Upload \'{}\' of hub id \'{}\' stopped at offset {}. {}'
+        ).format(upload_id, upload.hub_id, upload.offset, str(error))
+        logger.warn(message)
+        if isinstance(error, PlantalyticsException):
+            return stream_response(upload, 400, str(error))
+        return stream_response(upload, 400, DATA_INVALID, str(error))
+
+    message = (
+        'Stored upload \'{}\' of hub id \'{}\' up to offset {}.'
+    ).format(upload_id, upload.hub_id, upload.offset)
+    logger.info(message)
+    return stream_response(upload)
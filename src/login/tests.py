@@ -15,6 +15,9 @@ from django.test.utils import setup_test_environment
 from unittest.mock import patch
 
 import cassy
+from common import passwords
+from common.errors import LOGIN_BUSY
+from common.exceptions import PlantalyticsBusyException
 
 
 class MainTests(TestCase):
@@ -197,3 +200,99 @@ class MainTests(TestCase):
             os.environ.get('LOGIN_SEC_TOKEN')
         )
         self.assertEqual(result, True)
+
+    def test_password_hash_round_trip(self):
+        """
+        Tests a hashed password verifies and a wrong password does not.
+        """
+        encoded = passwords.make_password('grapes')
+        self.assertTrue(passwords.is_hashed(encoded))
+        self.assertTrue(passwords.check_password('grapes', encoded))
+        self.assertFalse(passwords.check_password('raisins', encoded))
+        self.assertFalse(passwords.needs_rehash(encoded))
+
+    def test_password_legacy_plaintext(self):
+        """
+        Tests a legacy plaintext password still verifies,
+        but is flagged for rehashing.
+        """
+        self.assertTrue(passwords.check_password('grapes', 'grapes'))
+        self.assertFalse(passwords.check_password('raisins', 'grapes'))
+        self.assertTrue(passwords.needs_rehash('grapes'))
+
+    @patch('cassy.get_authorized_vineyards')
+    @patch('cassy.set_user_auth_token')
+    @patch('cassy.change_user_password')
+    @patch('cassy.get_user_password')
+    @patch('login.views.check_user_subscription_end_date')
+    @patch('login.views.check_user_is_enabled')
+    @patch('login.views.check_user_exists')
+    def test_login_rehashes_legacy_password(
+        self,
+        exists_mock,
+        enabled_mock,
+        expired_mock,
+        password_mock,
+        change_mock,
+        token_mock,
+        vineyards_mock
+    ):
+        """
+        Tests a successful login with a plaintext stored password
+        replaces it with a hash.
+        """
+        setup_test_environment()
+        client = Client()
+        exists_mock.return_value = True
+        enabled_mock.return_value = True
+        expired_mock.return_value = False
+        password_mock.return_value = 'grapes'
+        vineyards_mock.return_value = []
+        payload = {
+            'username': 'welches',
+            'password': 'grapes',
+        }
+        response = client.post(
+            '/login',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        change_mock.assert_called_once_with('welches', 'grapes', 'grapes')
+        self.assertEqual(response.status_code, 200)
+
+    @patch('common.passwords.check_password')
+    @patch('cassy.get_user_password')
+    @patch('login.views.check_user_subscription_end_date')
+    @patch('login.views.check_user_is_enabled')
+    @patch('login.views.check_user_exists')
+    def test_login_hashing_busy(
+        self,
+        exists_mock,
+        enabled_mock,
+        expired_mock,
+        password_mock,
+        check_mock
+    ):
+        """
+        Tests a login turned away by a full hashing pool is answered with
+        503 so the client retries, rather than as a bad username.
+        """
+        setup_test_environment()
+        client = Client()
+        exists_mock.return_value = True
+        enabled_mock.return_value = True
+        expired_mock.return_value = False
+        password_mock.return_value = 'grapes'
+        check_mock.side_effect = PlantalyticsBusyException(LOGIN_BUSY)
+        payload = {
+            'username': 'welches',
+            'password': 'grapes',
+        }
+        response = client.post(
+            '/login',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        error = json.loads(response.content.decode('utf-8'))['errors']
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(LOGIN_BUSY in error)
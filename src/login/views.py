@@ -13,6 +13,7 @@ import logging
 import datetime
 import time
 
+from common import passwords
 from common.exceptions import *
 from common.errors import *
 from django.views.decorators.csrf import csrf_exempt
@@ -98,6 +99,25 @@ def check_user_exists(username):
         raise e
 
 
+def rehash_user_password(username, password, stored_password):
+    """
+    Replaces a legacy plaintext or outdated password hash with one
+    using the current settings. Failure here must not fail the login.
+    """
+
+    try:
+        message = (
+            'Rehashing stored password for user \'{}\'.'
+        ).format(username)
+        logger.info(message)
+        cassy.change_user_password(username, password, stored_password)
+    except Exception as e:
+        message = (
+            'Unable to rehash password for user \'{}\'. {}'
+        ).format(username, str(e))
+        logger.warning(message)
+
+
 @csrf_exempt
 def index(request):
     """
@@ -134,7 +154,13 @@ def index(request):
         ).format(username)
         logger.info(message)
 
-        if stored_password == submitted_password:
+        if passwords.check_password(submitted_password, stored_password):
+            if passwords.needs_rehash(stored_password):
+                rehash_user_password(
+                    username,
+                    submitted_password,
+                    stored_password
+                )
             # Generate token and put into JSON object
             response = {
                 'auth_token': str(uuid.uuid4()),
@@ -172,6 +198,18 @@ def index(request):
                 error,
                 content_type='application/json'
             )
+    # Hashing pool is full -- the client should retry
+    except PlantalyticsBusyException as e:
+        message = (
+            'Password hashing busy while logging in user \'{}\'.'
+        ).format(username)
+        logger.warning(message)
+        error = custom_error(str(e))
+        return HttpResponse(
+            error,
+            content_type='application/json',
+            status=503
+        )
     # Invalid username -- expected exception
     except PlantalyticsException as e:
         message = (
@@ -0,0 +1,42 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Checkpoint files for the maintenance commands that copy a table a page at
+a time, so an interrupted run resumes where it stopped.
+"""
+
+import os
+import copy
+import json
+
+
+def load_checkpoint(path, default=None):
+    """
+    Returns the saved progress of a previous run, or a fresh one: a copy
+    of default, or the progress of a table copy when it is not given.
+    """
+
+    if not os.path.exists(path):
+        if default is not None:
+            return copy.deepcopy(default)
+        return {'paging_state': None, 'copied': 0, 'done': False}
+    with open(path) as checkpoint_file:
+        return json.load(checkpoint_file)
+
+
+def save_checkpoint(path, checkpoint):
+    """
+    Atomically replaces the checkpoint file with the current progress.
+    """
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(temp_path, path)
@@ -0,0 +1,81 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import os
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+import cassy
+
+logger = logging.getLogger('plantalytics_backend.maintenance')
+
+CQL_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    'cql'
+)
+
+
+def load_statements(path):
+    """
+    Reads a .cql file and returns its statements with table names
+    substituted from the environment.
+    """
+
+    with open(path) as cql_file:
+        lines = [
+            line for line in cql_file
+            if not line.strip().startswith('--')
+        ]
+    statements = []
+    for statement in ''.join(lines).split(';'):
+        statement = statement.strip()
+        if statement:
+            statements.append(statement.format(**os.environ) + ';')
+    return statements
+
+
+class Command(BaseCommand):
+    help = (
+        'Applies the CQL schema files in maintenance/cql in order. '
+        'Every statement is idempotent, so re-running is safe.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help='Only apply the named files, e.g. 0001_user_username_key.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the statements instead of executing them.'
+        )
+
+    def handle(self, *args, **options):
+        names = options['names']
+        for filename in sorted(os.listdir(CQL_DIR)):
+            if not filename.endswith('.cql'):
+                continue
+            if names and filename[:-len('.cql')] not in names:
+                continue
+            try:
+                statements = load_statements(os.path.join(CQL_DIR, filename))
+            except KeyError as e:
+                raise CommandError(
+                    '{} needs environment variable {}.'.format(filename, e)
+                )
+            self.stdout.write('Applying {}'.format(filename))
+            for statement in statements:
+                if options['dry_run']:
+                    self.stdout.write(statement)
+                    continue
+                logger.info('Executing schema statement: {}'.format(statement))
+                cassy.get_session().execute(statement)
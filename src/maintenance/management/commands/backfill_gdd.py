@@ -0,0 +1,146 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import datetime
+import logging
+import time
+
+from common import gdd, risk, timebuckets
+from common.exceptions import *
+from django.core.management.base import BaseCommand
+
+import cassy
+
+logger = logging.getLogger('plantalytics_backend.maintenance')
+
+
+def daily_extremes(rows):
+    """
+    Returns {day: [lowest, highest]} temperatures of (batchsent,
+    datasent, temperature) rows, in one pass in any order.
+    """
+
+    days = {}
+    for _, data_sent, temperature in rows:
+        if temperature is None:
+            continue
+        day = timebuckets.bucket_for(data_sent, 'day')
+        extremes = days.get(day)
+        if extremes is None:
+            days[day] = [temperature, temperature]
+        else:
+            extremes[0] = min(extremes[0], temperature)
+            extremes[1] = max(extremes[1], temperature)
+    return days
+
+
+def replay(days):
+    """
+    Runs {day: [lowest, highest]} through a new accumulator, oldest day
+    first, and returns (state, finished days) as common.gdd.apply does.
+    """
+
+    readings = []
+    for day, (lowest, highest) in days.items():
+        midnight = risk.milliseconds(datetime.datetime(
+            day // 10000,
+            day // 100 % 100,
+            day % 100
+        ))
+        readings.append((midnight, lowest))
+        readings.append((midnight + 1, highest))
+    state = gdd.new_state()
+    return state, gdd.apply(state, readings)
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the growing degree-days of a season for every node from '
+        'its raw readings, in a single streamed pass per node. For the '
+        'current season the accumulator the hub endpoints keep up to date '
+        'is replaced too; for a past one only its daily rows are written.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--season',
+            type=int,
+            help='Season year. Defaults to the current or latest season.'
+        )
+        parser.add_argument(
+            '--vineyard',
+            type=int,
+            action='append',
+            help='Only backfill this vineyard. May be repeated.'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.05,
+            help='Seconds to wait between nodes, to spare the cluster.'
+        )
+
+    def handle(self, *args, **options):
+        now = datetime.datetime.utcnow()
+        current = gdd.season_of(timebuckets.bucket_for(now, 'day'))
+        season = options['season'] or current or now.year - 1
+        start = gdd.season_start(season)
+        end = min(now, datetime.datetime(season + 1, 1, 1))
+        if start > end:
+            self.stdout.write('Season {} has not started.'.format(season))
+            return
+
+        vineyard_ids = options['vineyard'] or cassy.get_vineyard_ids()
+        nodes_done = 0
+        for vineyard_id in vineyard_ids:
+            try:
+                nodes = cassy.get_node_coordinates(vineyard_id)
+            except PlantalyticsVineyardException:
+                continue
+            for node_id in sorted(set(node['node_id'] for node in nodes)):
+                days = daily_extremes(cassy.iter_env_data_range(
+                    node_id,
+                    'temperature',
+                    start,
+                    end
+                ))
+                days = {
+                    day: extremes for day, extremes in days.items()
+                    if gdd.season_of(day) == season
+                }
+                if not days:
+                    continue
+                state, finished = replay(days)
+                if season == current:
+                    states = {node_id: state}
+                else:
+                    # The season is over, so its last day is too.
+                    finished.append((
+                        state['day'],
+                        state['day_min'],
+                        state['day_max'],
+                        gdd.degree_days(state['day_min'], state['day_max']),
+                    ))
+                    states = {}
+                cassy.set_gdd_states(
+                    vineyard_id,
+                    states,
+                    {node_id: finished}
+                )
+                nodes_done += 1
+                if options['pause'] > 0:
+                    time.sleep(options['pause'])
+            message = (
+                'Backfilled growing degree-days of vineyard id {} for '
+                'season {}.'
+            ).format(vineyard_id, season)
+            logger.info(message)
+        self.stdout.write(
+            'Backfilled season {} for {} nodes.'.format(season, nodes_done)
+        )
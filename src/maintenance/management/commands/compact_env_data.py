@@ -0,0 +1,127 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import datetime
+import logging
+import time
+
+from common import timebuckets
+from common.exceptions import *
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+import cassy
+
+logger = logging.getLogger('plantalytics_backend.maintenance')
+
+ENV_VARIABLES = ('temperature', 'humidity', 'leafwetness')
+
+
+def summarize(readings):
+    """
+    Returns the number of readings and the min, max and mean of each
+    environmental variable for (batchsent, datasent, temperature,
+    humidity, leafwetness) rows. Missing values are left out.
+    """
+
+    summary = {'readings': len(readings)}
+    for position, variable in enumerate(ENV_VARIABLES, 2):
+        values = [
+            reading[position] for reading in readings
+            if reading[position] is not None
+        ]
+        summary[variable] = {
+            'min': min(values) if values else None,
+            'max': max(values) if values else None,
+            'mean': sum(values) / len(values) if values else None,
+        }
+    return summary
+
+
+class Command(BaseCommand):
+    help = (
+        'Writes a daily summary row per node for the last --days full UTC '
+        'days, so summaries outlive raw readings once they expire. Run it '
+        'daily. Readings are grouped by the day they were taken, reading '
+        'batches sent up to ENV_DATA_MAX_BACKLOG_DAYS later, and rewriting '
+        'a day is harmless, so overlapping runs and backlogs uploaded '
+        'after a day was first summarised are covered by a --days above 1.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=3,
+            help='Full days before today to summarise.'
+        )
+        parser.add_argument(
+            '--vineyard',
+            type=int,
+            action='append',
+            help='Only summarise this vineyard. May be repeated.'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.05,
+            help='Seconds to wait between nodes, to spare the cluster.'
+        )
+
+    def handle(self, *args, **options):
+        today = datetime.datetime.combine(
+            datetime.datetime.utcnow().date(),
+            datetime.time()
+        )
+        start = today - datetime.timedelta(days=options['days'])
+        # Inclusive range ending the millisecond before today began.
+        end = today - datetime.timedelta(milliseconds=1)
+        days = timebuckets.buckets_between(start, end, 'day')
+        # Readings of these days may come in batches sent up to a backlog
+        # later. A batch cannot hold readings taken after it was sent, so
+        # the start needs no widening.
+        batches_end = end + datetime.timedelta(
+            days=settings.ENV_DATA_MAX_BACKLOG_DAYS
+        )
+
+        vineyard_ids = options['vineyard'] or cassy.get_vineyard_ids()
+        summaries = 0
+        for vineyard_id in vineyard_ids:
+            try:
+                nodes = cassy.get_node_coordinates(vineyard_id)
+            except PlantalyticsVineyardException:
+                continue
+            for node_id in sorted(set(node['node_id'] for node in nodes)):
+                readings = cassy.get_env_data_range(
+                    node_id,
+                    ENV_VARIABLES,
+                    start,
+                    batches_end
+                )
+                by_day = {}
+                for reading in readings:
+                    day = timebuckets.bucket_for(reading[1], 'day')
+                    by_day.setdefault(day, []).append(reading)
+                for day in days:
+                    if day not in by_day:
+                        continue
+                    cassy.store_env_summary(
+                        vineyard_id,
+                        node_id,
+                        day,
+                        summarize(by_day[day])
+                    )
+                    summaries += 1
+                if options['pause'] > 0:
+                    time.sleep(options['pause'])
+            message = (
+                'Summarised vineyard id {} for days {} to {}.'
+            ).format(vineyard_id, days[-1], days[0])
+            logger.info(message)
+        self.stdout.write('Wrote {} daily summaries.'.format(summaries))
@@ -0,0 +1,165 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from common import export
+from common.exceptions import *
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import cassy
+from export.views import date_range
+
+logger = logging.getLogger('plantalytics_backend.maintenance')
+
+
+def write_export(path, rows, export_format):
+    """
+    Writes rows to path in export_format, a chunk at a time. Nothing is
+    written when there are no rows. Returns the number of rows written.
+    """
+
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+    count = [1]
+
+    def counted():
+        yield first
+        for row in rows:
+            count[0] += 1
+            yield row
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as export_file:
+        for chunk in export.iter_export(counted(), export_format):
+            export_file.write(chunk)
+    os.replace(temp_path, path)
+    return count[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports environmental readings from --start to --end, inclusive, '
+        'as CSV or Parquet. With --vineyard, that vineyard\'s nodes are '
+        'read one at a time into the --output file. Otherwise the whole '
+        'fleet is scanned by token range, --concurrency ranges at once, '
+        'each range that holds readings written to its own part file in '
+        'the --output directory. Memory stays bounded by a page and a '
+        'chunk of rows per range being read.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='First day exported, as YYYY-MM-DD.'
+        )
+        parser.add_argument(
+            '--end',
+            help='Last day exported, as YYYY-MM-DD.'
+        )
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'parquet'),
+            default='csv',
+            help='File format. Parquet needs pyarrow.'
+        )
+        parser.add_argument(
+            '--vineyard',
+            type=int,
+            help='Only export this vineyard, into a single file.'
+        )
+        parser.add_argument(
+            '--output',
+            help='File for one vineyard, or directory for the fleet.'
+        )
+        parser.add_argument(
+            '--splits',
+            type=int,
+            default=settings.EXPORT_SCAN_SPLITS,
+            help='Token ranges the fleet scan is split into.'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.EXPORT_SCAN_CONCURRENCY,
+            help='Token ranges read at once.'
+        )
+
+    def handle(self, *args, **options):
+        if not (options['start'] and options['end'] and options['output']):
+            raise CommandError('--start, --end and --output are required.')
+        export_format = options['format']
+        if export_format not in export.formats():
+            raise CommandError(
+                'Format {} needs pyarrow installed.'.format(export_format)
+            )
+        try:
+            start, end = date_range(options['start'], options['end'])
+        except PlantalyticsDataException:
+            raise CommandError('--start and --end must be ordered days.')
+
+        if options['vineyard'] is not None:
+            vineyard_id = options['vineyard']
+            try:
+                nodes = cassy.get_node_coordinates(vineyard_id)
+            except PlantalyticsVineyardException:
+                raise CommandError(
+                    'Vineyard id {} not found.'.format(vineyard_id)
+                )
+            rows = write_export(
+                options['output'],
+                cassy.iter_vineyard_env_data(
+                    vineyard_id,
+                    [node['node_id'] for node in nodes],
+                    start,
+                    end
+                ),
+                export_format
+            )
+            self.stdout.write('Exported {} readings.'.format(rows))
+            return
+
+        if options['splits'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--splits and --concurrency must be above 0.')
+        os.makedirs(options['output'], exist_ok=True)
+        ranges = cassy.token_ranges(options['splits'])
+        width = len(str(len(ranges)))
+
+        def export_range(index):
+            first, last = ranges[index]
+            path = os.path.join(
+                options['output'],
+                'part-{}.{}'.format(str(index).zfill(width), export_format)
+            )
+            rows = write_export(
+                path,
+                cassy.iter_env_data_token_range(first, last, start, end),
+                export_format
+            )
+            message = (
+                'Exported {} readings from token range {} to {}.'
+            ).format(rows, first, last)
+            logger.info(message)
+            return rows
+
+        with ThreadPoolExecutor(
+            max_workers=options['concurrency']
+        ) as executor:
+            counts = list(executor.map(export_range, range(len(ranges))))
+        self.stdout.write(
+            'Exported {} readings into {} files.'.format(
+                sum(counts),
+                sum(1 for count in counts if count)
+            )
+        )
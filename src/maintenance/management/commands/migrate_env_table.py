@@ -0,0 +1,168 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import os
+import time
+
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import named_tuple_factory, SimpleStatement
+from common import timebuckets
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import cassy
+from maintenance.checkpoints import load_checkpoint, save_checkpoint
+
+ENV_COLUMNS = (
+    'nodeid',
+    'batchsent',
+    'datasent',
+    'hubid',
+    'humidity',
+    'leafwetness',
+    'temperature',
+    'vineid',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies every row of the node keyed environmental data table into '
+        'the table partitioned by node and time bucket, one page at a time '
+        'and at most --rows-per-second rows a second, so a live cluster '
+        'keeps serving. Progress is checkpointed after each page so an '
+        'interrupted run resumes where it stopped. Apply '
+        '0004_env_data_buckets first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            default=os.environ.get('DB_ENV_TABLE'),
+            help='Node keyed table. Defaults to $DB_ENV_TABLE.'
+        )
+        parser.add_argument(
+            '--target',
+            default=os.environ.get('DB_ENV_BUCKET_TABLE'),
+            help='Bucketed table. Defaults to $DB_ENV_BUCKET_TABLE.'
+        )
+        parser.add_argument(
+            '--bucket',
+            choices=timebuckets.SIZES,
+            default=settings.ENV_DATA_BUCKET,
+            help='Bucket size. Defaults to ENV_DATA_BUCKET.'
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=500,
+            help='Rows read and written per page.'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help='Inserts in flight at once.'
+        )
+        parser.add_argument(
+            '--rows-per-second',
+            type=float,
+            default=1000,
+            help='Most rows copied per second. 0 means no limit.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='migrate_env_table.checkpoint',
+            help='File used to record progress between runs.'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore any saved checkpoint and start from the beginning.'
+        )
+
+    def handle(self, *args, **options):
+        source = options['source']
+        target = options['target']
+        bucket_size = options['bucket']
+        rate = options['rows_per_second']
+        checkpoint_path = options['checkpoint']
+        if not source or not target:
+            raise CommandError('Both --source and --target are required.')
+        if source == target:
+            raise CommandError('--source and --target must differ.')
+
+        if options['restart'] and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        checkpoint = load_checkpoint(checkpoint_path)
+        if checkpoint['done']:
+            self.stdout.write(
+                'Migration already complete ({} rows). '
+                'Use --restart to run it again.'.format(checkpoint['copied'])
+            )
+            return
+
+        session = cassy.get_session()
+        session.row_factory = named_tuple_factory
+        select_statement = SimpleStatement(
+            'SELECT {} FROM {};'.format(', '.join(ENV_COLUMNS), source),
+            fetch_size=options['page_size']
+        )
+        insert_statement = session.prepare(
+            'INSERT INTO {} (bucket, {}) VALUES (?, {});'.format(
+                target,
+                ', '.join(ENV_COLUMNS),
+                ', '.join('?' for _ in ENV_COLUMNS)
+            )
+        )
+
+        paging_state = checkpoint['paging_state']
+        if paging_state is not None:
+            paging_state = bytes.fromhex(paging_state)
+            self.stdout.write(
+                'Resuming after {} rows.'.format(checkpoint['copied'])
+            )
+        started = time.monotonic()
+        copied = 0
+        while True:
+            result = session.execute(
+                select_statement,
+                paging_state=paging_state
+            )
+            rows = result.current_rows
+            execute_concurrent_with_args(
+                session,
+                insert_statement,
+                [
+                    (
+                        timebuckets.bucket_for(row.batchsent, bucket_size),
+                    ) + tuple(row)
+                    for row in rows
+                ],
+                concurrency=options['concurrency']
+            )
+
+            paging_state = result.paging_state
+            checkpoint['copied'] += len(rows)
+            checkpoint['paging_state'] = (
+                paging_state.hex() if paging_state is not None else None
+            )
+            checkpoint['done'] = paging_state is None
+            save_checkpoint(checkpoint_path, checkpoint)
+            self.stdout.write('Copied {} rows.'.format(checkpoint['copied']))
+            if paging_state is None:
+                break
+
+            # Sleep off any lead over the allowed rate before the next page.
+            copied += len(rows)
+            if rate > 0:
+                delay = copied / rate - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+        self.stdout.write('Environmental data migration complete.')
@@ -0,0 +1,162 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import os
+import logging
+
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import named_tuple_factory, SimpleStatement
+from django.core.management.base import BaseCommand, CommandError
+
+import cassy
+from maintenance.checkpoints import load_checkpoint, save_checkpoint
+
+logger = logging.getLogger('plantalytics_backend.maintenance')
+
+USER_COLUMNS = (
+    'username',
+    'password',
+    'admin',
+    'email',
+    'enable',
+    'securitytoken',
+    'subenddate',
+    'userid',
+    'vineyards',
+)
+# When each legacy row was written, in microseconds. WRITETIME cannot
+# read the password, which is part of the legacy key, but a password
+# change inserted every column of the new row, userid included.
+WRITTEN_COLUMN = 'WRITETIME(userid) AS written'
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies every row of the legacy (username, password) keyed user '
+        'table into the username keyed table one page at a time. Progress '
+        'is checkpointed after each page so an interrupted run resumes '
+        'where it stopped. Where a user has several legacy rows the newest '
+        'one is kept. Apply 0001_user_username_key first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            default=os.environ.get('DB_USER_TABLE_LEGACY'),
+            help='Legacy user table. Defaults to $DB_USER_TABLE_LEGACY.'
+        )
+        parser.add_argument(
+            '--target',
+            default=os.environ.get('DB_USER_TABLE'),
+            help='Username keyed user table. Defaults to $DB_USER_TABLE.'
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=500,
+            help='Rows read and written per page.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='migrate_user_table.checkpoint',
+            help='File used to record progress between runs.'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore any saved checkpoint and start from the beginning.'
+        )
+
+    def handle(self, *args, **options):
+        source = options['source']
+        target = options['target']
+        checkpoint_path = options['checkpoint']
+        if not source or not target:
+            raise CommandError('Both --source and --target are required.')
+        if source == target:
+            raise CommandError('--source and --target must differ.')
+
+        if options['restart'] and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        checkpoint = load_checkpoint(checkpoint_path)
+        if checkpoint['done']:
+            self.stdout.write(
+                'Migration already complete ({} rows). '
+                'Use --restart to run it again.'.format(checkpoint['copied'])
+            )
+            return
+
+        session = cassy.get_session()
+        session.row_factory = named_tuple_factory
+        select_statement = SimpleStatement(
+            'SELECT {}, {} FROM {};'.format(
+                ', '.join(USER_COLUMNS),
+                WRITTEN_COLUMN,
+                source
+            ),
+            fetch_size=options['page_size']
+        )
+        # Written with the legacy row's own timestamp, so of several rows
+        # for a user the newest wins whatever order they are written in,
+        # across pages too, and a row changed since in the target stays.
+        insert_statement = session.prepare(
+            'INSERT INTO {} ({}) VALUES ({}) USING TIMESTAMP ?;'.format(
+                target,
+                ', '.join(USER_COLUMNS),
+                ', '.join('?' for _ in USER_COLUMNS)
+            )
+        )
+
+        paging_state = checkpoint['paging_state']
+        if paging_state is not None:
+            paging_state = bytes.fromhex(paging_state)
+            self.stdout.write(
+                'Resuming after {} rows.'.format(checkpoint['copied'])
+            )
+        previous_username = None
+        while True:
+            result = session.execute(
+                select_statement,
+                paging_state=paging_state
+            )
+            rows = result.current_rows
+            newest = {}
+            for row in rows:
+                # Rows of one legacy partition are adjacent in the scan, so
+                # a repeat means a password change was left half done.
+                if row.username == previous_username:
+                    logger.warning(
+                        'Multiple legacy rows for user \'{}\'; '
+                        'keeping the newest.'.format(row.username)
+                    )
+                previous_username = row.username
+                kept = newest.get(row.username)
+                if kept is None or (row.written or 0) >= (kept.written or 0):
+                    newest[row.username] = row
+            execute_concurrent_with_args(
+                session,
+                insert_statement,
+                [
+                    tuple(getattr(row, column) for column in USER_COLUMNS) +
+                    (row.written or 0,)
+                    for row in newest.values()
+                ]
+            )
+
+            paging_state = result.paging_state
+            checkpoint['copied'] += len(rows)
+            checkpoint['paging_state'] = (
+                paging_state.hex() if paging_state is not None else None
+            )
+            checkpoint['done'] = paging_state is None
+            save_checkpoint(checkpoint_path, checkpoint)
+            self.stdout.write('Copied {} rows.'.format(checkpoint['copied']))
+            if paging_state is None:
+                break
+        self.stdout.write('User table migration complete.')
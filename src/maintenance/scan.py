@@ -0,0 +1,211 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Whole table scans for maintenance jobs, split by token range.
+
+A scan splits the Murmur3 token ring with cassy.token_ranges and reads
+each range a page at a time with cassy.scan_token_range, one page in
+flight per range and up to `concurrency` ranges at once, on a thread
+pool or, with processes=True, a process pool whose workers each open
+their own connection. Rows are yielded as pages arrive, in no particular
+order, so memory holds at most a page per range in flight.
+
+With a checkpoint file, each range's paging state is saved once its page
+has been consumed, and a scan started again with the same file resumes
+from there. Rows of a page the consumer had not finished are yielded
+again, so jobs should be safe to repeat on a row. rows_per_second
+throttles the scan by sleeping off any lead before the next page.
+
+    scan = TableScan(
+        os.environ.get('DB_HW_TABLE'),
+        ('nodeid', 'vineid'),
+        ('nodeid',),
+        checkpoint='hardware.checkpoint'
+    )
+    for node_id, vineyard_id in scan:
+        ...
+"""
+
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+from django.conf import settings
+
+import cassy
+from maintenance.checkpoints import load_checkpoint, save_checkpoint
+
+
+def fetch_page(table, columns, partition_key, conditions, parameters,
+               page_size, first, last, paging_state):
+    """
+    Reads one page of a token range. A module level function, so process
+    pool workers can run it.
+    """
+
+    if paging_state is not None:
+        paging_state = bytes.fromhex(paging_state)
+    rows, paging_state = cassy.scan_token_range(
+        table,
+        columns,
+        partition_key,
+        first,
+        last,
+        conditions=conditions,
+        parameters=parameters,
+        paging_state=paging_state,
+        page_size=page_size
+    )
+    return rows, paging_state.hex() if paging_state is not None else None
+
+
+class TableScan(object):
+    """
+    A resumable, throttled scan of every row of a table. Iterating it
+    yields tuples of columns. conditions and parameters are passed to
+    cassy.scan_token_range. splits, concurrency and page_size default to
+    SCAN_SPLITS, SCAN_CONCURRENCY and SCAN_PAGE_SIZE.
+    """
+
+    def __init__(self, table, columns, partition_key, conditions='',
+                 parameters=(), splits=None, concurrency=None,
+                 page_size=None, rows_per_second=0, checkpoint=None,
+                 processes=False):
+        self.table = table
+        self.columns = tuple(columns)
+        self.partition_key = tuple(partition_key)
+        self.conditions = conditions
+        self.parameters = tuple(parameters)
+        self.splits = splits or settings.SCAN_SPLITS
+        self.concurrency = concurrency or settings.SCAN_CONCURRENCY
+        self.page_size = page_size or settings.SCAN_PAGE_SIZE
+        self.rows_per_second = rows_per_second
+        self.checkpoint_path = checkpoint
+        self.processes = processes
+        self.scanned = 0
+
+    def __iter__(self):
+        return self.rows()
+
+    def _load(self):
+        """
+        Returns the scan's progress, {'table', 'splits', 'positions',
+        'done', 'scanned'}, where positions maps a started range's index
+        to its paging state and done lists the finished ranges.
+        """
+
+        fresh = {
+            'table': self.table,
+            'splits': self.splits,
+            'positions': {},
+            'done': [],
+            'scanned': 0,
+        }
+        if self.checkpoint_path is None:
+            return fresh
+        checkpoint = load_checkpoint(self.checkpoint_path, fresh)
+        if (checkpoint['table'], checkpoint['splits']) != (
+            self.table, self.splits
+        ):
+            raise ValueError(
+                'Checkpoint {} is for {} split {} ways.'.format(
+                    self.checkpoint_path,
+                    checkpoint['table'],
+                    checkpoint['splits']
+                )
+            )
+        return checkpoint
+
+    def _save(self, checkpoint):
+        if self.checkpoint_path is not None:
+            save_checkpoint(self.checkpoint_path, checkpoint)
+
+    def rows(self):
+        """
+        Yields every row not yet consumed according to the checkpoint.
+        """
+
+        checkpoint = self._load()
+        ranges = cassy.token_ranges(self.splits)
+        done = set(checkpoint['done'])
+        pending = deque(
+            index for index in range(len(ranges)) if index not in done
+        )
+        if self.processes:
+            executor = ProcessPoolExecutor(max_workers=self.concurrency)
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        in_flight = {}
+
+        def submit(index, paging_state):
+            first, last = ranges[index]
+            future = executor.submit(
+                fetch_page,
+                self.table,
+                self.columns,
+                self.partition_key,
+                self.conditions,
+                self.parameters,
+                self.page_size,
+                first,
+                last,
+                paging_state
+            )
+            in_flight[future] = index
+
+        def submit_pending():
+            index = pending.popleft()
+            submit(index, checkpoint['positions'].get(str(index)))
+
+        started = time.monotonic()
+        scanned = 0
+        try:
+            while pending and len(in_flight) < self.concurrency:
+                submit_pending()
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = in_flight.pop(future)
+                    rows, paging_state = future.result()
+                    # Read ahead while this page is consumed.
+                    if paging_state is not None:
+                        submit(index, paging_state)
+                    elif pending:
+                        submit_pending()
+                    for row in rows:
+                        yield row
+
+                    # Recorded only once the page has been consumed.
+                    if paging_state is None:
+                        checkpoint['positions'].pop(str(index), None)
+                        checkpoint['done'].append(index)
+                    else:
+                        checkpoint['positions'][str(index)] = paging_state
+                    checkpoint['scanned'] += len(rows)
+                    self._save(checkpoint)
+                    self.scanned = checkpoint['scanned']
+
+                    # Sleep off any lead over the allowed rate.
+                    scanned += len(rows)
+                    if self.rows_per_second > 0:
+                        delay = scanned / self.rows_per_second - (
+                            time.monotonic() - started
+                        )
+                        if delay > 0:
+                            time.sleep(delay)
+        finally:
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True)
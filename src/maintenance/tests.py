@@ -0,0 +1,284 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import os
+import datetime
+import tempfile
+from collections import namedtuple
+
+from common import timebuckets
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from unittest.mock import MagicMock, patch
+
+import cassy
+from maintenance.management.commands.apply_schema import (
+    CQL_DIR,
+    load_statements,
+)
+from maintenance.management.commands.migrate_env_table import ENV_COLUMNS
+from maintenance.management.commands.migrate_user_table import (
+    load_checkpoint,
+    USER_COLUMNS,
+)
+from maintenance.scan import TableScan
+
+EnvRow = namedtuple('EnvRow', ENV_COLUMNS)
+UserRow = namedtuple('UserRow', USER_COLUMNS + ('written',))
+
+
+def page(rows, paging_state):
+    """
+    Builds a mock result page as returned by the driver.
+    """
+    result = MagicMock()
+    result.current_rows = rows
+    result.paging_state = paging_state
+    return result
+
+
+class MainTests(TestCase):
+    """
+    Executes all of the unit tests for the maintenance commands.
+    """
+
+    @patch.dict(os.environ, {'DB_USER_TABLE': 'users_by_name'})
+    def test_load_user_schema(self):
+        """
+        Tests the user schema file is split into formatted statements.
+        """
+        statements = load_statements(
+            os.path.join(CQL_DIR, '0001_user_username_key.cql')
+        )
+        self.assertEqual(len(statements), 3)
+        self.assertTrue(
+            statements[0].startswith(
+                'CREATE TABLE IF NOT EXISTS users_by_name'
+            )
+        )
+        self.assertTrue('username text PRIMARY KEY' in statements[0])
+
+    @patch('cassy.get_session')
+    @patch('maintenance.management.commands.migrate_user_table.'
+           'execute_concurrent_with_args')
+    def test_migrate_user_table_resumes(self, concurrent_mock, get_mock):
+        """
+        Tests the user table migration checkpoints each page, resumes
+        from the saved paging state and keeps a user's newest row.
+        """
+        session_mock = get_mock.return_value
+        row = UserRow(
+            'welches', 'grape', False, 'a@b.c', True, '', '2020-01-01', 1, [0],
+            1000
+        )
+        newer = row._replace(password='raisin', written=2000)
+        session_mock.execute.side_effect = [
+            page([row], b'\x01\x02'),
+            Exception('Connection lost'),
+        ]
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'users.checkpoint')
+        with self.assertRaises(Exception):
+            call_command(
+                'migrate_user_table',
+                source='users',
+                target='users_by_name',
+                checkpoint=checkpoint,
+                stdout=MagicMock()
+            )
+        self.assertEqual(load_checkpoint(checkpoint)['copied'], 1)
+        self.assertEqual(load_checkpoint(checkpoint)['paging_state'], '0102')
+
+        session_mock.execute.side_effect = [page([newer, row], None)]
+        call_command(
+            'migrate_user_table',
+            source='users',
+            target='users_by_name',
+            checkpoint=checkpoint,
+            stdout=MagicMock()
+        )
+        resumed_state = session_mock.execute.call_args[1]['paging_state']
+        self.assertEqual(resumed_state, b'\x01\x02')
+        self.assertEqual(load_checkpoint(checkpoint)['copied'], 3)
+        self.assertTrue(load_checkpoint(checkpoint)['done'])
+        self.assertEqual(concurrent_mock.call_count, 2)
+        self.assertEqual(concurrent_mock.call_args[0][2], [tuple(newer)])
+
+    @patch('time.sleep')
+    @patch('cassy.get_session')
+    @patch('maintenance.management.commands.migrate_env_table.'
+           'execute_concurrent_with_args')
+    def test_migrate_env_table_buckets(self, concurrent_mock, get_mock,
+                                       sleep_mock):
+        """
+        Tests the environmental data migration writes each row with the
+        bucket of its batch and is throttled between pages.
+        """
+        session_mock = get_mock.return_value
+        sent = datetime.datetime(2016, 10, 19, 23, 59)
+        row = EnvRow(1, sent, sent, 0, 40.0, 2.0, 21.5, 0)
+        session_mock.execute.side_effect = [
+            page([row], b'\x01'),
+            page([row], None),
+        ]
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'env.checkpoint')
+        call_command(
+            'migrate_env_table',
+            source='env_data',
+            target='env_data_by_bucket',
+            bucket='month',
+            rows_per_second=0.5,
+            checkpoint=checkpoint,
+            stdout=MagicMock()
+        )
+        arguments = concurrent_mock.call_args[0][2]
+        self.assertEqual(arguments, [(201610,) + tuple(row)])
+        self.assertTrue(load_checkpoint(checkpoint)['done'])
+        self.assertEqual(sleep_mock.call_count, 1)
+
+    @patch('cassy.store_env_summary')
+    @patch('cassy.get_env_data_range')
+    @patch('cassy.get_node_coordinates')
+    @patch('cassy.get_vineyard_ids')
+    def test_compact_env_data(self, ids_mock, nodes_mock, range_mock,
+                              store_mock):
+        """
+        Tests one summary is written per node per day with readings,
+        grouping a reading uploaded late by the day it was taken.
+        """
+        ids_mock.return_value = [0]
+        nodes_mock.return_value = [{'node_id': 1, 'lat': 0, 'lon': 0}]
+        now = datetime.datetime.utcnow()
+        yesterday = now - datetime.timedelta(days=1)
+        range_mock.return_value = [
+            (now, yesterday, 20.0, 40.0, None),
+            (yesterday, yesterday, 10.0, 60.0, 5.0),
+        ]
+        call_command('compact_env_data', pause=0, stdout=MagicMock())
+        store_mock.assert_called_once_with(
+            0,
+            1,
+            timebuckets.bucket_for(yesterday, 'day'),
+            {
+                'readings': 2,
+                'temperature': {'min': 10.0, 'max': 20.0, 'mean': 15.0},
+                'humidity': {'min': 40.0, 'max': 60.0, 'mean': 50.0},
+                'leafwetness': {'min': 5.0, 'max': 5.0, 'mean': 5.0},
+            }
+        )
+
+    @override_settings(GDD_SEASON_START=(4, 1))
+    @patch('cassy.set_gdd_states')
+    @patch('cassy.iter_env_data_range')
+    @patch('cassy.get_node_coordinates')
+    @patch('cassy.get_vineyard_ids')
+    def test_backfill_gdd_past_season(self, ids_mock, nodes_mock, iter_mock,
+                                      set_mock):
+        """
+        Tests a past season is rebuilt from one pass over the readings,
+        its last day included, without touching the accumulator.
+        """
+        ids_mock.return_value = [0]
+        nodes_mock.return_value = [{'node_id': 1, 'lat': 0, 'lon': 0}]
+        first = datetime.datetime(2016, 10, 19)
+        iter_mock.return_value = iter(
+            [
+                (first, first + datetime.timedelta(hours=hour), 12.0 + hour)
+                for hour in range(24)
+            ] + [(first, first + datetime.timedelta(days=1), 15.0)]
+        )
+        call_command(
+            'backfill_gdd',
+            season=2016,
+            pause=0,
+            stdout=MagicMock()
+        )
+        set_mock.assert_called_once_with(
+            0,
+            {},
+            {1: [
+                (20161019, 12.0, 35.0, 11.0),
+                (20161020, 15.0, 15.0, 5.0),
+            ]}
+        )
+
+    @patch('cassy.iter_env_data_token_range')
+    def test_export_env_data_fleet(self, iter_mock):
+        """
+        Tests a fleet export scans every token range and writes a part
+        file only for the ranges holding readings.
+        """
+        sent = datetime.datetime(2016, 10, 19, 12)
+        iter_mock.side_effect = lambda first, last, start, end: iter(
+            [(0, 1, sent, sent, 20.5, 50.0, 10.0)] if last < 0 else []
+        )
+        output = tempfile.mkdtemp()
+        call_command(
+            'export_env_data',
+            start='2016-10-19',
+            end='2016-10-19',
+            output=output,
+            splits=4,
+            concurrency=2,
+            stdout=MagicMock()
+        )
+        self.assertEqual(iter_mock.call_count, 4)
+        self.assertEqual(
+            sorted(os.listdir(output)),
+            ['part-0.csv', 'part-1.csv']
+        )
+        with open(os.path.join(output, 'part-0.csv')) as export_file:
+            lines = export_file.read().splitlines()
+        self.assertEqual(lines[1], '0,1,2016-10-19T12:00:00.000Z,'
+                                   '2016-10-19T12:00:00.000Z,20.5,50,10')
+
+    @patch('time.sleep')
+    @patch('cassy.scan_token_range')
+    def test_table_scan_resumes(self, scan_mock, sleep_mock):
+        """
+        Tests a table scan reads every token range a page at a time and
+        resumes from its checkpoint after being stopped part way.
+        """
+        def scan_token_range(table, columns, partition_key, first, last,
+                             conditions='', parameters=(), paging_state=None,
+                             page_size=None):
+            if paging_state is None:
+                return [(first, 0), (first, 1)], b'\x01'
+            return [(first, 2)], None
+
+        scan_mock.side_effect = scan_token_range
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'scan.checkpoint')
+        scan = TableScan(
+            'hardware',
+            ('nodeid', 'vineid'),
+            ('nodeid',),
+            splits=2,
+            concurrency=1,
+            rows_per_second=1,
+            checkpoint=checkpoint
+        )
+        rows = scan.rows()
+        first_rows = [next(rows) for _ in range(3)]
+        rows.close()
+        saved = load_checkpoint(checkpoint)
+        self.assertEqual(saved['positions'], {'0': '01'})
+        self.assertEqual(saved['scanned'], 2)
+
+        rest = list(scan)
+        self.assertEqual(len(first_rows) + len(rest), 7)
+        self.assertEqual(
+            set(first_rows + rest),
+            set(
+                (first, page)
+                for first, _ in cassy.token_ranges(2)
+                for page in range(3)
+            )
+        )
+        self.assertEqual(load_checkpoint(checkpoint)['done'], [0, 1])
+        self.assertEqual(list(scan), [])
+        self.assertTrue(sleep_mock.called)
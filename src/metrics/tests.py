@@ -0,0 +1,64 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+from common import metrics
+from common.cache import TTLCache
+from django.test import TestCase, Client
+from django.test.utils import setup_test_environment
+
+
+class MainTests(TestCase):
+    """
+    Executes all of the unit tests for plantalytics-backend.
+    """
+
+    def test_metrics_response(self):
+        """
+        Tests the metrics endpoint serves request durations in the
+        Prometheus text format.
+        """
+        setup_test_environment()
+        client = Client()
+        client.get('/health_check')
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'plantalytics_request_duration_seconds_count'
+            '{endpoint="health_check.views.index"}',
+            response.content.decode('utf-8')
+        )
+
+    def test_metrics_rejects_post(self):
+        """
+        Tests the metrics endpoint with a POST request.
+        """
+        setup_test_environment()
+        client = Client()
+        response = client.post('/metrics')
+        self.assertEqual(response.status_code, 405)
+
+    def test_cache_hits_and_misses_counted(self):
+        """
+        Tests cache hits and misses are counted per cache.
+        """
+        cache = TTLCache('test_metrics')
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', 'value', 60)
+        self.assertEqual(cache.get('key'), 'value')
+        counters = metrics.collect()[0]
+        self.assertEqual(counters[('cache_hits_total', 'test_metrics')], 1)
+        self.assertEqual(counters[('cache_misses_total', 'test_metrics')], 1)
+
+    def test_counter_rendered(self):
+        """
+        Tests an incremented counter is rendered with its type.
+        """
+        metrics.increment('ingest_rows_total', amount=3)
+        text = metrics.render_prometheus()
+        self.assertIn('# TYPE plantalytics_ingest_rows_total counter', text)
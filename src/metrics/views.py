@@ -0,0 +1,25 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+from common import metrics
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.views.decorators.csrf import csrf_exempt
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@csrf_exempt
+def index(request):
+    """
+    Reports the metrics of every worker in the Prometheus text format.
+    """
+
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    return HttpResponse(metrics.render_prometheus(), content_type=CONTENT_TYPE)
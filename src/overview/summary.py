@@ -0,0 +1,186 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Per-vineyard summaries for the /overview dashboard: the vineyard's
+geometry, how many of its hubs are reporting, and the min, mean and max
+of each environmental variable across its nodes.
+
+A summary takes a handful of reads, so the vineyards of a request are
+summarised concurrently, OVERVIEW_CONCURRENCY at a time, and the node
+partitions of each vineyard are read concurrently by
+cassy.get_latest_env_data. Summaries are cached per vineyard for
+OVERVIEW_CACHE_SECONDS, which is shorter than the hub reporting interval,
+so a dashboard polled by many users costs one set of reads per vineyard.
+"""
+
+import datetime
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common.cache import TTLCache
+from common.exceptions import PlantalyticsException
+from common.errors import *
+from django.conf import settings
+
+import cassy
+from env_data.views import ENV_VARIABLES
+
+logger = logging.getLogger('plantalytics_backend.overview')
+
+summary_cache = TTLCache('overview')
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    Returns this process's pool for summarising vineyards, created
+    lazily and again after a fork.
+    """
+
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.OVERVIEW_CONCURRENCY
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def geometry(center, boundary, nodes):
+    """
+    Returns the center, bounding box, boundary point count and node
+    count of a vineyard.
+    """
+
+    points = list(boundary) or [center]
+    return {
+        'center': center,
+        'bounds': {
+            'south': min(point['lat'] for point in points),
+            'west': min(point['lon'] for point in points),
+            'north': max(point['lat'] for point in points),
+            'east': max(point['lon'] for point in points),
+        },
+        'boundary_points': len(boundary),
+        'nodes': len(nodes),
+    }
+
+
+def hub_health(report_times, now):
+    """
+    Returns how many hubs there are, how many sent a batch in the last
+    HUB_REPORTING_MINUTES, and when the latest batch arrived.
+    """
+
+    cutoff = now - datetime.timedelta(minutes=settings.HUB_REPORTING_MINUTES)
+    times = [sent for sent in report_times.values() if sent is not None]
+    latest = max(times) if times else None
+    return {
+        'total': len(report_times),
+        'reporting': len([sent for sent in times if sent >= cutoff]),
+        'last_report': latest.isoformat() if latest else None,
+    }
+
+
+def env_statistics(latest):
+    """
+    Returns {variable: {'min', 'mean', 'max', 'nodes'}} across the
+    latest readings of each node, {node_id: {variable: value}}. Values
+    are None for a variable no node has reported.
+    """
+
+    statistics = {}
+    for variable in ENV_VARIABLES:
+        values = [
+            readings[variable] for readings in latest.values()
+            if readings.get(variable) is not None
+        ]
+        statistics[variable] = {
+            'min': min(values) if values else None,
+            'mean': sum(values) / len(values) if values else None,
+            'max': max(values) if values else None,
+            'nodes': len(values),
+        }
+    return statistics
+
+
+def summarize_vineyard(vineyard_id):
+    """
+    Reads and returns the summary of one vineyard.
+    """
+
+    center, boundary = cassy.get_vineyard_coordinates(vineyard_id)
+    nodes = cassy.get_node_coordinates(vineyard_id)
+    node_ids = sorted(set(node['node_id'] for node in nodes))
+    return {
+        'geometry': geometry(center, boundary, node_ids),
+        'hubs': hub_health(
+            cassy.get_hub_report_times(vineyard_id),
+            datetime.datetime.utcnow()
+        ),
+        'env_data': env_statistics(
+            cassy.get_latest_env_data(node_ids, ENV_VARIABLES)
+        ),
+    }
+
+
+def vineyard_summary(vineyard_id):
+    """
+    Returns the summary of one vineyard, from the cache when it is
+    fresh. A vineyard that cannot be summarised gets an 'errors' entry
+    instead, so it does not fail the rest of the overview.
+    """
+
+    summary = summary_cache.get(vineyard_id)
+    if summary is not None:
+        return summary
+    try:
+        summary = summarize_vineyard(vineyard_id)
+    except PlantalyticsException as e:
+        return json.loads(custom_error(str(e)))
+    except Exception as e:
+        message = (
+            'Error occurred while summarising vineyard id {}. {}'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        return json.loads(custom_error(VINEYARD_UNKNOWN, str(e)))
+    summary_cache.set(vineyard_id, summary, settings.OVERVIEW_CACHE_SECONDS)
+    return summary
+
+
+def summarize_vineyards(vineyards):
+    """
+    Returns the summaries of vineyards, a list of {'vineyard_id',
+    'vineyard_name'}, in the same order, read concurrently.
+    """
+
+    executor = _get_executor()
+    futures = [
+        executor.submit(vineyard_summary, vineyard['vineyard_id'])
+        for vineyard in vineyards
+    ]
+    summaries = []
+    for vineyard, future in zip(vineyards, futures):
+        summary = {
+            'vineyard_id': vineyard['vineyard_id'],
+            'vineyard_name': vineyard['vineyard_name'],
+        }
+        summary.update(future.result())
+        summaries.append(summary)
+    return summaries
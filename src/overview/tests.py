@@ -0,0 +1,126 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import os
+import json
+
+from common.errors import *
+from common.exceptions import PlantalyticsVineyardException
+from django.test import TestCase, Client, override_settings
+from django.test.utils import setup_test_environment
+from unittest.mock import patch
+
+import cassy
+from overview.summary import summary_cache
+
+
+@override_settings(DB_BACKEND='memory')
+class MainTests(TestCase):
+    """
+    Executes all of the unit tests for the overview endpoint.
+    """
+
+    def setUp(self):
+        cassy.connection.reset()
+        summary_cache.invalidate()
+
+    def tearDown(self):
+        cassy.connection.reset()
+        summary_cache.invalidate()
+
+    def post_overview(self, auth_token):
+        """
+        Posts auth_token to the overview endpoint.
+        """
+        setup_test_environment()
+        client = Client()
+        return client.post(
+            '/overview',
+            data=json.dumps({'auth_token': auth_token}),
+            content_type='application/json'
+        )
+
+    def test_response_overview(self):
+        """
+        Tests every authorized vineyard is summarised, with the spread of
+        its nodes' readings and its hubs reporting.
+        """
+        response = self.post_overview(os.environ.get('ADMIN_TOKEN'))
+        self.assertEqual(response.status_code, 200)
+        vineyards = json.loads(response.content.decode('utf-8'))['vineyards']
+        summary = [
+            vineyard for vineyard in vineyards
+            if vineyard['vineyard_id'] == 0
+        ][0]
+        self.assertEqual(summary['geometry']['nodes'], 3)
+        self.assertEqual(summary['hubs']['total'], 1)
+        self.assertEqual(summary['hubs']['reporting'], 1)
+        temperature = summary['env_data']['temperature']
+        self.assertEqual(temperature['nodes'], 3)
+        self.assertTrue(
+            temperature['min'] <= temperature['mean'] <= temperature['max']
+        )
+
+    @patch('cassy.get_vineyard_coordinates')
+    def test_response_overview_cached(self, coordinates_mock):
+        """
+        Tests a second overview is answered from the summary cache.
+        """
+        coordinates_mock.return_value = [
+            {'lat': 45.0, 'lon': -123.0},
+            [{'lat': 45.0, 'lon': -123.0}],
+        ]
+        first = self.post_overview(os.environ.get('ADMIN_TOKEN'))
+        calls = coordinates_mock.call_count
+        second = self.post_overview(os.environ.get('ADMIN_TOKEN'))
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(coordinates_mock.call_count, calls)
+        self.assertEqual(first.content, second.content)
+
+    @patch('cassy.get_vineyard_coordinates')
+    def test_response_overview_vineyard_error(self, coordinates_mock):
+        """
+        Tests a vineyard that cannot be summarised is reported without
+        failing the overview.
+        """
+        coordinates_mock.side_effect = PlantalyticsVineyardException(
+            VINEYARD_ID_NOT_FOUND
+        )
+        response = self.post_overview(os.environ.get('ADMIN_TOKEN'))
+        self.assertEqual(response.status_code, 200)
+        vineyards = json.loads(response.content.decode('utf-8'))['vineyards']
+        self.assertTrue(VINEYARD_ID_NOT_FOUND in vineyards[0]['errors'])
+
+    @patch('cassy.get_vineyard_coordinates')
+    def test_response_overview_vineyard_unknown_error(self, coordinates_mock):
+        """
+        Tests an unexpected error summarising a vineyard is reported for
+        that vineyard without failing the overview.
+        """
+        coordinates_mock.side_effect = Exception('Read timed out.')
+        response = self.post_overview(os.environ.get('ADMIN_TOKEN'))
+        self.assertEqual(response.status_code, 200)
+        vineyards = json.loads(response.content.decode('utf-8'))['vineyards']
+        self.assertTrue(VINEYARD_UNKNOWN in vineyards[0]['errors'])
+
+    def test_response_overview_invalid_token(self):
+        """
+        Tests the overview endpoint with an invalid auth token.
+        """
+        response = self.post_overview('not-a-token')
+        self.assertEqual(response.status_code, 403)
+
+    def test_overview_invalid_method(self):
+        """
+        Tests the overview endpoint with unsupported HTTP method.
+        """
+        setup_test_environment()
+        client = Client()
+        response = client.get('/overview')
+        self.assertEqual(response.status_code, 405)
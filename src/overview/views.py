@@ -0,0 +1,92 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import json
+import logging
+
+from common.exceptions import PlantalyticsException
+from common.errors import *
+from django.views.decorators.csrf import csrf_exempt
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed
+)
+
+import cassy
+from .summary import summarize_vineyards
+
+logger = logging.getLogger('plantalytics_backend.overview')
+
+
+@csrf_exempt
+def index(request):
+    """
+    Responds with a summary of every vineyard the auth token's user may
+    see: its geometry, hub health and the spread of the latest
+    environmental readings across its nodes.
+    """
+
+    if request.method != "POST":
+        return HttpResponseNotAllowed(['POST'])
+
+    data = json.loads(request.body.decode('utf-8'))
+    auth_token = str(data.get('auth_token', ''))
+
+    try:
+        logger.info('Validating auth token for vineyard overview.')
+        username = cassy.verify_auth_token(auth_token)
+    except PlantalyticsException as e:
+        logger.warn('Invalid auth token for vineyard overview.')
+        error = custom_error(str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while validating auth token for vineyard '
+            'overview.\n{}.'
+        ).format(str(e))
+        logger.exception(message)
+        error = custom_error(AUTH_UNKNOWN, str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+
+    try:
+        message = (
+            'Fetching vineyard overview for user \'{}\'.'
+        ).format(username)
+        logger.info(message)
+
+        vineyards = cassy.get_authorized_vineyards(username)
+        response = {
+            'vineyards': summarize_vineyards(vineyards),
+        }
+
+        message = (
+            'Successfully fetched overview of {} vineyards for user \'{}\'.'
+        ).format(len(vineyards), username)
+        logger.info(message)
+        return HttpResponse(
+            json.dumps(response),
+            content_type='application/json'
+        )
+    except PlantalyticsException as e:
+        message = (
+            'No vineyards found for overview of user \'{}\'.'
+        ).format(username)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while fetching vineyard overview for '
+            'user \'{}\'. {}'
+        ).format(username, str(e))
+        logger.exception(message)
+        error = custom_error(VINEYARD_UNKNOWN, str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
@@ -14,6 +14,7 @@ import os
 
 import cassy
 from django.views.decorators.csrf import csrf_exempt
+from common import passwords
 from common.exceptions import *
 from common.errors import *
 from django.conf import settings
@@ -84,7 +85,7 @@ def change(request):
                 ).format(reset_name, username)
                 logger.warn(message)
                 raise PlantalyticsLoginException(LOGIN_ERROR)
-            if new_password == stored_password:
+            if passwords.check_password(new_password, stored_password):
                 logger.warn('Invalid new password.')
                 raise PlantalyticsPasswordException(CHANGE_ERROR_PASSWORD)
 
@@ -109,7 +110,7 @@ def change(request):
             if verified_admin is True:
                 if username:
                     stored_password = cassy.get_user_password(username)
-                    if new_password == stored_password:
+                    if passwords.check_password(new_password, stored_password):
                         logger.warn('Invalid new password.')
                         raise PlantalyticsPasswordException(
                             CHANGE_ERROR_PASSWORD
@@ -134,10 +135,10 @@ def change(request):
                 logger.info(message)
 
                 stored_password = cassy.get_user_password(verified_name)
-                if new_password == stored_password:
+                if passwords.check_password(new_password, stored_password):
                     logger.warn('Invalid new password.')
                     raise PlantalyticsPasswordException(CHANGE_ERROR_PASSWORD)
-                if stored_password != old_password:
+                if not passwords.check_password(old_password, stored_password):
                     logger.warn(
                         'Old password does not match supplied password.'
                     )
@@ -148,6 +149,14 @@ def change(request):
                     stored_password
                 )
 
+    except PlantalyticsBusyException as e:
+        logger.warn('Password hashing busy while changing password.')
+        error = custom_error(str(e))
+        return HttpResponse(
+            error,
+            content_type='application/json',
+            status=503
+        )
     except (PlantalyticsAuthException, PlantalyticsLoginException) as e:
         message = (
             'Error attempting to change password. Error code: {}'
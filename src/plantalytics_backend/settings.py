@@ -55,9 +55,11 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'corsheaders',
+    'maintenance',
 ]
 
 MIDDLEWARE_CLASSES = [
+    'common.middleware.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -102,6 +104,119 @@ DATABASES = {
     }
 }
 
+# Storage backend for cassy: 'cassandra' connects to DB_HOST, 'memory' keeps
+# the tables in process, seeded with the test fixtures, so the test suite
+# and benchmarks run without a cluster.
+DB_BACKEND = os.environ.get('DB_BACKEND', 'cassandra')
+# Seconds the memory backend sleeps per prepare and execute.
+DB_MEMORY_LATENCY = float(os.environ.get('DB_MEMORY_LATENCY', 0))
+# Layout of environmental data: 'node' keeps each node's readings in one
+# DB_ENV_TABLE partition, 'bucketed' partitions DB_ENV_BUCKET_TABLE by node
+# and ENV_DATA_BUCKET, 'day' or 'month'. See maintenance/cql/0004.
+ENV_DATA_PARTITIONING = os.environ.get('ENV_DATA_PARTITIONING', 'node')
+ENV_DATA_BUCKET = os.environ.get('ENV_DATA_BUCKET', 'day')
+# Buckets searched, newest first, for a node's latest reading.
+ENV_DATA_LATEST_BUCKETS = 7
+# Buckets a range read queries at once.
+ENV_DATA_RANGE_CONCURRENCY = 8
+# Days raw readings are kept before Cassandra expires them, unless a
+# vineyard sets its own; 0 keeps them forever. maintenance compact_env_data
+# keeps a daily summary per node, so a shorter period must still leave it
+# ENV_DATA_RETENTION_MIN_DAYS to run.
+ENV_DATA_RETENTION_DAYS = 90
+ENV_DATA_RETENTION_MIN_DAYS = 7
+# Oldest reading, in days before the batch carrying it, that a hub backlog
+# is expected to hold. compact_env_data reads batches sent this long after
+# the days it summarises so late readings land on their own day.
+ENV_DATA_MAX_BACKLOG_DAYS = 7
+ENV_DATA_RETENTION_CACHE_SECONDS = 300
+# Heatmaps have ENV_DATA_HEATMAP_RESOLUTION cells along the longer side of
+# the vineyard unless the request asks for up to the maximum. Cells are
+# weighted by inverse distance to this power, and a grid is cached until
+# the vineyard's next hub batch or for at most the cache seconds.
+ENV_DATA_HEATMAP_RESOLUTION = 48
+ENV_DATA_HEATMAP_MAX_RESOLUTION = 256
+ENV_DATA_HEATMAP_POWER = 2
+ENV_DATA_HEATMAP_CACHE_SECONDS = 3600
+
+# DISEASE RISK SETTINGS
+# See common/risk.py. Leaves count as wet at or above this leafwetness.
+RISK_LEAF_WET_THRESHOLD = 50.0
+# Longest gap between a node's readings counted as weather, in hours.
+RISK_MAX_GAP_HOURS = 2.0
+# Downy mildew: wet degree-hours above the base temperature in one wet
+# period that count as an infection.
+RISK_DOWNY_BASE_TEMPERATURE = 10.0
+RISK_DOWNY_DEGREE_HOURS = 50.0
+# Powdery mildew: consecutive hours within the range that make a day
+# favourable.
+RISK_POWDERY_RANGE = (21.0, 30.0)
+RISK_POWDERY_HOURS = 6
+# Models work in Celsius; set when nodes report Fahrenheit.
+RISK_TEMPERATURE_FAHRENHEIT = (
+    os.environ.get('RISK_TEMPERATURE_FAHRENHEIT', '') == 'true'
+)
+
+# GROWING DEGREE-DAY SETTINGS
+# See common/gdd.py. Daily temperatures are held within the base and cap,
+# in Celsius, and the season runs from this (month, day) standing in for
+# budbreak.
+GDD_BASE_TEMPERATURE = 10.0
+GDD_CAP_TEMPERATURE = 30.0
+GDD_SEASON_START = (4, 1)
+
+# ALERT SETTINGS
+# See common/alerts.py. Rules are reused for this long, per process, after
+# being read; saving them takes effect at once in the saving process.
+ALERT_MAX_RULES = 50
+ALERT_RULES_CACHE_SECONDS = 60
+
+# SENSOR HEALTH SETTINGS
+# See common/sensors.py. Statistics weigh about the last SENSOR_WINDOW
+# readings and are trusted after SENSOR_MIN_READINGS. A spike is further
+# from the mean than SENSOR_SPIKE_SIGMAS deviations, never taken as less
+# than the variable's SENSOR_MIN_DEVIATION, and is reported for the next
+# SENSOR_SPIKE_MEMORY readings.
+SENSOR_WINDOW = 200
+SENSOR_MIN_READINGS = 20
+SENSOR_SPIKE_SIGMAS = 6.0
+SENSOR_MIN_DEVIATION = {
+    'temperature': 1.0,
+    'humidity': 2.0,
+    'leafwetness': 5.0,
+}
+SENSOR_SPIKE_MEMORY = 12
+# Readings kept per node, and how many equal readings, within the
+# tolerance, make a sensor stuck. None turns the check off.
+SENSOR_RING_SIZE = 32
+SENSOR_STUCK_READINGS = {
+    'temperature': 12,
+    'humidity': 12,
+    'leafwetness': 24,
+}
+SENSOR_STUCK_TOLERANCE = 0.01
+
+# EXPORT SETTINGS
+# See common/export.py. Readings are read EXPORT_PAGE_SIZE at a time and
+# written EXPORT_CHUNK_ROWS CSV rows, or EXPORT_ROW_GROUP_ROWS Parquet
+# rows, at a time. /export covers at most EXPORT_MAX_DAYS days.
+EXPORT_PAGE_SIZE = 5000
+EXPORT_CHUNK_ROWS = 1000
+EXPORT_ROW_GROUP_ROWS = 50000
+EXPORT_MAX_DAYS = 366
+# Whole fleet exports split the token ring into this many ranges and read
+# this many at once.
+EXPORT_SCAN_SPLITS = 256
+EXPORT_SCAN_CONCURRENCY = 4
+
+# TABLE SCAN SETTINGS
+# See maintenance/scan.py. Whole table scans split the token ring into
+# this many ranges, read this many at once and fetch pages of this many
+# rows.
+SCAN_SPLITS = 256
+SCAN_CONCURRENCY = 4
+SCAN_PAGE_SIZE = 5000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
@@ -134,6 +249,26 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing for Plantalytics users (see common/passwords.py).
+# Raising the work factor only affects new hashes; existing ones are
+# rehashed on the user's next successful login.
+PASSWORD_HASH_ALGORITHM = os.environ.get(
+    'PASSWORD_HASH_ALGORITHM',
+    'pbkdf2_sha256'
+)
+PASSWORD_HASH_ITERATIONS = int(
+    os.environ.get('PASSWORD_HASH_ITERATIONS', 150000)
+)
+PASSWORD_HASH_SCRYPT_N = int(os.environ.get('PASSWORD_HASH_SCRYPT_N', 16384))
+PASSWORD_HASH_SCRYPT_R = int(os.environ.get('PASSWORD_HASH_SCRYPT_R', 8))
+PASSWORD_HASH_SCRYPT_P = int(os.environ.get('PASSWORD_HASH_SCRYPT_P', 1))
+# Threads per worker process used for hashing, the number of extra
+# requests allowed to wait for one, and how long they wait in seconds.
+PASSWORD_HASH_THREADS = int(os.environ.get('PASSWORD_HASH_THREADS', 2))
+PASSWORD_HASH_BACKLOG = int(os.environ.get('PASSWORD_HASH_BACKLOG', 16))
+PASSWORD_HASH_TIMEOUT = 10
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.9/topics/i18n/
 
@@ -184,3 +319,53 @@ EMAIL_PORT = os.environ.get('RESET_PORT')
 EMAIL_HOST_USER = os.environ.get('RESET_EMAIL')
 EMAIL_HOST_PASSWORD = os.environ.get('RESET_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+# Notification emails waiting for the background sender, per process.
+EMAIL_QUEUE_SIZE = 100
+
+# METRICS SETTINGS
+# Directory where each worker writes its metrics for /metrics to merge.
+# Leave unset to report only the process that serves the request.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = 1
+
+# CACHE SETTINGS
+NODE_COORDINATES_CACHE_SECONDS = 60
+# Vineyard boundaries, block membership and the index of every vineyard
+# are precomputed and reused for this long, per process.
+GEOMETRY_CACHE_SECONDS = 300
+
+# HEALTH CHECK SETTINGS
+# Readiness probe results are reused for this long, per process.
+HEALTH_CHECK_CACHE_SECONDS = 5
+HEALTH_CHECK_DATABASE_TIMEOUT = 2
+HEALTH_CHECK_MAIL_TIMEOUT = 2
+
+# HUB DATA SETTINGS
+# Readings outside these bounds are rejected from a hub batch. Temperature
+# covers both Celsius and Fahrenheit sensors.
+HUB_DATA_RANGES = {
+    'temperature': (-60.0, 140.0),
+    'humidity': (0.0, 100.0),
+    'leafwetness': (0.0, 100.0),
+}
+# Bodies at least this large are parsed with orjson, when it is installed.
+HUB_DATA_FAST_PARSE_BYTES = 16384
+# Largest hub body accepted once gzip or deflate encoding is undone.
+HUB_DATA_MAX_BODY_BYTES = 16 * 1024 * 1024
+# Hub batches remembered per process so a retried post is answered without
+# touching Cassandra. The marker table catches retries across processes.
+HUB_BATCH_DEDUP_SECONDS = 600
+HUB_BATCH_DEDUP_ENTRIES = 10000
+# Streamed hub uploads are read this many bytes at a time and stored in
+# windows of HUB_STREAM_WINDOW batches, HUB_STREAM_CONCURRENCY at once.
+HUB_STREAM_CHUNK_BYTES = 64 * 1024
+HUB_STREAM_WINDOW = 16
+HUB_STREAM_CONCURRENCY = 4
+# Hubs that sent a batch within this many minutes count as reporting.
+HUB_REPORTING_MINUTES = 20
+
+# OVERVIEW SETTINGS
+# Vineyard summaries are reused for this long, per process, and at most
+# OVERVIEW_CONCURRENCY vineyards are summarised at once.
+OVERVIEW_CACHE_SECONDS = 30
+OVERVIEW_CONCURRENCY = 8
@@ -0,0 +1,41 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+API mode settings for plantalytics_backend.
+
+Every endpoint is a csrf_exempt JSON view backed by Cassandra, so this
+profile drops the Django admin, auth, sessions, messages, static files
+and CSRF layers along with the unused SQLite database. Each request then
+only passes through CORS and common middleware before reaching our views.
+
+Select it with DJANGO_SETTINGS_MODULE=plantalytics_backend.settings_api.
+Tests still run against plantalytics_backend.settings.
+"""
+
+from plantalytics_backend.settings import *
+
+
+INSTALLED_APPS = [
+    'corsheaders',
+    'maintenance',
+]
+
+MIDDLEWARE_CLASSES = [
+    'common.middleware.RequestInstrumentationMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+# No templates are rendered; all responses are JSON.
+TEMPLATES = []
+
+# Without a database entry Django opens no connection and skips the
+# per-request connection housekeeping on request start and finish.
+DATABASES = {}
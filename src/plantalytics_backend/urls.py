@@ -24,15 +24,23 @@ Including another URLconf
 """
 
 from django.conf.urls import include, url
-from django.contrib import admin
 
+# Patterns are tried in order, so the busiest endpoints come first:
+# every hub posts to hub_data and every map view polls env_data.
 urlpatterns = [
-    url(r'^vineyard', include('vineyard.urls')),
-    url(r'^env_data', include('env_data.urls')),
     url(r'^hub_data', include('hub_data.urls')),
+    url(r'^env_data', include('env_data.urls')),
+    url(r'^vineyard', include('vineyard.urls')),
+    url(r'^overview', include('overview.urls')),
+    url(r'^risk', include('risk.urls')),
+    url(r'^gdd', include('gdd.urls')),
+    url(r'^alerts', include('alerts.urls')),
+    url(r'^sensor_health', include('sensor_health.urls')),
+    url(r'^export', include('export.urls')),
     url(r'^admin/', include('admin.urls')),
     url(r'^login', include('login.urls')),
     url(r'^password/', include('password.urls')),
     url(r'^health_check', include('health_check.urls')),
     url(r'^email_change', include('email_change.urls')),
+    url(r'^metrics', include('metrics.urls')),
 ]
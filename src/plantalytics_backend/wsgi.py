@@ -26,3 +26,21 @@ os.environ.setdefault(
 )
 
 application = get_wsgi_application()
+
+# Under uWSGI, make sure each forked worker opens its own Cassandra
+# connection and closes it on exit. Outside uWSGI these imports fail
+# and cassy falls back to its PID check and atexit handler.
+try:
+    import uwsgi
+    from uwsgidecorators import postfork
+except ImportError:
+    uwsgi = None
+
+if uwsgi is not None:
+    import cassy
+
+    @postfork
+    def reset_cassandra_connection():
+        cassy.connection.reset()
+
+    uwsgi.atexit = cassy.connection.shutdown
@@ -0,0 +1,110 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import os
+import json
+
+from common import risk
+from django.test import TestCase, Client, override_settings
+from django.test.utils import setup_test_environment
+
+import cassy
+
+HOUR = 3600000
+# Midnight UTC on 19 October 2016, in milliseconds.
+START = 1476835200000
+
+
+class MainTests(TestCase):
+    """
+    Executes all of the unit tests for the risk endpoint.
+    """
+
+    def test_downy_mildew_infection(self):
+        """
+        Tests wet degree-hours build to an infection and that replayed
+        readings are not counted again.
+        """
+        readings = [
+            (START + hour * HOUR, 20.0, 80.0)
+            for hour in range(7)
+        ]
+        state = risk.apply(risk.new_state(), readings)
+        self.assertEqual(state['wet_hours'], 6.0)
+        self.assertEqual(state['wet_degree_hours'], 60.0)
+        self.assertEqual(state['last_infection'], START + 5 * HOUR)
+        state = risk.apply(state, readings)
+        self.assertEqual(state['wet_degree_hours'], 60.0)
+        state = risk.apply(state, [(START + 7 * HOUR, 20.0, 10.0)])
+        self.assertEqual(risk.indices(state)['downy_mildew']['index'], 0.0)
+
+    def test_powdery_mildew_index(self):
+        """
+        Tests each favourable day adds to the Gubler-Thomas index once
+        the day is over.
+        """
+        state = risk.new_state()
+        for day in range(3):
+            risk.apply(state, [
+                (START + (day * 24 + hour) * HOUR, 25.0, 0.0)
+                for hour in range(8)
+            ])
+        self.assertEqual(state['powdery_index'], 40.0)
+        risk.apply(state, [(START + 72 * HOUR, 10.0, 0.0)])
+        self.assertEqual(state['powdery_index'], 60.0)
+
+    @override_settings(DB_BACKEND='memory')
+    def test_response_risk(self):
+        """
+        Tests a stored hub batch moves the node's risk state forward.
+        """
+        setup_test_environment()
+        cassy.connection.reset()
+        cassy.hub_batch_cache.invalidate()
+        cassy.store_env_data({
+            'vine_id': 0,
+            'hub_id': 0,
+            'batch_sent': START + HOUR,
+            'hub_data': [
+                {
+                    'node_id': 1,
+                    'temperature': 20.0,
+                    'humidity': 90.0,
+                    'leafwetness': 80.0,
+                    'data_sent': START + hour * HOUR,
+                }
+                for hour in range(2)
+            ],
+        })
+        client = Client()
+        body = {
+            'vineyard_id': '0',
+            'auth_token': os.environ.get('LOGIN_SEC_TOKEN'),
+        }
+        response = client.post(
+            '/risk',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        cassy.connection.reset()
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([node['node_id'] for node in content['nodes']], [1])
+        downy = content['nodes'][0]['downy_mildew']
+        self.assertEqual(downy['wet_degree_hours'], 10.0)
+        self.assertEqual(content['vineyard']['downy_mildew'], 20.0)
+
+    def test_risk_invalid_method(self):
+        """
+        Tests the risk endpoint with unsupported HTTP method.
+        """
+        setup_test_environment()
+        client = Client()
+        response = client.get('/risk')
+        self.assertEqual(response.status_code, 405)
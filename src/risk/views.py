@@ -0,0 +1,119 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import json
+import logging
+
+from common import risk
+from common.exceptions import PlantalyticsException
+from common.errors import *
+from django.views.decorators.csrf import csrf_exempt
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed
+)
+
+import cassy
+
+logger = logging.getLogger('plantalytics_backend.risk')
+
+
+@csrf_exempt
+def index(request):
+    """
+    Responds with the current disease risk indices of each node of a
+    vineyard, and the highest of each across the vineyard.
+    """
+
+    if request.method != "POST":
+        return HttpResponseNotAllowed(['POST'])
+
+    data = json.loads(request.body.decode('utf-8'))
+    vineyard_id = str(data.get('vineyard_id', ''))
+    auth_token = str(data.get('auth_token', ''))
+
+    try:
+        message = (
+            'Validating auth token for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+
+        cassy.verify_auth_token(auth_token)
+    except PlantalyticsException as e:
+        message = (
+            'Invalid auth token for vineyard id {}'
+        ).format(vineyard_id)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while auth token for vineyard id {}\n{}.'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        error = custom_error(AUTH_UNKNOWN, str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+
+    try:
+        message = (
+            'Fetching disease risk for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+
+        coordinates = cassy.get_node_coordinates(vineyard_id)
+        states = cassy.get_risk_states(
+            [coordinate['node_id'] for coordinate in coordinates]
+        )
+        nodes = []
+        highest = {'downy_mildew': None, 'powdery_mildew': None}
+        for coordinate in coordinates:
+            if coordinate['node_id'] not in states:
+                continue
+            node = {
+                'node_id': coordinate['node_id'],
+                'latitude': coordinate['lat'],
+                'longitude': coordinate['lon'],
+            }
+            node.update(risk.indices(states[coordinate['node_id']]))
+            for model in highest:
+                if highest[model] is None or (
+                    node[model]['index'] > highest[model]
+                ):
+                    highest[model] = node[model]['index']
+            nodes.append(node)
+        response = {
+            'vineyard': highest,
+            'nodes': nodes,
+        }
+
+        message = (
+            'Successfully fetched disease risk for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+        return HttpResponse(
+            json.dumps(response),
+            content_type='application/json'
+        )
+    except PlantalyticsException as e:
+        message = (
+            'Invalid vineyard ID while fetching disease risk: {}'
+        ).format(vineyard_id)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while fetching disease risk for '
+            'vineyard id {}. {}'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        error = custom_error(VINEYARD_UNKNOWN, str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
@@ -0,0 +1,132 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import os
+import json
+import statistics
+
+from common import sensors
+from django.test import TestCase, Client, override_settings
+from django.test.utils import setup_test_environment
+
+import cassy
+
+MINUTE = 60000
+# Midnight UTC on 19 October 2016, in milliseconds.
+START = 1476835200000
+
+
+def readings(temperatures, first=0):
+    """
+    Returns a reading a minute for each temperature, with humidity and
+    leafwetness changing from one reading to the next.
+    """
+
+    return [
+        (
+            START + (first + index) * MINUTE,
+            temperature,
+            40.0 + index % 5,
+            10.0 + index % 3,
+        )
+        for index, temperature in enumerate(temperatures)
+    ]
+
+
+class MainTests(TestCase):
+    """
+    Executes all of the unit tests for the sensor_health endpoint.
+    """
+
+    @override_settings(SENSOR_WINDOW=200)
+    def test_running_statistics(self):
+        """
+        Tests the running mean and variance match the batch ones within
+        the window, and survive encoding.
+        """
+        temperatures = [50.0 + (index * 7) % 11 for index in range(40)]
+        state = sensors.new_state()
+        sensors.apply(state, readings(temperatures[:25]))
+        sensors.apply(state, readings(temperatures[25:], 25))
+        state = sensors.decode(state.encode())
+        self.assertAlmostEqual(state.stats[1], statistics.mean(temperatures))
+        self.assertAlmostEqual(
+            state.stats[2],
+            statistics.pvariance(temperatures)
+        )
+        self.assertEqual(state.recent(0)[-1], temperatures[-1])
+
+    def test_spike_and_stuck(self):
+        """
+        Tests an impossible jump is reported as a spike and a sensor that
+        repeats itself as stuck.
+        """
+        temperatures = [50.0 + (index * 7) % 11 for index in range(40)]
+        state = sensors.new_state()
+        sensors.apply(state, readings(temperatures))
+        spiked = sensors.apply(state, readings([130.0], 40))
+        self.assertEqual(spiked, {'temperature': 1})
+        report = sensors.report(state, START + 41 * MINUTE)
+        self.assertEqual(report['faults'], ['temperature_spiking'])
+        sensors.apply(state, readings([55.0] * 12, 41))
+        report = sensors.report(state, START + 53 * MINUTE)
+        self.assertEqual(report['faults'], ['temperature_stuck'])
+        # Replayed readings are ignored.
+        self.assertEqual(sensors.apply(state, readings([130.0], 40)), {})
+
+    @override_settings(DB_BACKEND='memory')
+    def test_response_sensor_health(self):
+        """
+        Tests a stored hub batch is reflected in the vineyard's report.
+        """
+        setup_test_environment()
+        cassy.connection.reset()
+        cassy.hub_batch_cache.invalidate()
+        cassy.store_env_data({
+            'vine_id': 0,
+            'hub_id': 0,
+            'batch_sent': START + 30 * MINUTE,
+            'hub_data': [
+                {
+                    'node_id': 1,
+                    'temperature': 60.0,
+                    'humidity': humidity,
+                    'leafwetness': 20.0 + minute,
+                    'data_sent': START + minute * MINUTE,
+                }
+                for minute, humidity in enumerate([50.0, 52.0] * 6)
+            ],
+        })
+        client = Client()
+        body = {
+            'vineyard_id': '0',
+            'auth_token': os.environ.get('LOGIN_SEC_TOKEN'),
+        }
+        response = client.post(
+            '/sensor_health',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        cassy.connection.reset()
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        nodes = {node['node_id']: node for node in content['nodes']}
+        self.assertEqual(nodes[1]['last_reading'], START + 11 * MINUTE)
+        self.assertEqual(nodes[1]['faults'], ['temperature_stuck'])
+        self.assertEqual(nodes[1]['variables']['humidity']['mean'], 51.0)
+        self.assertEqual(content['summary']['faulty'], 1)
+
+    def test_sensor_health_invalid_method(self):
+        """
+        Tests the sensor_health endpoint with unsupported HTTP method.
+        """
+        setup_test_environment()
+        client = Client()
+        response = client.get('/sensor_health')
+        self.assertEqual(response.status_code, 405)
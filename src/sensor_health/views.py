@@ -0,0 +1,118 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+import datetime
+import json
+import logging
+
+from common import risk, sensors
+from common.exceptions import PlantalyticsException
+from common.errors import *
+from django.views.decorators.csrf import csrf_exempt
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed
+)
+
+import cassy
+
+logger = logging.getLogger('plantalytics_backend.sensor_health')
+
+
+@csrf_exempt
+def index(request):
+    """
+    Responds with the sensor health of each node of a vineyard, and how
+    many nodes are silent or have a faulty sensor.
+    """
+
+    if request.method != "POST":
+        return HttpResponseNotAllowed(['POST'])
+
+    data = json.loads(request.body.decode('utf-8'))
+    vineyard_id = str(data.get('vineyard_id', ''))
+    auth_token = str(data.get('auth_token', ''))
+
+    try:
+        message = (
+            'Validating auth token for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+
+        cassy.verify_auth_token(auth_token)
+    except PlantalyticsException as e:
+        message = (
+            'Invalid auth token for vineyard id {}'
+        ).format(vineyard_id)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while auth token for vineyard id {}\n{}.'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        error = custom_error(AUTH_UNKNOWN, str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+
+    try:
+        message = (
+            'Fetching sensor health for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+
+        now = risk.milliseconds(datetime.datetime.utcnow())
+        coordinates = cassy.get_node_coordinates(vineyard_id)
+        states = cassy.get_sensor_states(
+            [coordinate['node_id'] for coordinate in coordinates]
+        )
+        nodes = []
+        for coordinate in coordinates:
+            state = states.get(coordinate['node_id'])
+            node = {
+                'node_id': coordinate['node_id'],
+                'latitude': coordinate['lat'],
+                'longitude': coordinate['lon'],
+            }
+            node.update(sensors.report(state or sensors.new_state(), now))
+            nodes.append(node)
+        response = {
+            'summary': {
+                'nodes': len(nodes),
+                'silent': sum(1 for node in nodes if node['silent']),
+                'faulty': sum(1 for node in nodes if node['faults']),
+            },
+            'nodes': nodes,
+        }
+
+        message = (
+            'Successfully fetched sensor health for vineyard id {}.'
+        ).format(vineyard_id)
+        logger.info(message)
+        return HttpResponse(
+            json.dumps(response),
+            content_type='application/json'
+        )
+    except PlantalyticsException as e:
+        message = (
+            'Invalid vineyard ID while fetching sensor health: {}'
+        ).format(vineyard_id)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while fetching sensor health for '
+            'vineyard id {}. {}'
+        ).format(vineyard_id, str(e))
+        logger.exception(message)
+        error = custom_error(VINEYARD_UNKNOWN, str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
@@ -0,0 +1,193 @@
+#
+# Plantalytics
+#     Copyright (c) 2016 Sapphire Becker, Katy Brimm, Scott Ewing,
+#       Matt Fraser, Kelly Ledford, Michael Limb, Steven Ngo, Eric Turley
+#     This project is licensed under the MIT License.
+#     Please see the file LICENSE in this distribution for license terms.
+# Contact: plantalytics.capstone@gmail.com
+#
+
+"""
+Precomputed geometry of vineyards, for questions like "which nodes are
+in this block" or "which vineyard is this point in" that would otherwise
+mean reading and scanning every boundary.
+
+A vineyard's geometry is its boundary polygon, a grid index of its node
+locations and its block polygons, with the nodes of each block worked
+out up front. It is cached per vineyard for GEOMETRY_CACHE_SECONDS and
+dropped when a vineyard is edited in this process. Locating a point only
+checks the vineyards asked about, such as those a user may see, so no
+request reads every vineyard's boundary.
+"""
+
+from common.cache import TTLCache
+from common.exceptions import PlantalyticsException
+from common.geometry import BoundingBox, GridIndex, Polygon
+from django.conf import settings
+
+import cassy
+
+# Degrees per grid cell: about 50 m for nodes within a vineyard and 5 km
+# for vineyards across the region.
+NODE_CELL_SIZE = 0.0005
+VINEYARD_CELL_SIZE = 0.05
+
+geometry_cache = TTLCache('vineyard_geometry')
+
+
+def _polygon(points):
+    """
+    Returns the Polygon of {'lat', 'lon'} points, or None for fewer than
+    three points.
+    """
+
+    if len(points) < 3:
+        return None
+    return Polygon((point['lat'], point['lon']) for point in points)
+
+
+class VineyardGeometry(object):
+    """
+    Boundary, nodes and blocks of one vineyard.
+    """
+
+    def __init__(self, vineyard_id, boundary, nodes, blocks):
+        self.vineyard_id = vineyard_id
+        self.polygon = _polygon(boundary)
+        self.nodes = {node['node_id']: node for node in nodes}
+        self.node_index = GridIndex(NODE_CELL_SIZE)
+        for node in nodes:
+            self.node_index.add_point(
+                node['node_id'],
+                node['lat'],
+                node['lon']
+            )
+        self.blocks = {}
+        self.block_nodes = {}
+        for name, points in blocks.items():
+            polygon = _polygon(points)
+            if polygon is None:
+                continue
+            self.blocks[name] = polygon
+            self.block_nodes[name] = sorted(
+                node_id
+                for node_id in self.node_index.within(polygon.bounds)
+                if polygon.contains(
+                    self.nodes[node_id]['lat'],
+                    self.nodes[node_id]['lon']
+                )
+            )
+
+    def contains(self, lat, lon):
+        return self.polygon is not None and self.polygon.contains(lat, lon)
+
+    def blocks_at(self, lat, lon):
+        """
+        Returns the names of the blocks containing (lat, lon).
+        """
+
+        return sorted(
+            name for name, polygon in self.blocks.items()
+            if polygon.contains(lat, lon)
+        )
+
+    def nodes_in_block(self, name):
+        """
+        Returns the ids of the nodes inside block name. Raises KeyError
+        for an unknown block.
+        """
+
+        return self.block_nodes[name]
+
+    def nodes_near(self, lat, lon, distance):
+        """
+        Returns the ids of the nodes within distance degrees of (lat,
+        lon) in latitude and longitude.
+        """
+
+        return sorted(self.node_index.within(BoundingBox(
+            lat - distance,
+            lon - distance,
+            lat + distance,
+            lon + distance
+        )))
+
+
+def vineyard_geometry(vineyard_id):
+    """
+    Returns the VineyardGeometry of a vineyard, from the cache when it is
+    fresh. Raises PlantalyticsVineyardException for an unknown vineyard.
+    """
+
+    vineyard_id = int(vineyard_id)
+    geometry = geometry_cache.get(vineyard_id)
+    if geometry is None:
+        try:
+            nodes = cassy.get_node_coordinates(vineyard_id)
+        except PlantalyticsException:
+            # A vineyard without hardware yet still has a boundary.
+            nodes = []
+        geometry = VineyardGeometry(
+            vineyard_id,
+            cassy.get_vineyard_coordinates(vineyard_id)[1],
+            nodes,
+            cassy.get_vineyard_blocks(vineyard_id)
+        )
+        geometry_cache.set(
+            vineyard_id,
+            geometry,
+            settings.GEOMETRY_CACHE_SECONDS
+        )
+    return geometry
+
+
+class VineyardIndex(object):
+    """
+    Boundaries of many vineyards, filed in a grid by bounding box.
+    """
+
+    def __init__(self, boundaries):
+        self.polygons = {}
+        self.grid = GridIndex(VINEYARD_CELL_SIZE)
+        for vineyard_id, boundary in boundaries.items():
+            polygon = _polygon(boundary)
+            if polygon is None:
+                continue
+            self.polygons[vineyard_id] = polygon
+            self.grid.add_box(vineyard_id, polygon.bounds)
+
+    def locate(self, lat, lon):
+        """
+        Returns the ids of the vineyards containing (lat, lon).
+        """
+
+        return sorted(
+            vineyard_id for vineyard_id in self.grid.at(lat, lon)
+            if self.polygons[vineyard_id].contains(lat, lon)
+        )
+
+
+def vineyards_at(lat, lon, vineyard_ids):
+    """
+    Returns the ids, among vineyard_ids, of the vineyards containing
+    (lat, lon), checking each against its cached geometry. Unknown
+    vineyards are left out.
+    """
+
+    found = []
+    for vineyard_id in vineyard_ids:
+        try:
+            geometry = vineyard_geometry(vineyard_id)
+        except PlantalyticsException:
+            continue
+        if geometry.contains(lat, lon):
+            found.append(geometry.vineyard_id)
+    return sorted(found)
+
+
+def invalidate(vineyard_id):
+    """
+    Drops this process's cached geometry after a vineyard is edited.
+    """
+
+    geometry_cache.invalidate(int(vineyard_id))
@@ -14,6 +14,8 @@ from django.test import TestCase, Client
 from django.test.utils import setup_test_environment
 from unittest.mock import patch
 
+from vineyard import spatial
+
 
 class MainTests(TestCase):
     """
@@ -166,3 +168,93 @@ class MainTests(TestCase):
             content_type='application/json'
         )
         self.assertEqual(response.status_code, 403)
+
+    def test_block_nodes(self):
+        """
+        Tests the nodes of each block are worked out from its boundary.
+        """
+        square = [
+            {'lat': 45.0, 'lon': -123.0},
+            {'lat': 45.0, 'lon': -122.99},
+            {'lat': 45.01, 'lon': -122.99},
+            {'lat': 45.01, 'lon': -123.0},
+        ]
+        nodes = [
+            {'node_id': node_id, 'lat': 45.0 + 0.001 * node_id,
+             'lon': -122.995}
+            for node_id in range(10)
+        ]
+        north = [
+            {'lat': 45.0055, 'lon': -123.0},
+            {'lat': 45.0055, 'lon': -122.99},
+            {'lat': 45.01, 'lon': -122.99},
+            {'lat': 45.01, 'lon': -123.0},
+        ]
+        geometry = spatial.VineyardGeometry(
+            1,
+            square,
+            nodes,
+            {'north': north}
+        )
+        self.assertEqual(geometry.nodes_in_block('north'), [6, 7, 8, 9])
+        self.assertEqual(geometry.blocks_at(45.007, -122.995), ['north'])
+        self.assertEqual(geometry.blocks_at(45.002, -122.995), [])
+        self.assertFalse(geometry.contains(45.02, -122.995))
+
+    def test_locate_vineyard(self):
+        """
+        Tests a point is found in the one vineyard containing it.
+        """
+        index = spatial.VineyardIndex({
+            vineyard_id: [
+                {'lat': 45.0 + vineyard_id * 0.01, 'lon': -123.0},
+                {'lat': 45.0 + vineyard_id * 0.01, 'lon': -122.995},
+                {'lat': 45.005 + vineyard_id * 0.01, 'lon': -122.995},
+            ]
+            for vineyard_id in range(1000)
+        })
+        self.assertEqual(index.locate(45.0302, -122.9955), [3])
+        self.assertEqual(index.locate(45.0345, -122.9995), [])
+
+    @patch('cassy.get_vineyard_ids')
+    @patch('cassy.get_vineyard_blocks', return_value={})
+    @patch('cassy.get_node_coordinates', return_value=[])
+    @patch('cassy.get_vineyard_coordinates')
+    def test_vineyards_at(self, coordinates_mock, nodes_mock, blocks_mock,
+                          ids_mock):
+        """
+        Tests a point is only checked against the vineyards asked about,
+        without reading every vineyard's boundary.
+        """
+        coordinates_mock.side_effect = lambda vineyard_id: (None, [
+            {'lat': 45.0 + vineyard_id * 0.01, 'lon': -123.0},
+            {'lat': 45.0 + vineyard_id * 0.01, 'lon': -122.995},
+            {'lat': 45.005 + vineyard_id * 0.01, 'lon': -122.995},
+        ])
+        spatial.geometry_cache.invalidate()
+        self.assertEqual(
+            spatial.vineyards_at(45.0302, -122.9955, [2, 3]),
+            [3]
+        )
+        self.assertEqual(spatial.vineyards_at(45.0302, -122.9955, [2]), [])
+        self.assertEqual(coordinates_mock.call_count, 2)
+        self.assertFalse(ids_mock.called)
+        spatial.geometry_cache.invalidate()
+
+    def test_response_locate_invalid_token(self):
+        """
+        Tests the locate endpoint with an invalid auth token.
+        """
+        setup_test_environment()
+        client = Client()
+        body = {
+            'lat': 45.0,
+            'lon': -123.0,
+            'auth_token': 'chestercheetah',
+        }
+        response = client.post(
+            '/vineyard/locate',
+            data=json.dumps(body),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 403)
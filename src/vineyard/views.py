@@ -21,6 +21,7 @@ from django.http import (
 )
 
 import cassy
+from .spatial import vineyard_geometry, vineyards_at
 
 logger = logging.getLogger('plantalytics_backend.vineyard')
 
@@ -67,6 +68,7 @@ def index(request):
         logger.info(message)
 
         coordinates = cassy.get_vineyard_coordinates(vineyard_id)
+        geometry = vineyard_geometry(vineyard_id)
 
         message = (
             'Successfully fetched vineyard data for vineyard id {}.'
@@ -76,6 +78,17 @@ def index(request):
         response = {
             'center': coordinates[0],
             'boundary': coordinates[1],
+            'blocks': [
+                {
+                    'name': name,
+                    'boundary': [
+                        {'lat': point[0], 'lon': point[1]}
+                        for point in geometry.blocks[name].points
+                    ],
+                    'nodes': geometry.nodes_in_block(name),
+                }
+                for name in sorted(geometry.blocks)
+            ],
         }
         return HttpResponse(
             json.dumps(response),
@@ -96,3 +109,75 @@ def index(request):
         logger.exception(message)
         error = custom_error(VINEYARD_UNKNOWN, str(e))
         return HttpResponseBadRequest(error, content_type='application/json')
+
+
+@csrf_exempt
+def locate(request):
+    """
+    Responds with the vineyards the auth token's user may see that
+    contain a point, and the blocks of each that contain it.
+    """
+
+    if request.method != "POST":
+        return HttpResponseNotAllowed(['POST'])
+
+    data = json.loads(request.body.decode('utf-8'))
+    auth_token = str(data.get('auth_token', ''))
+
+    try:
+        logger.info('Validating auth token to locate a point.')
+        username = cassy.verify_auth_token(auth_token)
+    except PlantalyticsException as e:
+        logger.warn('Invalid auth token to locate a point.')
+        error = custom_error(str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while validating auth token to locate a '
+            'point.\n{}.'
+        ).format(str(e))
+        logger.exception(message)
+        error = custom_error(AUTH_UNKNOWN, str(e))
+        return HttpResponseForbidden(error, content_type='application/json')
+
+    try:
+        lat = float(data['lat'])
+        lon = float(data['lon'])
+    except (KeyError, TypeError, ValueError):
+        error = custom_error(DATA_INVALID)
+        return HttpResponseBadRequest(error, content_type='application/json')
+
+    try:
+        message = (
+            'Locating ({}, {}) for user \'{}\'.'
+        ).format(lat, lon, username)
+        logger.info(message)
+
+        authorized = set(
+            int(vineyard['vineyard_id'])
+            for vineyard in cassy.get_authorized_vineyards(username)
+        )
+        vineyards = []
+        for vineyard_id in vineyards_at(lat, lon, authorized):
+            vineyards.append({
+                'vineyard_id': vineyard_id,
+                'blocks': vineyard_geometry(vineyard_id).blocks_at(lat, lon),
+            })
+        return HttpResponse(
+            json.dumps({'vineyards': vineyards}),
+            content_type='application/json'
+        )
+    except PlantalyticsException as e:
+        message = (
+            'No vineyards found to locate a point for user \'{}\'.'
+        ).format(username)
+        logger.warn(message)
+        error = custom_error(str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')
+    except Exception as e:
+        message = (
+            'Error occurred while locating a point for user \'{}\'. {}'
+        ).format(username, str(e))
+        logger.exception(message)
+        error = custom_error(VINEYARD_UNKNOWN, str(e))
+        return HttpResponseBadRequest(error, content_type='application/json')